@@ -3,6 +3,7 @@
 import sys
 from pathlib import Path
 import asyncio
+import signal
 from dotenv import load_dotenv
 import os
 
@@ -10,15 +11,23 @@ import os
 project_root = Path(__file__).parent
 sys.path.insert(0, str(project_root))
 
-from src.utils.ballchasing_client import create_client
-from src.utils.database import create_database
+from src.utils.ballchasing_client import create_async_client
+from src.utils.async_database import AsyncMatchDatabase, create_async_database
+from src.utils.database import create_player_shards
+from src.utils.poller import ReplayPoller
+from src.utils.pending import PendingReplayTracker
+from src.utils.scheduler import create_scheduler
 from src.analysis.analyzer import create_analyzer
 from src.discord_bot.bot import create_bot
 
 load_dotenv()
 
 MY_STEAM_ID = os.getenv("STEAM_ID")
-POLL_INTERVAL = 5  # Seconds between checks
+# Everyone whose matches are stored (e.g. your teammates); coaching is posted for you only
+ROSTER = [steam_id.strip() for steam_id in os.getenv("PLAYER_IDS", MY_STEAM_ID or "").split(",")
+          if steam_id.strip()]
+if MY_STEAM_ID and MY_STEAM_ID not in ROSTER:
+    ROSTER.insert(0, MY_STEAM_ID)
 
 
 def find_player(team_data, steam_id):
@@ -31,50 +40,151 @@ def find_player(team_data, steam_id):
     return None
 
 
-async def check_and_analyze_new_matches(client, db, analyzer, bot):
+def find_roster_players(details):
+    """
+    Find every roster player in a replay.
+    
+    Returns:
+        Dictionary of Steam ID -> (player, team color)
+    """
+    found = {}
+    for team_color in ('blue', 'orange'):
+        for steam_id in ROSTER:
+            player = find_player(details.get(team_color, {}), steam_id)
+            if player and steam_id not in found:
+                found[steam_id] = (player, team_color)
+    return found
+
+
+def save_roster_rows(db, pending, replay_id, details, players):
+    """
+    Save a replay's rows for some roster players, clear it from the pending
+    queue and record it as processed, as one transaction (run it on the
+    writer thread). Call it after the rows kept in shard files are saved, so
+    a restart re-polls the replay only if some of its rows may be missing.
+    
+    Args:
+        db: MatchDatabase holding the rows and the pending queue
+        pending: PendingReplayTracker on `db`
+        replay_id: Ballchasing replay ID
+        details: Full replay details
+        players: Each player's entry from the replay
+    """
+    with db.transaction():
+        for player in players:
+            db.save_match(replay_id, details, player, commit=False)
+        pending.resolve(replay_id, commit=False)
+        db.mark_replay_processed(replay_id, commit=False)
+
+
+class PlayerDatabases:
+    """Routes each player's matches to the shared database, or their own file under DB_SHARD_DIR."""
+    
+    def __init__(self, db: AsyncMatchDatabase):
+        """
+        Initialize the router.
+        
+        Args:
+            db: Shared database (also holds the poller and pending-replay state)
+        """
+        self.db = db
+        self.shards = create_player_shards(defer_backfills=True)
+        self._wrapped = {}
+    
+    def __call__(self, steam_id: str) -> AsyncMatchDatabase:
+        """Database holding a player's matches."""
+        if self.shards is None:
+            return self.db
+        if steam_id not in self._wrapped:
+            self._wrapped[steam_id] = AsyncMatchDatabase(self.shards.for_player(steam_id))
+        return self._wrapped[steam_id]
+    
+    async def run_backfills(self):
+        """Finish migration backfills for the shared database and every open shard."""
+        await self.db.run_backfills()
+        for shard in list(self._wrapped.values()):
+            await shard.run_backfills()
+    
+    async def close(self):
+        """Close every shard (the shared database is closed by its owner)."""
+        for shard in self._wrapped.values():
+            await shard.close()
+        if self.shards is not None:
+            self.shards.close()
+
+
+async def check_and_analyze_new_matches(client, db, analyzer, bot, poller, pending, player_db=None):
     """
     Check for new matches and analyze them.
     
+    Args:
+        player_db: Maps a Steam ID to the database holding that player's
+            matches (default: `db` for everyone)
+    
     Returns:
         Number of new matches processed
     """
+    player_db = player_db or (lambda steam_id: db)
     print("🔍 Checking for new matches...")
     
-    # Get latest replays
-    replays = client.get_replays(uploader="me", count=5)
-    
-    if not replays:
-        print("   No replays found")
+    # Get replays uploaded since the last poll that aren't analyzed yet,
+    # plus earlier ones whose processing re-check is due
+    new_replays = await poller.poll()
+    new_ids = {replay['id'] for replay in new_replays}
+    candidates = new_replays + [
+        {'id': replay_id, 'replay_title': f'Pending replay {replay_id}'}
+        for replay_id in await db.run(pending.due) if replay_id not in new_ids
+    ]
+    if not candidates:
+        await poller.advance()
         return 0
     
+    # Fetch full details for every candidate at once
+    all_details = await client.get_many_replay_details(replay['id'] for replay in candidates)
+    
     new_matches = 0
     
-    for replay in replays:
+    for replay in candidates:
         replay_id = replay['id']
+        details = all_details.get(replay_id)
+        status = details.get('status', 'ok') if details else 'unreachable'
         
-        # Skip if already analyzed
-        if db.match_exists(replay_id):
+        # Ballchasing lists replays before their stats are computed: check back later
+        if status != 'ok':
+            parked = await db.run(pending.defer, replay_id, status)
+            print(f"   ⏳ {replay.get('replay_title', replay_id)} is {status}, "
+                  f"{'giving up' if parked else 'will re-check later'}")
             continue
         
         print(f"\n🆕 New match found: {replay.get('replay_title', 'Untitled')}")
         
-        # Get full details
-        details = client.get_replay_details(replay_id)
-        
-        # Find your player
-        your_player = find_player(details.get('blue', {}), MY_STEAM_ID)
-        team_color = 'blue'
-        if not your_player:
-            your_player = find_player(details.get('orange', {}), MY_STEAM_ID)
-            team_color = 'orange'
-        
-        if not your_player:
+        # Find you and any teammates on the roster
+        roster_players = find_roster_players(details)
+        if not roster_players:
             print(f"   ⚠️  You were not found in this match, skipping...")
+            await db.run(pending.resolve, replay_id)
             continue
         
-        # Save to database
-        db.save_match(replay_id, details, your_player)
-        print(f"   ✅ Saved to database")
+        if not all(player.get('stats') for player, _ in roster_players.values()):
+            await db.run(pending.defer, replay_id, 'missing stats')
+            print(f"   ⏳ Stats not available yet, will re-check later")
+            continue
+        
+        # Save one row per roster player; the shared database's rows and the
+        # queue entry go in one writer call, so nothing can commit half of them
+        shared_players = []
+        for steam_id, (player, _) in roster_players.items():
+            player_store = player_db(steam_id)
+            if player_store is db:
+                shared_players.append(player)
+            else:
+                await player_store.save_match(replay_id, details, player)
+        await db.run(save_roster_rows, db.sync, pending, replay_id, details, shared_players)
+        print(f"   ✅ Saved {len(roster_players)} player(s) to database")
+        
+        if MY_STEAM_ID not in roster_players:
+            continue
+        your_player, team_color = roster_players[MY_STEAM_ID]
         
         # Prepare stats for analysis
         stats = your_player.get('stats', {})
@@ -112,7 +222,8 @@ async def check_and_analyze_new_matches(client, db, analyzer, bot):
         }
         
         # Get win/loss averages
-        win_loss_data = db.get_win_loss_averages(last_n_matches=20)
+        win_loss_data = await player_db(MY_STEAM_ID).get_win_loss_averages(last_n_matches=20,
+                                                                            player_id=MY_STEAM_ID)
         
         # Generate feedback
         print(f"   🤖 Analyzing with GPT-5-mini...")
@@ -126,6 +237,7 @@ async def check_and_analyze_new_matches(client, db, analyzer, bot):
         print(f"   ✅ Complete!\n")
         new_matches += 1
     
+    await poller.advance()
     return new_matches
 
 
@@ -134,15 +246,30 @@ async def main():
     print("🚀 GameInsight - Rocket League Match Analyzer")
     print("="*60)
     print(f"Steam ID: {MY_STEAM_ID}")
-    print(f"Poll interval: {POLL_INTERVAL} seconds")
+    if len(ROSTER) > 1:
+        print(f"Roster: {', '.join(ROSTER)}")
+    scheduler = create_scheduler()
+    print(f"Poll interval: {scheduler.min_interval:.0f}-{scheduler.max_interval:.0f} seconds (adaptive)")
     print("="*60 + "\n")
     
     # Initialize components
     print("Initializing components...")
-    client = create_client()
-    db = create_database()
+    client = create_async_client()
+    # Schema migrations apply now; their data backfills run alongside polling below
+    db = create_async_database(defer_backfills=True, player_id=MY_STEAM_ID)
+    player_db = PlayerDatabases(db)
     analyzer = create_analyzer()
     bot = create_bot()
+    # The poller's and tracker's small lookups share the writer connection, and run on its thread
+    poller = ReplayPoller(client, db)
+    pending = PendingReplayTracker(db.sync)
+    
+    # Manual wake-up triggers: a question to the bot, or `kill -USR1 <pid>`
+    bot.on_query = scheduler.wake
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGUSR1, scheduler.wake)
+    except (AttributeError, NotImplementedError):
+        pass  # No SIGUSR1 on Windows
     
     # Start Discord bot
     print("Starting Discord bot...")
@@ -157,24 +284,30 @@ async def main():
     
     if not bot.target_channel:
         print("❌ Failed to connect Discord bot. Exiting.")
-        db.close()
+        await player_db.close()
+        await db.close()
+        await client.close()
         return
     
     print(f"✅ Discord bot ready in #{bot.channel_name}\n")
     
+    migration_task = asyncio.create_task(player_db.run_backfills())
+    
     # Main polling loop
     try:
         while True:
             try:
-                new_matches = await check_and_analyze_new_matches(client, db, analyzer, bot)
+                new_matches = await check_and_analyze_new_matches(client, db, analyzer, bot, poller, pending,
+                                                                  player_db)
+                scheduler.record_poll(new_matches)
                 
                 if new_matches == 0:
-                    print(f"   No new matches (checking again in {POLL_INTERVAL}s)")
+                    print(f"   No new matches (checking again in {scheduler.interval:.0f}s)")
                 else:
                     print(f"✅ Processed {new_matches} new match(es)")
                 
                 print()
-                await asyncio.sleep(POLL_INTERVAL)
+                await scheduler.wait()
                 
             except KeyboardInterrupt:
                 raise  # Re-raise to exit cleanly
@@ -182,8 +315,9 @@ async def main():
                 print(f"❌ Error in polling loop: {e}")
                 import traceback
                 traceback.print_exc()
-                print(f"\nRetrying in {POLL_INTERVAL}s...\n")
-                await asyncio.sleep(POLL_INTERVAL)
+                scheduler.record_poll(0)
+                print(f"\nRetrying in {scheduler.interval:.0f}s...\n")
+                await scheduler.wait()
     
     except KeyboardInterrupt:
         print("\n\n⏹️  Shutting down...")
@@ -191,9 +325,12 @@ async def main():
     finally:
         # Clean up
         print("Closing connections...")
-        db.close()
+        await player_db.close()
+        await db.close()  # Stops a running backfill after its current chunk
+        await client.close()
         await bot.close()
         bot_task.cancel()
+        migration_task.cancel()
         print("✅ Goodbye!")
 
 
@@ -2,7 +2,7 @@
 
 import discord
 import os
-from typing import Optional
+from typing import Callable, Optional
 from src.discord_bot.mcp_handler import query_mcp
 
 
@@ -32,6 +32,7 @@ class GameInsightBot:
         self.channel_name = "coach-feedback"
         self.target_channel = None
         self.user_to_mention = None
+        self.on_query: Optional[Callable[[], None]] = None  # Called before answering an @mention
         
         # Set up event handlers
         self._setup_events()
@@ -121,6 +122,10 @@ class GameInsightBot:
                 await message.channel.send("Hey! You mentioned me but didn't ask anything. Try: @GameInsight Why did I lose my last game?")
                 return
             
+            # Let the poller catch a just-finished match before we answer
+            if self.on_query:
+                self.on_query()
+            
             # Send "thinking" message
             thinking_msg = await message.channel.send("🤔 Analyzing your matches...")
             
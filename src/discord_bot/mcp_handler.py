@@ -28,7 +28,10 @@ You have these tools available:
 - get_win_loss_comparison: Compare win vs loss patterns
 - query_matches: Search matches by criteria
 - get_player_averages: Get overall averages
-- get_match_details: Deep dive into specific match
+- aggregate_stats: Medians, spreads and percentiles grouped by result, playlist, week or session
+- get_match_details: Deep dive into specific match (includes everyone who played in it)
+- get_teammates: Win rate and stats with each regular teammate
+- get_opponent_history: Record against a specific opponent
 """
 
 
@@ -2,16 +2,26 @@
 
 import asyncio
 import json
+from dotenv import load_dotenv
 from mcp.server import Server
 from mcp.types import Tool, TextContent
 from mcp.server.stdio import stdio_server
 
+# Before importing the tools: they read STEAM_ID, which also owns matches saved before player keys
+load_dotenv()
+
 from .tools import (
+    get_database,
+    open_database,
+    close_database,
     get_latest_match,
     get_win_loss_comparison,
     query_matches,
     get_player_averages,
-    get_match_details
+    aggregate_stats,
+    get_match_details,
+    get_teammates,
+    get_opponent_history
 )
 
 # Create MCP server instance
@@ -24,13 +34,21 @@ async def list_tools() -> list[Tool]:
     List all available tools for the LLM to use.
     Each tool needs a name, description, and input schema.
     """
+    # Built-in stats plus any stat paths registered as columns
+    stat_columns = list(await asyncio.to_thread(lambda: get_database().stat_columns()))
+    
     return [
         Tool(
             name="get_latest_match",
             description="Get details about the most recent Rocket League match played. Returns full stats including goals, assists, saves, boost usage, positioning, and movement data.",
             inputSchema={
                 "type": "object",
-                "properties": {},
+                "properties": {
+                    "player_id": {
+                        "type": "string",
+                        "description": "Player to look up, e.g. a teammate's Steam ID (default: you)"
+                    }
+                },
                 "required": []
             }
         ),
@@ -44,6 +62,19 @@ async def list_tools() -> list[Tool]:
                         "type": "integer",
                         "description": "Number of wins and losses to compare (default 20)",
                         "default": 20
+                    },
+                    "stats": {
+                        "type": "array",
+                        "items": {"type": "string", "enum": stat_columns},
+                        "description": "Extra stats to average, returned as avg_<stat> (e.g. [\"demo_inflicted\"])"
+                    },
+                    "playlist": {
+                        "type": "string",
+                        "description": "Only compare matches in this playlist (e.g. 'Ranked Doubles')"
+                    },
+                    "player_id": {
+                        "type": "string",
+                        "description": "Player to look up, e.g. a teammate's Steam ID (default: you)"
                     }
                 },
                 "required": []
@@ -51,7 +82,7 @@ async def list_tools() -> list[Tool]:
         ),
         Tool(
             name="query_matches",
-            description="Search and filter matches by various criteria. Can filter by result (win/loss), minimum and maximum stats (goals, saves), date ranges, and sort by different metrics. Useful for finding specific types of games or patterns.",
+            description="Search and filter the player's entire match history. Can filter by result (win/loss), playlist, date ranges and min/max of any stat (goals, saves, boost, positioning, movement...), and sort by any stat. Useful for finding specific types of games or patterns, including all-time bests. Returns 'matches' plus a 'next_cursor' to fetch the next page.",
             inputSchema={
                 "type": "object",
                 "properties": {
@@ -78,22 +109,52 @@ async def list_tools() -> list[Tool]:
                     },
                     "date_after": {
                         "type": "string",
-                        "description": "Only matches after this date (ISO format: 2024-10-01)"
+                        "description": "Only matches on or after this date (ISO format: 2024-10-01; times without an offset are UTC)"
                     },
                     "date_before": {
                         "type": "string",
-                        "description": "Only matches before this date (ISO format: 2024-10-20)"
+                        "description": "Only matches on or before this date (ISO format: 2024-10-20 includes that whole day)"
+                    },
+                    "playlist": {
+                        "type": "string",
+                        "description": "Only matches in this playlist (e.g. 'Ranked Doubles')"
+                    },
+                    "stat_filters": {
+                        "type": "object",
+                        "description": "Min/max bounds on any stat, e.g. {\"avg_boost\": {\"min\": 30}, \"shots\": {\"max\": 2}}",
+                        "propertyNames": {"enum": stat_columns},
+                        "additionalProperties": {
+                            "type": "object",
+                            "properties": {
+                                "min": {"type": "number"},
+                                "max": {"type": "number"}
+                            }
+                        }
                     },
                     "sort_by": {
                         "type": "string",
-                        "enum": ["date", "goals", "score", "shooting_percentage"],
+                        "enum": ["date", *stat_columns],
                         "description": "Sort results by this metric (default: date)",
                         "default": "date"
                     },
+                    "sort_dir": {
+                        "type": "string",
+                        "enum": ["desc", "asc"],
+                        "description": "Sort direction (default: desc, i.e. newest/highest first)",
+                        "default": "desc"
+                    },
                     "limit": {
                         "type": "integer",
-                        "description": "Maximum number of matches to return (default 10)",
+                        "description": "Maximum number of matches to return (default 10, max 200)",
                         "default": 10
+                    },
+                    "cursor": {
+                        "type": "string",
+                        "description": "next_cursor from a previous query_matches call, to get the next page"
+                    },
+                    "player_id": {
+                        "type": "string",
+                        "description": "Player to look up, e.g. a teammate's Steam ID (default: you)"
                     }
                 },
                 "required": []
@@ -109,6 +170,57 @@ async def list_tools() -> list[Tool]:
                         "type": "integer",
                         "description": "Number of recent matches to average (default 10)",
                         "default": 10
+                    },
+                    "stats": {
+                        "type": "array",
+                        "items": {"type": "string", "enum": stat_columns},
+                        "description": "Extra stats to average, returned as avg_<stat> (e.g. [\"demo_inflicted\"])"
+                    },
+                    "player_id": {
+                        "type": "string",
+                        "description": "Player to look up, e.g. a teammate's Steam ID (default: you)"
+                    }
+                },
+                "required": []
+            }
+        ),
+        Tool(
+            name="aggregate_stats",
+            description="Flexible stat breakdowns in one call: pick stats, aggregates (avg, median, stddev, min/max, percentiles such as p10/p90) and a grouping (result, playlist, team color, day, week or play session), optionally over each group's last N matches. E.g. wins vs losses per playlist: group_by [\"playlist\", \"result\"].",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "stats": {
+                        "type": "array",
+                        "items": {"type": "string", "enum": stat_columns},
+                        "description": "Stats to aggregate (default: all built-in stats)"
+                    },
+                    "aggregates": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "avg, min, max, sum, median, stddev or a percentile like p10/p90 (default: [\"avg\"]); outputs are <aggregate>_<stat>"
+                    },
+                    "group_by": {
+                        "type": "array",
+                        "items": {"type": "string", "enum": ["result", "playlist", "team_color", "day", "week", "session"]},
+                        "description": "Grouping keys; a session is a run of matches less than 30 minutes apart"
+                    },
+                    "last_n_matches": {
+                        "type": "integer",
+                        "description": "Only each group's most recent N matches (default: all)"
+                    },
+                    "result": {
+                        "type": "string",
+                        "enum": ["win", "loss"],
+                        "description": "Only wins or only losses"
+                    },
+                    "playlist": {
+                        "type": "string",
+                        "description": "Only this playlist (e.g. 'Ranked Doubles')"
+                    },
+                    "player_id": {
+                        "type": "string",
+                        "description": "Player to look up, e.g. a teammate's Steam ID (default: you)"
                     }
                 },
                 "required": []
@@ -123,10 +235,61 @@ async def list_tools() -> list[Tool]:
                     "replay_id": {
                         "type": "string",
                         "description": "The Ballchasing replay ID"
+                    },
+                    "player_id": {
+                        "type": "string",
+                        "description": "Player to look up, e.g. a teammate's Steam ID (default: you)"
                     }
                 },
                 "required": ["replay_id"]
             }
+        ),
+        Tool(
+            name="get_teammates",
+            description="Get the player's win rate and average goals, saves and score with each regular teammate, alongside the teammate's own averages. Useful for duo synergy questions.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "min_matches": {
+                        "type": "integer",
+                        "description": "Only teammates played with at least this many times (default 3)",
+                        "default": 3
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "description": "Maximum number of teammates (default 10)",
+                        "default": 10
+                    },
+                    "player_id": {
+                        "type": "string",
+                        "description": "Player to look up, e.g. a teammate's Steam ID (default: you)"
+                    }
+                },
+                "required": []
+            }
+        ),
+        Tool(
+            name="get_opponent_history",
+            description="Get the player's win/loss record and recent matches against a specific opponent. Opponent IDs are listed in get_match_details' players.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "opponent_id": {
+                        "type": "string",
+                        "description": "The opponent's platform ID (platform_id in get_match_details)"
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "description": "Maximum number of matches to list (default 10)",
+                        "default": 10
+                    },
+                    "player_id": {
+                        "type": "string",
+                        "description": "Player to look up, e.g. a teammate's Steam ID (default: you)"
+                    }
+                },
+                "required": ["opponent_id"]
+            }
         )
     ]
 
@@ -136,17 +299,23 @@ async def call_tool(name: str, arguments: dict) -> list[TextContent]:
     """
     Handle tool invocations from the LLM.
     Routes to the appropriate tool function and returns results.
+    Tools run on worker threads with pooled read connections, so one
+    slow query doesn't stall the server's other requests.
     """
     try:
         if name == "get_latest_match":
-            result = get_latest_match()
+            result = await asyncio.to_thread(get_latest_match, player_id=arguments.get("player_id"))
             
         elif name == "get_win_loss_comparison":
             last_n = arguments.get("last_n_matches", 20)
-            result = get_win_loss_comparison(last_n_matches=last_n)
+            result = await asyncio.to_thread(get_win_loss_comparison, last_n_matches=last_n,
+                                             playlist=arguments.get("playlist"),
+                                             stats=arguments.get("stats"),
+                                             player_id=arguments.get("player_id"))
             
         elif name == "query_matches":
-            result = query_matches(
+            result = await asyncio.to_thread(
+                query_matches,
                 result=arguments.get("result"),
                 min_goals=arguments.get("min_goals"),
                 max_goals=arguments.get("max_goals"),
@@ -155,12 +324,31 @@ async def call_tool(name: str, arguments: dict) -> list[TextContent]:
                 date_after=arguments.get("date_after"),
                 date_before=arguments.get("date_before"),
                 sort_by=arguments.get("sort_by", "date"),
-                limit=arguments.get("limit", 20)
+                limit=arguments.get("limit", 20),
+                playlist=arguments.get("playlist"),
+                stat_filters=arguments.get("stat_filters"),
+                sort_dir=arguments.get("sort_dir", "desc"),
+                cursor=arguments.get("cursor"),
+                player_id=arguments.get("player_id")
             )
             
         elif name == "get_player_averages":
             last_n = arguments.get("last_n_matches", 10)
-            result = get_player_averages(last_n_matches=last_n)
+            result = await asyncio.to_thread(get_player_averages, last_n_matches=last_n,
+                                             stats=arguments.get("stats"),
+                                             player_id=arguments.get("player_id"))
+            
+        elif name == "aggregate_stats":
+            result = await asyncio.to_thread(
+                aggregate_stats,
+                stats=arguments.get("stats"),
+                aggregates=arguments.get("aggregates"),
+                group_by=arguments.get("group_by"),
+                last_n_matches=arguments.get("last_n_matches"),
+                result=arguments.get("result"),
+                playlist=arguments.get("playlist"),
+                player_id=arguments.get("player_id")
+            )
             
         elif name == "get_match_details":
             replay_id = arguments.get("replay_id")
@@ -169,7 +357,25 @@ async def call_tool(name: str, arguments: dict) -> list[TextContent]:
                     type="text",
                     text=json.dumps({"error": "replay_id is required"})
                 )]
-            result = get_match_details(replay_id)
+            result = await asyncio.to_thread(get_match_details, replay_id,
+                                             player_id=arguments.get("player_id"))
+            
+        elif name == "get_teammates":
+            result = await asyncio.to_thread(get_teammates,
+                                             min_matches=arguments.get("min_matches", 3),
+                                             limit=arguments.get("limit", 10),
+                                             player_id=arguments.get("player_id"))
+            
+        elif name == "get_opponent_history":
+            opponent_id = arguments.get("opponent_id")
+            if not opponent_id:
+                return [TextContent(
+                    type="text",
+                    text=json.dumps({"error": "opponent_id is required"})
+                )]
+            result = await asyncio.to_thread(get_opponent_history, opponent_id,
+                                             limit=arguments.get("limit", 10),
+                                             player_id=arguments.get("player_id"))
             
         else:
             return [TextContent(
@@ -192,12 +398,17 @@ async def call_tool(name: str, arguments: dict) -> list[TextContent]:
 
 async def main():
     """Run the MCP server."""
-    async with stdio_server() as (read_stream, write_stream):
-        await app.run(
-            read_stream,
-            write_stream,
-            app.create_initialization_options()
-        )
+    # Open the database once; every tool call borrows from its read pool
+    open_database()
+    try:
+        async with stdio_server() as (read_stream, write_stream):
+            await app.run(
+                read_stream,
+                write_stream,
+                app.create_initialization_options()
+            )
+    finally:
+        close_database()
 
 
 if __name__ == "__main__":
@@ -2,23 +2,88 @@
 
 import os
 import json
+import threading
 from typing import Dict, List, Optional
-from src.utils.database import create_database
+from src.utils.database import MatchDatabase, PlayerShards, create_database, create_player_shards
 
-# Your Steam ID from environment
+# Your Steam ID from environment: the player tools answer for unless asked about another
 STEAM_ID = os.getenv("STEAM_ID")
 
+# One database handle for the life of the server process. Tools borrow
+# read-only connections from its pool, and each pooled connection keeps
+# its own sqlite3 statement cache, so a repeated query is prepared once.
+# With DB_SHARD_DIR set, each player's matches live in their own file instead.
+_db: Optional[MatchDatabase] = None
+_shards: Optional[PlayerShards] = None
+_db_lock = threading.Lock()
 
-def get_latest_match() -> Dict:
+
+def open_database(db_path: str = "data/matches.db", cache_size: int = 256) -> MatchDatabase:
+    """
+    Open the shared database handle (replacing any open one).
+    
+    Args:
+        db_path: Path to SQLite database file
+        cache_size: Read results kept between writes (0 disables the cache)
+        
+    Returns:
+        The shared MatchDatabase
+    """
+    global _db, _shards
+    with _db_lock:
+        _close()
+        _db = create_database(db_path, player_id=STEAM_ID, cache_size=cache_size)
+        _shards = create_player_shards()
+        return _db
+
+
+def get_database(player_id: Optional[str] = None) -> MatchDatabase:
+    """
+    Get the shared database handle, opening it on first use.
+    
+    Args:
+        player_id: Player whose matches are wanted (default: STEAM_ID); picks
+            the player's shard when players are sharded
+    """
+    global _db, _shards
+    with _db_lock:
+        if _db is None:
+            _db = create_database(player_id=STEAM_ID)
+            _shards = create_player_shards()
+        player_id = player_id or STEAM_ID
+        if _shards is not None and player_id:
+            return _shards.for_player(player_id)
+        return _db
+
+
+def _close():
+    """Close whatever is open (caller holds _db_lock)."""
+    global _db, _shards
+    if _db is not None:
+        _db.close()
+        _db = None
+    if _shards is not None:
+        _shards.close()
+        _shards = None
+
+
+def close_database():
+    """Close the shared database handle (on server shutdown)."""
+    with _db_lock:
+        _close()
+
+
+def get_latest_match(player_id: Optional[str] = None) -> Dict:
     """
     Get the most recent Rocket League match.
     
+    Args:
+        player_id: Roster player's ID (default: STEAM_ID)
+        
     Returns:
         Dictionary with match details including stats
     """
-    db = create_database()
-    matches = db.get_recent_matches(limit=1)
-    db.close()
+    matches = get_database(player_id).get_recent_matches(limit=1, player_id=player_id)
     
     if not matches:
         return {"error": "No matches found in database"}
@@ -26,21 +91,25 @@ def get_latest_match() -> Dict:
     return matches[0]
 
 
-def get_win_loss_comparison(last_n_matches: int = 10) -> Dict:
+def get_win_loss_comparison(last_n_matches: int = 10,
+                            playlist: Optional[str] = None,
+                            stats: Optional[List[str]] = None,
+                            player_id: Optional[str] = None) -> Dict:
     """
     Get comparison of stats between wins and losses.
     
     Args:
         last_n_matches: Number of recent matches to analyze
+        playlist: Only compare matches in this playlist (e.g. 'Ranked Doubles')
+        stats: Extra stat columns to average (e.g. ['demo_inflicted'])
+        player_id: Roster player's ID (default: STEAM_ID)
         
     Returns:
         Dictionary with 'wins' and 'losses' stat averages
     """
-    db = create_database()
-    data = db.get_win_loss_averages(last_n_matches=last_n_matches)
-    db.close()
-    
-    return data
+    return get_database(player_id).get_win_loss_averages(
+        last_n_matches=last_n_matches, playlist=playlist, stats=stats, player_id=player_id
+    )
 
 
 def query_matches(
@@ -52,8 +121,13 @@ def query_matches(
     date_after: Optional[str] = None,
     date_before: Optional[str] = None,
     sort_by: str = "date",
-    limit: int = 10
-) -> List[Dict]:
+    limit: int = 10,
+    playlist: Optional[str] = None,
+    stat_filters: Optional[Dict[str, Dict[str, float]]] = None,
+    sort_dir: str = "desc",
+    cursor: Optional[str] = None,
+    player_id: Optional[str] = None
+) -> Dict:
     """
     Query matches with optional filters.
     
@@ -63,100 +137,141 @@ def query_matches(
         max_goals: Maximum goals scored
         min_saves: Minimum saves made
         max_saves: Maximum saves made
-        date_after: Only matches after this date (ISO format: 2024-10-01)
-        date_before: Only matches before this date (ISO format: 2024-10-20)
-        sort_by: Sort by 'date', 'goals', 'score', 'shooting_percentage'
+        date_after: Only matches on or after this date (ISO format: 2024-10-01; no offset means UTC)
+        date_before: Only matches on or before this date (ISO format: 2024-10-20 includes that whole day)
+        sort_by: Sort by 'date' (played-at time) or any stat column (goals, score, avg_boost, ...)
         limit: Maximum number of matches to return
+        playlist: Filter by playlist name (e.g. 'Ranked Doubles')
+        stat_filters: Extra ranges, e.g. {"avg_boost": {"min": 30}, "shots": {"max": 2}}
+        sort_dir: 'desc' (default) or 'asc'
+        cursor: next_cursor from a previous call, to get the next page
+        player_id: Roster player's ID (default: STEAM_ID)
         
     Returns:
-        List of match dictionaries
+        Dictionary with 'matches' and 'next_cursor' (None when there are no more)
     """
-    db = create_database()
-    
-    # Get a large pool of matches to filter from
-    matches = db.get_recent_matches(limit=100)
-    
-    # Apply filters
-    filtered = []
-    for match in matches:
-        # Filter by result
-        if result and match.get('result') != result:
-            continue
-        
-        # Filter by minimum goals
-        if min_goals is not None and match.get('goals', 0) < min_goals:
-            continue
-
-        # Filter by maximum goals
-        if max_goals is not None and match.get('goals', 0) > max_goals:
-            continue
-        
-        # Filter by minimum saves
-        if min_saves is not None and match.get('saves', 0) < min_saves:
-            continue
-
-        # Filter by maximum saves
-        if max_saves is not None and match.get('saves', 0) < max_saves:
-            continue
-        
-        # Filter by date after
-        if date_after and match.get('date', '') < date_after:
-            continue
-        
-        # Filter by date before
-        if date_before and match.get('date', '') > date_before:
-            continue
-        
-        filtered.append(match)
-    
-    # Sort results
-    if sort_by == "date":
-        filtered.sort(key=lambda m: m.get('date', ''), reverse=True)
-    elif sort_by == "goals":
-        filtered.sort(key=lambda m: m.get('goals', 0), reverse=True)
-    elif sort_by == "score":
-        filtered.sort(key=lambda m: m.get('score', 0), reverse=True)
-    elif sort_by == "shooting_percentage":
-        filtered.sort(key=lambda m: m.get('shooting_percentage', 0), reverse=True)
+    ranges = {
+        column: (bounds.get('min'), bounds.get('max'))
+        for column, bounds in (stat_filters or {}).items()
+    }
+    if min_goals is not None or max_goals is not None:
+        ranges['goals'] = (min_goals, max_goals)
+    if min_saves is not None or max_saves is not None:
+        ranges['saves'] = (min_saves, max_saves)
     
-    db.close()
-    
-    # Return up to limit
-    return filtered[:limit]
+    return get_database(player_id).query_matches(
+        result=result,
+        playlist=playlist,
+        date_after=date_after,
+        date_before=date_before,
+        ranges=ranges,
+        sort_by=sort_by,
+        sort_dir=sort_dir,
+        limit=limit,
+        cursor=cursor,
+        player_id=player_id
+    )
 
 
-def get_player_averages(last_n_matches: int = 10) -> Dict:
+def get_player_averages(last_n_matches: int = 10,
+                        stats: Optional[List[str]] = None,
+                        player_id: Optional[str] = None) -> Dict:
     """
     Get average stats over recent matches.
     
     Args:
         last_n_matches: Number of recent matches to average
+        stats: Extra stat columns to average (e.g. ['demo_inflicted'])
+        player_id: Roster player's ID (default: STEAM_ID)
         
     Returns:
         Dictionary with average stats
     """
-    db = create_database()
-    averages = db.get_averages(last_n_matches=last_n_matches)
-    db.close()
+    return get_database(player_id).get_averages(last_n_matches=last_n_matches, stats=stats, player_id=player_id)
+
+
+def aggregate_stats(stats: Optional[List[str]] = None,
+                    aggregates: Optional[List[str]] = None,
+                    group_by: Optional[List[str]] = None,
+                    last_n_matches: Optional[int] = None,
+                    result: Optional[str] = None,
+                    playlist: Optional[str] = None,
+                    player_id: Optional[str] = None) -> Dict:
+    """
+    Aggregate stats per group, e.g. median goals in wins vs losses per playlist.
     
-    return averages
+    Args:
+        stats: Stat columns to aggregate (default: every built-in stat)
+        aggregates: Any of avg, min, max, sum, median, stddev, p10, p90... (default: avg)
+        group_by: Any of result, playlist, team_color, day, week, session
+        last_n_matches: Only each group's most recent N matches
+        result: Only 'win' or 'loss' matches
+        playlist: Only this playlist
+        player_id: Roster player's ID (default: STEAM_ID)
+        
+    Returns:
+        Dictionary with a 'groups' list
+    """
+    groups = get_database(player_id).aggregate(
+        stats=stats,
+        aggregates=aggregates or ['avg'],
+        group_by=group_by or [],
+        last_n_matches=last_n_matches,
+        result=result,
+        playlist=playlist,
+        player_id=player_id
+    )
+    return {"groups": groups}
 
 
-def get_match_details(replay_id: str) -> Dict:
+def get_match_details(replay_id: str, player_id: Optional[str] = None) -> Dict:
     """
     Get full details for a specific match by replay ID.
     
     Args:
         replay_id: Ballchasing replay ID
+        player_id: Roster player's ID (default: STEAM_ID)
         
     Returns:
         Dictionary with full match data
     """
-    db = create_database()
-    match = db.get_match_by_id(replay_id)
-    db.close()
+    db = get_database(player_id)
+    match = db.get_match_by_id(replay_id, player_id=player_id)
     
     if not match:
         return {"error": f"Match {replay_id} not found in database"}
     
-    return match
\ No newline at end of file
+    # Everyone in the match, teammates and opponents (newer matches only)
+    match['players'] = db.get_match_players(replay_id)
+    return match
+
+
+def get_teammates(min_matches: int = 3, limit: int = 10, player_id: Optional[str] = None) -> Dict:
+    """
+    Get the player's win rate and stats with each regular teammate.
+    
+    Args:
+        min_matches: Only teammates played with at least this many times
+        limit: Maximum number of teammates
+        player_id: Roster player's ID (default: STEAM_ID)
+        
+    Returns:
+        Dictionary with a 'teammates' list, most matches together first
+    """
+    return {"teammates": get_database(player_id).get_teammates(min_matches=min_matches, limit=limit,
+                                                                player_id=player_id)}
+
+
+def get_opponent_history(opponent_id: str, limit: int = 10, player_id: Optional[str] = None) -> Dict:
+    """
+    Get the player's record and recent matches against one opponent.
+    
+    Args:
+        opponent_id: The opponent's platform ID (e.g. Steam ID, from get_match_details)
+        limit: Maximum number of matches listed
+        player_id: Roster player's ID (default: STEAM_ID)
+        
+    Returns:
+        Dictionary with 'wins', 'losses' and the most recent 'matches'
+    """
+    return get_database(player_id).get_opponent_history(opponent_id, limit=limit, player_id=player_id)
\ No newline at end of file
@@ -0,0 +1,199 @@
+"""Grouped, windowed aggregation over the matches table in a single SQL statement."""
+
+import math
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Grouping keys and the expression each one groups matches by
+GROUP_KEYS = {
+    'player': 'player_id',
+    'result': 'result',
+    'playlist': 'playlist',
+    'team_color': 'team_color',
+    'day': "date(date_epoch, 'unixepoch')",
+    'week': "strftime('%Y-W%W', date_epoch, 'unixepoch')",
+    # Epoch of the session's first match (computed by the sessions stage)
+    'session': 'session',
+}
+
+# Keys that are plain matches columns, so each group's latest matches can be found by index
+COLUMN_KEYS = ('player', 'result', 'playlist', 'team_color')
+
+# Aggregates SQLite has built in
+SIMPLE_AGGREGATES = {'avg': 'AVG', 'min': 'MIN', 'max': 'MAX', 'sum': 'SUM'}
+
+# Percentiles are 'p' plus a whole percentage, e.g. 'p10' or 'p90'
+PERCENTILE_PATTERN = re.compile(r"^p([1-9][0-9]?)$")
+
+# Matches further apart than this start a new session
+SESSION_GAP_SECONDS = 30 * 60
+
+
+def is_aggregate(name: str) -> bool:
+    """Whether `name` is a supported aggregate."""
+    return name in SIMPLE_AGGREGATES or name in ('median', 'stddev') or bool(PERCENTILE_PATTERN.match(name))
+
+
+@dataclass(frozen=True)
+class AggregateQuery:
+    """A compiled aggregation: run `sql` with `params`, then pass the rows to finish()."""
+    sql: str
+    params: Tuple[Any, ...]
+    # Output columns holding a variance that finish() turns into a standard deviation
+    variance_columns: Tuple[str, ...]
+
+    def finish(self, rows: Iterable) -> List[Dict]:
+        """Result rows as dictionaries."""
+        groups = []
+        for row in rows:
+            group = dict(row)
+            for name in self.variance_columns:
+                if group[name] is not None:
+                    group[name] = math.sqrt(max(group[name], 0.0))
+            groups.append(group)
+        return groups
+
+
+def compile_aggregate(stats: Sequence[str],
+                      aggregates: Sequence[str],
+                      group_by: Sequence[str] = (),
+                      scope: Sequence[str] = (),
+                      scope_params: Sequence[Any] = (),
+                      filters: Sequence[str] = (),
+                      filter_params: Sequence[Any] = (),
+                      last_n_matches: Optional[int] = None,
+                      session_gap: int = SESSION_GAP_SECONDS) -> AggregateQuery:
+    """
+    Compile a grouped aggregation over matches into one statement.
+
+    The statement is a chain of CTEs evaluated in a single pass: sessions
+    (LAG and a running MAX), the last N matches of each group, then
+    per-group ranks for medians and percentiles and per-group means for
+    standard deviations, and finally one GROUP BY. Stages that aren't
+    needed are left out, so a plain average over the last N matches is
+    still an index walk with a LIMIT. When every key is a column, each
+    group's last N matches are also an index walk with a LIMIT;
+    otherwise they're ranked by recency with ROW_NUMBER, which reads
+    every match in scope.
+
+    Args:
+        stats: Validated matches columns to aggregate
+        aggregates: Names from is_aggregate(); each output is '<aggregate>_<column>'
+        group_by: Keys of GROUP_KEYS; each is also an output column
+        scope: SQL conditions applied before sessions are formed (e.g. the player)
+        scope_params: Parameters for `scope`
+        filters: SQL conditions on which matches are aggregated
+        filter_params: Parameters for `filters`
+        last_n_matches: Only each group's most recent N matches
+        session_gap: Seconds between matches that start a new session
+
+    Returns:
+        The compiled query
+    """
+    for aggregate in aggregates:
+        if not is_aggregate(aggregate):
+            raise ValueError(f"Unknown aggregate '{aggregate}'")
+    for key in group_by:
+        if key not in GROUP_KEYS:
+            raise ValueError(f"Cannot group by '{key}'")
+
+    keys = [GROUP_KEYS[key] for key in group_by]
+    partition = f"PARTITION BY {', '.join(keys)} " if keys else ""
+    sessions = 'session' in group_by
+    ctes = []
+    params: List[Any] = []
+
+    # Sessions are formed from every match in scope, before the filters apply
+    conditions = list(scope) + ([] if sessions else list(filters))
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    params += list(scope_params) + ([] if sessions else list(filter_params))
+    limited_by_index = last_n_matches is not None and all(key in COLUMN_KEYS for key in group_by)
+    if limited_by_index and keys:
+        # The groups (from a covering index), then each group's newest N by a correlated LIMIT
+        ctes.append(f"group_keys AS (SELECT DISTINCT {', '.join(keys)} FROM matches {where})")
+        matching = conditions + [f"{key} IS group_keys.{key}" for key in keys]
+        ctes.append(f"""scoped AS (
+            SELECT matches.* FROM group_keys JOIN matches ON matches.rowid IN (
+                SELECT rowid FROM matches WHERE {' AND '.join(matching)}
+                ORDER BY date_epoch DESC, replay_id DESC LIMIT ?
+            )
+        )""")
+        params += list(scope_params) + list(filter_params) + [last_n_matches]
+    elif limited_by_index:
+        # One group: a plain LIMIT keeps the date index walk short
+        ctes.append(f"scoped AS (SELECT * FROM matches {where} ORDER BY date_epoch DESC, replay_id DESC LIMIT ?)")
+        params.append(last_n_matches)
+    else:
+        ctes.append(f"scoped AS (SELECT * FROM matches {where})")
+    source = "scoped"
+
+    if sessions:
+        order = "PARTITION BY player_id ORDER BY date_epoch, replay_id"
+        ctes.append(f"gaps AS (SELECT *, LAG(date_epoch) OVER ({order}) AS prev_epoch FROM {source})")
+        where = f"WHERE {' AND '.join(filters)}" if filters else ""
+        ctes.append(f"""sessions AS (
+            SELECT *, MAX(CASE WHEN prev_epoch IS NULL OR date_epoch - prev_epoch > ? THEN date_epoch END)
+                OVER ({order} ROWS UNBOUNDED PRECEDING) AS session
+            FROM gaps {where}
+        )""")
+        params += [session_gap] + list(filter_params)
+        source = "sessions"
+
+    if last_n_matches is not None and not limited_by_index:
+        # Ranked oldest first, the order a (key..., date_epoch) index already walks in
+        ctes.append(f"""recent AS (
+            SELECT * FROM (
+                SELECT *, ROW_NUMBER() OVER oldest_first AS position,
+                       COUNT(*) OVER (oldest_first ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING)
+                           AS group_size
+                FROM {source}
+                WINDOW oldest_first AS ({partition}ORDER BY date_epoch, replay_id)
+            ) WHERE position > group_size - ?
+        )""")
+        params.append(last_n_matches)
+        source = "recent"
+
+    needs_ranks = any(aggregate == 'median' or PERCENTILE_PATTERN.match(aggregate) for aggregate in aggregates)
+    ranked = list(stats) if needs_ranks else []
+    centered = list(stats) if 'stddev' in aggregates else []
+    window_terms = []
+    for column in ranked:
+        # NULLs rank last and aren't counted, so ranks 1..n_<column> hold values
+        window_terms.append(f"ROW_NUMBER() OVER ({partition}ORDER BY {column} IS NULL, {column}) AS rank_{column}")
+        window_terms.append(f"COUNT({column}) OVER ({partition.strip()}) AS n_{column}")
+    for column in centered:
+        window_terms.append(f"AVG({column}) OVER ({partition.strip()}) AS mean_{column}")
+    if window_terms:
+        ctes.append(f"windowed AS (SELECT *, {', '.join(window_terms)} FROM {source})")
+        source = "windowed"
+
+    outputs = [f"{expression} AS {key}" for key, expression in zip(group_by, keys)]
+    outputs.append("COUNT(*) AS count")
+    variance_columns = []
+    for column in stats:
+        for aggregate in aggregates:
+            name = f"{aggregate}_{column}"
+            outputs.append(f"{_aggregate_sql(aggregate, column)} AS {name}")
+            if aggregate == 'stddev':
+                variance_columns.append(name)
+
+    group = f"GROUP BY {', '.join(keys)} ORDER BY {', '.join(keys)}" if keys else ""
+    sql = f"WITH {', '.join(ctes)} SELECT {', '.join(outputs)} FROM {source} {group}"
+    return AggregateQuery(sql, tuple(params), tuple(variance_columns))
+
+
+def _aggregate_sql(aggregate: str, column: str) -> str:
+    """SQL for one aggregate of one column (rank_, n_ and mean_ come from the windowed stage)."""
+    if aggregate in SIMPLE_AGGREGATES:
+        return f"{SIMPLE_AGGREGATES[aggregate]}({column})"
+    if aggregate == 'median':
+        # The middle value, or the mean of the two middle values
+        return f"AVG(CASE WHEN rank_{column} IN ((n_{column} + 1) / 2, (n_{column} + 2) / 2) THEN {column} END)"
+    if aggregate == 'stddev':
+        # Sample variance around the group mean; finish() takes the square root
+        return (f"SUM(({column} - mean_{column}) * ({column} - mean_{column})) "
+                f"/ NULLIF(COUNT({column}) - 1, 0)")
+    # Nearest-rank percentile
+    percent = int(PERCENTILE_PATTERN.match(aggregate).group(1))
+    return f"MAX(CASE WHEN rank_{column} = MAX(1, (n_{column} * {percent} + 99) / 100) THEN {column} END)"
@@ -0,0 +1,212 @@
+"""Awaitable access to the match database for code running on the event loop."""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from .database import MatchDatabase, create_database
+
+
+class AsyncMatchDatabase:
+    """
+    Non-blocking wrapper around MatchDatabase.
+
+    Writes (and the lookups ingestion makes inside its own transactions) run
+    in order on one dedicated writer thread, the same model aiosqlite uses.
+    Reads run on the default thread pool, each borrowing a connection from
+    the read-only pool, so several can proceed at once. The event loop
+    never waits on SQLite.
+
+    `sync` is the wrapped MatchDatabase, for synchronous helpers such as
+    PendingReplayTracker that share the same connections; call them
+    through run() so they stay off the event loop too.
+    """
+
+    def __init__(self, db: MatchDatabase):
+        """
+        Initialize the wrapper.
+
+        Args:
+            db: Database to wrap (it's closed by close())
+        """
+        self.sync = db
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="match-db-writer")
+
+    async def _write(self, method: Callable, *args, **kwargs) -> Any:
+        """Run a call on the writer thread."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._writer, partial(method, *args, **kwargs))
+
+    async def _read(self, method: Callable, *args, **kwargs) -> Any:
+        """Run a call on a worker thread with a pooled read connection."""
+        return await asyncio.to_thread(method, *args, **kwargs)
+
+    async def run(self, function: Callable, *args, **kwargs) -> Any:
+        """Run a synchronous helper built on `sync` (e.g. PendingReplayTracker.defer) on the writer thread."""
+        return await self._write(function, *args, **kwargs)
+
+    async def match_exists(self, replay_id: str, player_id: Optional[str] = None) -> bool:
+        """Check if a match has already been analyzed."""
+        return await self._write(self.sync.match_exists, replay_id, player_id=player_id)
+
+    async def existing_replay_ids(self, replay_ids: Iterable[str], player_id: Optional[str] = None) -> Set[str]:
+        """Check which of several matches are already in the database."""
+        return await self._write(self.sync.existing_replay_ids, list(replay_ids), player_id=player_id)
+
+    async def save_match(self, replay_id: str, match_data: Dict, player_stats: Dict, commit: bool = True):
+        """Save a match (see MatchDatabase.save_match)."""
+        await self._write(self.sync.save_match, replay_id, match_data, player_stats, commit=commit)
+
+    async def save_matches(self,
+                           records: Iterable[Tuple[str, Dict, Dict]],
+                           chunk_size: int = 500,
+                           commit: bool = True) -> Dict[str, int]:
+        """Save many matches in a single transaction (see MatchDatabase.save_matches)."""
+        return await self._write(self.sync.save_matches, records, chunk_size=chunk_size, commit=commit)
+
+    async def commit(self):
+        """Commit writes made with commit=False."""
+        await self._write(self.sync.commit)
+
+    async def get_sync_state(self, key: str) -> Optional[str]:
+        """Read a value from the sync state store."""
+        return await self._write(self.sync.get_sync_state, key)
+
+    async def set_sync_state(self, key: str, value: Optional[str], commit: bool = True):
+        """Write a value to the sync state store."""
+        await self._write(self.sync.set_sync_state, key, value, commit=commit)
+
+    async def get_recent_matches(self, limit: int = 10, player_id: Optional[str] = None) -> List[Dict]:
+        """Get most recent matches."""
+        return await self._read(self.sync.get_recent_matches, limit, player_id=player_id)
+
+    async def query_matches(self, **filters) -> Dict:
+        """Search the full match history (same keyword arguments as MatchDatabase.query_matches)."""
+        return await self._read(self.sync.query_matches, **filters)
+
+    async def get_averages(self,
+                           last_n_matches: int = 10,
+                           stats: Optional[List[str]] = None,
+                           player_id: Optional[str] = None) -> Dict:
+        """Calculate average stats over recent matches."""
+        return await self._read(self.sync.get_averages, last_n_matches, stats=stats, player_id=player_id)
+
+    async def aggregate(self, **options) -> List[Dict]:
+        """Aggregate stats per group (same keyword arguments as MatchDatabase.aggregate)."""
+        return await self._read(self.sync.aggregate, **options)
+
+    async def get_match_by_id(self,
+                              replay_id: str,
+                              include_stats: bool = True,
+                              player_id: Optional[str] = None) -> Optional[Dict]:
+        """Get a specific match by replay ID."""
+        return await self._read(self.sync.get_match_by_id, replay_id,
+                                include_stats=include_stats, player_id=player_id)
+
+    async def get_match_stats(self, replay_id: str, player_id: Optional[str] = None) -> Optional[Dict]:
+        """Get the full Ballchasing stats stored for a match."""
+        return await self._read(self.sync.get_match_stats, replay_id, player_id=player_id)
+
+    async def get_match_players(self, replay_id: str) -> List[Dict]:
+        """Get every participant of a saved match."""
+        return await self._read(self.sync.get_match_players, replay_id)
+
+    async def get_teammates(self,
+                            min_matches: int = 1,
+                            limit: int = 20,
+                            player_id: Optional[str] = None) -> List[Dict]:
+        """Get the player's record and average stats with each teammate."""
+        return await self._read(self.sync.get_teammates, min_matches=min_matches, limit=limit,
+                                player_id=player_id)
+
+    async def get_opponent_history(self,
+                                   opponent_id: str,
+                                   limit: int = 20,
+                                   player_id: Optional[str] = None) -> Dict:
+        """Get the player's matches against one opponent."""
+        return await self._read(self.sync.get_opponent_history, opponent_id, limit=limit, player_id=player_id)
+
+    async def delete_match(self, replay_id: str, commit: bool = True, player_id: Optional[str] = None) -> bool:
+        """Delete a match and everything derived from it."""
+        return await self._write(self.sync.delete_match, replay_id, commit=commit, player_id=player_id)
+
+    async def get_win_loss_averages(self,
+                                    last_n_matches: int = 10,
+                                    playlist: Optional[str] = None,
+                                    stats: Optional[List[str]] = None,
+                                    player_id: Optional[str] = None) -> Dict:
+        """Calculate separate averages for wins and losses."""
+        return await self._read(self.sync.get_win_loss_averages, last_n_matches,
+                                playlist=playlist, stats=stats, player_id=player_id)
+
+    async def stat_columns(self) -> Tuple[str, ...]:
+        """Columns that can be filtered, sorted and averaged."""
+        return await self._read(self.sync.stat_columns)
+
+    async def register_stat_path(self, path: str, name: Optional[str] = None, index: bool = False) -> str:
+        """Expose a raw stat path as a matches column (see MatchDatabase.register_stat_path)."""
+        return await self._write(self.sync.register_stat_path, path, name=name, index=index)
+
+    async def backfill_stat_columns(self, chunk_size: int = 500) -> int:
+        """Fill registered stat columns for existing matches, one chunk per transaction."""
+        # Not on the writer thread: queued writes run between chunks instead of after the whole backfill
+        return await asyncio.to_thread(self.sync.backfill_stat_columns, chunk_size=chunk_size)
+
+    async def run_backfills(self, chunk_size: int = 500) -> int:
+        """Finish migration backfills in committed chunks (see MatchDatabase.run_backfills)."""
+        # Like backfill_stat_columns: off the writer thread so queued writes interleave with chunks
+        return await asyncio.to_thread(self.sync.run_backfills, chunk_size=chunk_size)
+
+    async def check_rolling_aggregates(self, repair: bool = False) -> List[Dict]:
+        """Compare the rolling aggregates against a recount (see MatchDatabase.check_rolling_aggregates)."""
+        return await self._write(self.sync.check_rolling_aggregates, repair=repair)
+
+    async def get_pending_replay(self, replay_id: str) -> Optional[Dict]:
+        """Get the pending-queue entry for a replay."""
+        return await self._write(self.sync.get_pending_replay, replay_id)
+
+    async def upsert_pending_replay(self,
+                                    replay_id: str,
+                                    first_seen: float,
+                                    attempts: int,
+                                    next_check_at: float,
+                                    parked: bool,
+                                    last_status: Optional[str],
+                                    commit: bool = True):
+        """Insert or update a pending-queue entry."""
+        await self._write(self.sync.upsert_pending_replay, replay_id, first_seen, attempts, next_check_at,
+                          parked, last_status, commit=commit)
+
+    async def delete_pending_replay(self, replay_id: str, commit: bool = True):
+        """Remove a replay from the pending queue."""
+        await self._write(self.sync.delete_pending_replay, replay_id, commit=commit)
+
+    async def get_due_pending_replays(self, now: float, limit: int = 50) -> List[str]:
+        """Get queued replays whose next check time has passed."""
+        return await self._write(self.sync.get_due_pending_replays, now, limit=limit)
+
+    async def get_parked_replays(self) -> List[Dict]:
+        """Get replays that were given up on after repeated failed checks."""
+        return await self._read(self.sync.get_parked_replays)
+
+    async def mark_replay_processed(self, replay_id: str, commit: bool = True):
+        """Record that every roster row of a replay has been saved."""
+        await self._write(self.sync.mark_replay_processed, replay_id, commit=commit)
+
+    async def processed_replay_ids(self, replay_ids: Iterable[str]) -> Set[str]:
+        """Check which of several replays were recorded as processed."""
+        return await self._write(self.sync.processed_replay_ids, list(replay_ids))
+
+    async def close(self):
+        """Close the database once queued writes have finished."""
+        await self._write(self.sync.close)
+        self._writer.shutdown(wait=True)
+
+
+# Helper function to create async database instance
+def create_async_database(db_path: str = "data/matches.db",
+                          defer_backfills: bool = False,
+                          player_id: Optional[str] = None) -> AsyncMatchDatabase:
+    """Create an async database instance."""
+    return AsyncMatchDatabase(create_database(db_path, defer_backfills=defer_backfills, player_id=player_id))
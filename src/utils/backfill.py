@@ -0,0 +1,229 @@
+"""Resumable backfill of a player's Ballchasing history into the match database."""
+
+import argparse
+import asyncio
+import json
+import os
+from typing import Dict, Optional
+
+from .ballchasing_client import AsyncBallchasingClient, find_replay_player
+from .database import MatchDatabase
+from .pending import PendingReplayTracker
+
+
+class BackfillEngine:
+    """
+    Pages through Ballchasing's /replays listing and stores every match found.
+
+    Each page is written in a single transaction together with the checkpoint
+    cursor, so an interrupted run resumes from the last completed page.
+    """
+
+    def __init__(self,
+                 client: AsyncBallchasingClient,
+                 db: MatchDatabase,
+                 steam_id: str,
+                 page_size: int = 200,
+                 pending: Optional[PendingReplayTracker] = None,
+                 resume_legacy: bool = False):
+        """
+        Initialize the engine.
+
+        Args:
+            client: Async Ballchasing client
+            db: Match database to fill
+            steam_id: Steam ID of the player whose stats are stored
+            page_size: Replays requested per listing page (max 200)
+            pending: Queue for replays still being processed (default: one on `db`)
+            resume_legacy: Take over a checkpoint saved before checkpoints were keyed
+                by player (it must have been this player's)
+        """
+        if not steam_id:
+            raise ValueError("A backfill needs the Steam ID of the player whose stats are stored")
+        self.client = client
+        self.db = db
+        self.steam_id = steam_id
+        self.page_size = page_size
+        self.pending = pending or PendingReplayTracker(db)
+        self.resume_legacy = resume_legacy
+
+    @staticmethod
+    def checkpoint_key(filters: Dict, steam_id: str) -> str:
+        """Sync state key for one player's filter set; each distinct pair is its own job."""
+        return "backfill:" + json.dumps({**filters, "stored_player": steam_id}, sort_keys=True)
+
+    @staticmethod
+    def legacy_checkpoint_key(filters: Dict) -> str:
+        """Key the same job was checkpointed under before keys named the stored player."""
+        return "backfill:" + json.dumps(filters, sort_keys=True)
+
+    def _load_checkpoint(self, key: str, filters: Dict) -> Optional[str]:
+        """
+        Saved state for `key`, falling back to a legacy checkpoint when asked to.
+
+        A legacy checkpoint doesn't say whose it is, so it's only taken over
+        with resume_legacy, and moved to `key` so no other player resumes it.
+        """
+        saved_state = self.db.get_sync_state(key)
+        if saved_state:
+            return saved_state
+        legacy_key = self.legacy_checkpoint_key(filters)
+        legacy_state = self.db.get_sync_state(legacy_key)
+        if not legacy_state:
+            return None
+        if not self.resume_legacy:
+            print("ℹ️  A checkpoint saved before per-player checkpoints exists for these filters; "
+                  "pass --resume-legacy to resume it as this player's")
+            return None
+        with self.db.transaction():
+            self.db.set_sync_state(key, legacy_state, commit=False)
+            self.db.set_sync_state(legacy_key, None, commit=False)
+        return legacy_state
+
+    async def run(self,
+                  playlist: Optional[str] = None,
+                  date_after: Optional[str] = None,
+                  date_before: Optional[str] = None,
+                  player_id: Optional[str] = None,
+                  uploader: Optional[str] = None,
+                  max_pages: Optional[int] = None,
+                  restart: bool = False) -> Dict:
+        """
+        Run (or resume) a backfill.
+
+        Args:
+            playlist: Ballchasing playlist filter (e.g. 'ranked-doubles')
+            date_after: Only replays played after this RFC3339 date
+            date_before: Only replays played before this RFC3339 date
+            player_id: Ballchasing player filter (e.g. 'steam:7656...')
+            uploader: Uploader filter ('me' or a Steam ID)
+            max_pages: Stop after this many pages (the checkpoint is kept)
+            restart: Ignore any saved checkpoint and start from the newest replay
+
+        Returns:
+            Progress counters for the job ('pages', 'listed', 'saved', 'skipped', 'done')
+        """
+        filters = {
+            "playlist": playlist,
+            "replay-date-after": date_after,
+            "replay-date-before": date_before,
+            "player-id": player_id,
+            "uploader": uploader,
+        }
+        filters = {name: value for name, value in filters.items() if value}
+        key = self.checkpoint_key(filters, self.steam_id)
+
+        state = {"next_url": None, "pages": 0, "listed": 0, "saved": 0, "skipped": 0, "done": False}
+        saved_state = None if restart else self._load_checkpoint(key, filters)
+        if saved_state:
+            state.update(json.loads(saved_state))
+            if state["done"]:
+                print(f"✅ Backfill already complete ({state['saved']} matches saved)")
+                return state
+            if state["next_url"]:
+                print(f"↩️  Resuming backfill after page {state['pages']}")
+
+        pages_this_run = 0
+        pages = self.client.iter_replay_pages(filters, start_url=state["next_url"], count=self.page_size)
+        async for replays, next_url in pages:
+            new_details = await self._fetch_new(replays)
+
+            # Matches and checkpoint land in the same transaction (nothing of the page if it fails)
+            with self.db.transaction():
+                saved = self._stage_page(new_details)
+                skipped = len(replays) - saved
+                state["pages"] += 1
+                state["listed"] += len(replays)
+                state["saved"] += saved
+                state["skipped"] += skipped
+                state["next_url"] = next_url
+                state["done"] = next_url is None
+                self.db.set_sync_state(key, json.dumps(state), commit=False)
+            print(f"📄 Page {state['pages']}: {saved} saved, {skipped} skipped "
+                  f"({state['saved']} total)")
+
+            pages_this_run += 1
+            if max_pages and pages_this_run >= max_pages:
+                break
+
+        return state
+
+    async def _fetch_new(self, replays) -> Dict[str, Optional[Dict]]:
+        """Fetch details for the replays on one page this player has no match for yet."""
+        replay_ids = [replay['id'] for replay in replays]
+        existing = self.db.existing_replay_ids(replay_ids, player_id=self.steam_id)
+        new_ids = [replay_id for replay_id in replay_ids if replay_id not in existing]
+        all_details = await self.client.get_many_replay_details(new_ids)
+        return {replay_id: all_details.get(replay_id) for replay_id in new_ids}
+
+    def _stage_page(self, new_details: Dict[str, Optional[Dict]]) -> int:
+        """
+        Stage (without committing) every match among one page's fetched replays.
+
+        Returns:
+            Number of matches saved
+        """
+        records = []
+        for replay_id, details in new_details.items():
+            status = details.get('status', 'ok') if details else 'unreachable'
+            if status != 'ok':
+                # The poller re-checks these on its own schedule
+                self.pending.defer(replay_id, status, commit=False)
+                continue
+            player = find_replay_player(details, self.steam_id)
+            if not player:
+                continue
+            records.append((replay_id, details, player))
+            self.pending.resolve(replay_id, commit=False)
+
+        counts = self.db.save_matches(records, commit=False)
+        return counts['inserted'] + counts['replaced']
+
+
+async def _main():
+    """Command-line entry point."""
+    from dotenv import load_dotenv
+    from .ballchasing_client import create_async_client
+    from .database import create_database, create_player_shards
+
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Backfill match history from Ballchasing")
+    parser.add_argument("--playlist", help="Playlist filter, e.g. ranked-doubles")
+    parser.add_argument("--after", help="Only replays played after this date (e.g. 2024-01-01T00:00:00Z)")
+    parser.add_argument("--before", help="Only replays played before this date")
+    parser.add_argument("--player-id", help="Ballchasing player filter, e.g. steam:7656...")
+    parser.add_argument("--uploader", default="me", help="Uploader filter (default: me)")
+    parser.add_argument("--max-pages", type=int, help="Stop after this many pages")
+    parser.add_argument("--restart", action="store_true", help="Ignore the saved checkpoint")
+    parser.add_argument("--resume-legacy", action="store_true",
+                        help="Resume a checkpoint saved before checkpoints were kept per player")
+    parser.add_argument("--steam-id", default=os.getenv("STEAM_ID"),
+                        help="Player whose stats are stored (default: STEAM_ID)")
+    args = parser.parse_args()
+    if not args.steam_id:
+        parser.error("no player to store stats for: pass --steam-id (or set STEAM_ID)")
+
+    client = create_async_client()
+    shards = create_player_shards()
+    db = shards.for_player(args.steam_id) if shards else create_database(player_id=args.steam_id)
+    engine = BackfillEngine(client, db, args.steam_id, resume_legacy=args.resume_legacy)
+    try:
+        state = await engine.run(
+            playlist=args.playlist,
+            date_after=args.after,
+            date_before=args.before,
+            player_id=args.player_id,
+            uploader=args.uploader,
+            max_pages=args.max_pages,
+            restart=args.restart
+        )
+        print(f"\n✅ {state['saved']} matches saved from {state['listed']} replays "
+              f"({'complete' if state['done'] else 'resumable'})")
+    finally:
+        (shards or db).close()
+        await client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
@@ -1,9 +1,12 @@
 # src/utils/ballchasing_client.py
 import requests
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Iterable, Tuple, Mapping, AsyncIterator
 import os
-import time
+import asyncio
+import aiohttp
 from requests.exceptions import HTTPError
+from .rate_limiter import RateLimiter, create_rate_limiter
+from .replay_cache import ReplayCache, create_replay_cache
 
 
 class BallchasingClient:
@@ -11,31 +14,31 @@ class BallchasingClient:
     
     BASE_URL = "https://ballchasing.com/api"
     
-    def __init__(self, api_key: str):
+    def __init__(self,
+                 api_key: str,
+                 rate_limiter: Optional[RateLimiter] = None,
+                 cache: Optional[ReplayCache] = None,
+                 base_url: Optional[str] = None):
         """
         Initialize the Ballchasing client.
         
         Args:
             api_key: Your Ballchasing API token
+            rate_limiter: Shared rate limiter (defaults to one for BALLCHASING_TIER)
+            cache: Optional on-disk cache for replay details
+            base_url: API root to use instead of ballchasing.com (e.g. a local stand-in)
         """
+        if base_url:
+            self.BASE_URL = base_url.rstrip("/")
         self.api_key = api_key
         self.session = requests.Session()
         self.session.headers.update({
             "Authorization": api_key
         })
-        self.last_request_time = 0
-        self.min_request_interval = 1.0  # Minimum seconds between requests
+        self.rate_limiter = rate_limiter or create_rate_limiter()
+        self.cache = cache
     
-    def _rate_limit_wait(self):
-        """Wait if necessary to respect rate limits."""
-        elapsed = time.time() - self.last_request_time
-        if elapsed < self.min_request_interval:
-            wait_time = self.min_request_interval - elapsed
-            print(f"⏳ Rate limiting: waiting {wait_time:.1f}s...")
-            time.sleep(wait_time)
-        self.last_request_time = time.time()
-    
-    def _make_request(self, url: str, params: Optional[Dict] = None, max_retries: int = 3):
+    def _make_request(self, url: str, params: Optional[Dict] = None, max_retries: int = 5):
         """
         Make a request with rate limiting and retry logic.
         
@@ -47,19 +50,32 @@ class BallchasingClient:
         Returns:
             Response JSON
         """
+        _, _, body = self._request(url, params=params, max_retries=max_retries)
+        return body
+    
+    def _request(self,
+                 url: str,
+                 params: Optional[Dict] = None,
+                 headers: Optional[Dict] = None,
+                 max_retries: int = 5) -> Tuple[int, Mapping[str, str], Optional[Dict]]:
+        """
+        Make a request and return the status, headers and JSON body (None on 304).
+        """
         for attempt in range(max_retries):
-            self._rate_limit_wait()
+            self.rate_limiter.acquire_blocking()
             
             try:
-                response = self.session.get(url, params=params)
+                response = self.session.get(url, params=params, headers=headers)
+                self.rate_limiter.update_from_headers(response.headers)
                 response.raise_for_status()
-                return response.json()
+                if response.status_code == 304:
+                    return response.status_code, response.headers, None
+                return response.status_code, response.headers, response.json()
                 
             except HTTPError as e:
                 if e.response.status_code == 429:  # Rate limit error
-                    wait_time = 60 * (attempt + 1)  # Wait 60s, 120s, 180s...
-                    print(f"⚠️  Rate limit hit. Waiting {wait_time}s before retry {attempt + 1}/{max_retries}...")
-                    time.sleep(wait_time)
+                    wait_time = self.rate_limiter.backoff_delay(attempt, e.response.headers)
+                    print(f"⚠️  Rate limit hit. Backing off {wait_time:.1f}s before retry {attempt + 1}/{max_retries}...")
                 else:
                     raise  # Re-raise other HTTP errors
         
@@ -104,7 +120,244 @@ class BallchasingClient:
         Returns:
             Dictionary with full replay data including player stats
         """
-        return self._make_request(f"{self.BASE_URL}/replays/{replay_id}")
+        url = f"{self.BASE_URL}/replays/{replay_id}"
+        if self.cache is None:
+            return self._make_request(url)
+        
+        cached = self.cache.get(replay_id)
+        if cached and cached.is_final:
+            return cached.body
+        
+        # Replay is new or still processing: revalidate against the server
+        status, headers, body = self._request(
+            url, headers=cached.conditional_headers() if cached else None
+        )
+        if status == 304 and cached:
+            self.cache.refresh(replay_id)
+            return cached.body
+        
+        self.cache.put(replay_id, body, headers.get("ETag"), headers.get("Last-Modified"))
+        return body
+
+
+class AsyncBallchasingClient:
+    """Asyncio-native client for the Ballchasing API.
+    
+    Mirrors the BallchasingClient surface but never blocks the event loop,
+    so it can share a loop with the Discord gateway.
+    """
+    
+    BASE_URL = "https://ballchasing.com/api"
+    
+    def __init__(self,
+                 api_key: str,
+                 max_concurrency: int = 4,
+                 rate_limiter: Optional[RateLimiter] = None,
+                 cache: Optional[ReplayCache] = None,
+                 base_url: Optional[str] = None):
+        """
+        Initialize the async Ballchasing client.
+        
+        Args:
+            api_key: Your Ballchasing API token
+            max_concurrency: Maximum number of requests in flight at once
+            rate_limiter: Shared rate limiter (defaults to one for BALLCHASING_TIER)
+            cache: Optional on-disk cache for replay details
+            base_url: API root to use instead of ballchasing.com (e.g. a local stand-in)
+        """
+        if base_url:
+            self.BASE_URL = base_url.rstrip("/")
+        self.api_key = api_key
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.rate_limiter = rate_limiter or create_rate_limiter()
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.cache = cache
+    
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Lazily create the HTTP session inside the running event loop."""
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(headers={"Authorization": self.api_key})
+        return self.session
+    
+    async def _make_request(self, url: str, params: Optional[Dict] = None, max_retries: int = 5):
+        """
+        Make a request with rate limiting and retry logic.
+        
+        Args:
+            url: Full URL to request
+            params: Query parameters
+            max_retries: Number of times to retry on 429 errors
+            
+        Returns:
+            Response JSON
+        """
+        _, _, body = await self._request(url, params=params, max_retries=max_retries)
+        return body
+    
+    async def _request(self,
+                       url: str,
+                       params: Optional[Dict] = None,
+                       headers: Optional[Dict] = None,
+                       max_retries: int = 5) -> Tuple[int, Mapping[str, str], Optional[Dict]]:
+        """
+        Make a request and return the status, headers and JSON body (None on 304).
+        """
+        session = await self._get_session()
+        
+        for attempt in range(max_retries):
+            await self.rate_limiter.acquire()
+            
+            async with self._semaphore:
+                async with session.get(url, params=params, headers=headers) as response:
+                    self.rate_limiter.update_from_headers(response.headers)
+                    if response.status != 429:
+                        response.raise_for_status()
+                        if response.status == 304:
+                            return response.status, response.headers, None
+                        return response.status, response.headers, await response.json()
+                    
+                    # The limiter pauses every caller; the next acquire() waits it out
+                    wait_time = self.rate_limiter.backoff_delay(attempt, response.headers)
+                    print(f"⚠️  Rate limit hit. Backing off {wait_time:.1f}s before retry {attempt + 1}/{max_retries}...")
+        
+        raise HTTPError("Max retries exceeded due to rate limiting")
+    
+    async def get_replays(self,
+                          uploader: Optional[str] = None,
+                          count: int = 10,
+                          sort_by: str = "replay-date",
+                          sort_dir: str = "desc") -> List[Dict]:
+        """
+        Fetch a list of replays.
+        
+        Args:
+            uploader: Steam ID or 'me' to filter by uploader
+            count: Number of replays to fetch (max 200)
+            sort_by: Field to sort by (replay-date, upload-date, etc.)
+            sort_dir: Sort direction (asc or desc)
+            
+        Returns:
+            List of replay metadata dictionaries
+        """
+        params = {
+            "count": count,
+            "sort-by": sort_by,
+            "sort-dir": sort_dir
+        }
+        
+        if uploader:
+            params["uploader"] = uploader
+        
+        data = await self._make_request(f"{self.BASE_URL}/replays", params=params)
+        return data.get("list", [])
+    
+    async def iter_replay_pages(self,
+                                filters: Optional[Dict] = None,
+                                start_url: Optional[str] = None,
+                                count: int = 200) -> AsyncIterator[Tuple[List[Dict], Optional[str]]]:
+        """
+        Walk the /replays listing page by page, following the `next` cursor.
+        
+        Args:
+            filters: Ballchasing list filters (e.g. playlist, player-id,
+                     replay-date-after, replay-date-before, uploader)
+            start_url: `next` URL to resume from (filters are already encoded in it)
+            count: Replays per page (max 200)
+            
+        Yields:
+            (replays on this page, URL of the next page or None on the last page)
+        """
+        if start_url:
+            url, params = start_url, None
+        else:
+            url = f"{self.BASE_URL}/replays"
+            params = {"count": count, **(filters or {})}
+        
+        while url:
+            data = await self._make_request(url, params=params)
+            next_url = data.get("next")
+            yield data.get("list", []), next_url
+            url, params = next_url, None
+    
+    async def get_replay_details(self, replay_id: str) -> Dict:
+        """
+        Get detailed stats for a specific replay.
+        
+        Args:
+            replay_id: The replay ID
+            
+        Returns:
+            Dictionary with full replay data including player stats
+        """
+        url = f"{self.BASE_URL}/replays/{replay_id}"
+        if self.cache is None:
+            return await self._make_request(url)
+        
+        # Cache reads and writes touch the disk, so keep them off the event loop
+        cached = await asyncio.to_thread(self.cache.get, replay_id)
+        if cached and cached.is_final:
+            return cached.body
+        
+        # Replay is new or still processing: revalidate against the server
+        status, headers, body = await self._request(
+            url, headers=cached.conditional_headers() if cached else None
+        )
+        if status == 304 and cached:
+            await asyncio.to_thread(self.cache.refresh, replay_id)
+            return cached.body
+        
+        await asyncio.to_thread(
+            self.cache.put, replay_id, body, headers.get("ETag"), headers.get("Last-Modified")
+        )
+        return body
+    
+    async def get_many_replay_details(self, replay_ids: Iterable[str]) -> Dict[str, Dict]:
+        """
+        Fetch details for several replays concurrently under the shared rate limit.
+        
+        Args:
+            replay_ids: Replay IDs to fetch
+            
+        Returns:
+            Dictionary mapping replay ID to its details. Replays that failed
+            to download are left out and reported on stdout.
+        """
+        replay_ids = list(replay_ids)
+        results = await asyncio.gather(
+            *(self.get_replay_details(replay_id) for replay_id in replay_ids),
+            return_exceptions=True
+        )
+        
+        details = {}
+        for replay_id, result in zip(replay_ids, results):
+            if isinstance(result, Exception):
+                print(f"❌ Failed to fetch replay {replay_id}: {result}")
+                continue
+            details[replay_id] = result
+        return details
+    
+    async def close(self):
+        """Close the underlying HTTP session."""
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+
+
+def find_replay_player(details: Dict, steam_id: str) -> Optional[Dict]:
+    """
+    Find a player by Steam ID in a replay's details.
+    
+    Args:
+        details: Full replay details from get_replay_details
+        steam_id: Player's Steam ID
+        
+    Returns:
+        The player's entry (with 'stats') or None if they didn't play
+    """
+    for team in ('blue', 'orange'):
+        for player in details.get(team, {}).get('players', []):
+            if player.get('id', {}).get('id') == steam_id:
+                return player
+    return None
 
 
 # Helper function to create client from environment
@@ -113,4 +366,14 @@ def create_client() -> BallchasingClient:
     api_key = os.getenv("BALLCHASING_API_KEY")
     if not api_key:
         raise ValueError("BALLCHASING_API_KEY not found in environment")
-    return BallchasingClient(api_key)
\ No newline at end of file
+    return BallchasingClient(api_key, cache=create_replay_cache(),
+                             base_url=os.getenv("BALLCHASING_BASE_URL"))
+
+
+def create_async_client() -> AsyncBallchasingClient:
+    """Create an async Ballchasing client using the API key from environment."""
+    api_key = os.getenv("BALLCHASING_API_KEY")
+    if not api_key:
+        raise ValueError("BALLCHASING_API_KEY not found in environment")
+    return AsyncBallchasingClient(api_key, cache=create_replay_cache(),
+                                  base_url=os.getenv("BALLCHASING_BASE_URL"))
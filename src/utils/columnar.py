@@ -0,0 +1,306 @@
+"""In-memory struct-of-arrays copy of match stats for vectorized analytics (needs NumPy)."""
+
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # Optional: without NumPy every read is answered by SQLite
+    np = None
+
+
+def columnar_available() -> bool:
+    """Whether NumPy is installed, so ColumnarStats can be used."""
+    return np is not None
+
+
+class ColumnarStats:
+    """
+    One player's matches held as one array per column, oldest first.
+
+    Stat columns are float64 arrays (NaN for NULL), next to result, playlist,
+    date and replay ID arrays. Loaded once from `matches`; after that each
+    refresh() appends only rows whose rowid is past the last one seen, into
+    arrays with spare capacity. The matches_changes counter (bumped by
+    triggers on UPDATE and DELETE, including the delete half of INSERT OR
+    REPLACE) tells when rows were rewritten and everything must be reloaded.
+
+    Reads bring the arrays up to date first, unless another thread is
+    already refreshing them: then they answer from the arrays the last
+    completed refresh published instead of waiting on its SQLite fetch.
+    Only the first load is waited for, as there's nothing to answer from
+    before it. Either way reads never see half of a refresh.
+    """
+
+    def __init__(self, db, player_id: Optional[str], columns: Sequence[str]):
+        """
+        Initialize the cache; nothing is loaded until the first refresh().
+
+        Args:
+            db: MatchDatabase to mirror (needs its read pool)
+            player_id: Player whose matches are held (None for every player)
+            columns: Numeric matches columns to hold
+        """
+        if np is None:
+            raise RuntimeError("ColumnarStats needs NumPy (pip install numpy)")
+        self.db = db
+        self.player_id = player_id
+        self.columns = tuple(columns)
+        self._lock = threading.Lock()
+        self._version: Optional[int] = None
+        self._rewrites: Optional[int] = None
+        self._last_rowid = 0
+        self._size = 0
+        self._arrays: Dict[str, Any] = {}
+        self._reset(0)
+        # (data version, filled part of every array) as of the last completed refresh
+        self._published: Tuple[Optional[int], Dict[str, Any]] = (None, dict(self._arrays))
+        self._loaded = False
+        self._reads = threading.local()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _reset(self, capacity: int):
+        """Empty arrays with room for `capacity` rows."""
+        self._size = 0
+        self._last_rowid = 0
+        self._arrays = {column: np.empty(capacity, dtype=np.float64) for column in self.columns}
+        # Sort key: NULL dates order before every real date, as in SQLite
+        self._arrays['date_epoch'] = np.empty(capacity, dtype=np.float64)
+        self._arrays['won'] = np.empty(capacity, dtype=bool)
+        self._arrays['playlist'] = np.empty(capacity, dtype=object)
+        self._arrays['replay_id'] = np.empty(capacity, dtype=object)
+
+    def refresh(self) -> bool:
+        """
+        Bring the arrays up to date with the last commit.
+
+        Returns:
+            True if anything was read from the database
+        """
+        version = self.db.read_pool.data_version()
+        with self._lock:
+            return self._refresh(version)
+
+    def _refresh(self, version: int) -> bool:
+        """refresh() for a caller holding _lock."""
+        if version == self._version:
+            return False
+        with self.db._reader() as conn:
+            rewrites = conn.execute("SELECT rewrites FROM matches_changes").fetchone()[0]
+            if rewrites != self._rewrites:
+                self._reset(0)
+            self._append(self._fetch(conn, self._last_rowid))
+        self._version = version
+        self._rewrites = rewrites
+        # Appends go past these views and re-sorts build new arrays, so they stay intact
+        self._published = (version, {name: array[:self._size] for name, array in self._arrays.items()})
+        self._loaded = True
+        return True
+
+    def _fetch(self, conn, after_rowid: int) -> List[Tuple]:
+        """Rows in scope saved after `after_rowid`, in rowid order."""
+        conditions, params = ["rowid > ?"], [after_rowid]
+        if self.player_id is not None:
+            conditions.append("player_id = ?")
+            params.append(self.player_id)
+        cursor = conn.execute(f"""
+            SELECT rowid, replay_id, date_epoch, result, playlist, {', '.join(self.columns)}
+            FROM matches WHERE {' AND '.join(conditions)}
+            ORDER BY rowid
+        """, params)
+        return [tuple(row) for row in cursor.fetchall()]
+
+    def _append(self, rows: List[Tuple]):
+        """Add rows after the filled part, growing by doubling and re-sorting if needed."""
+        if not rows:
+            return
+        values = list(zip(*rows))
+        count = len(rows)
+        size = self._size
+        if size + count > len(self._arrays['won']):
+            capacity = max(size + count, 2 * len(self._arrays['won']), 1024)
+            grown = {}
+            for name, array in self._arrays.items():
+                grown[name] = np.empty(capacity, dtype=array.dtype)
+                grown[name][:size] = array[:size]
+            self._arrays = grown
+
+        arrays = self._arrays
+        block = slice(size, size + count)
+        arrays['replay_id'][block] = values[1]
+        arrays['date_epoch'][block] = np.array([-np.inf if d is None else d for d in values[2]], dtype=np.float64)
+        arrays['won'][block] = np.array(values[3]) == 'win'
+        arrays['playlist'][block] = values[4]
+        for offset, column in enumerate(self.columns, start=5):
+            arrays[column][block] = np.array(values[offset], dtype=np.float64)  # None -> NaN
+        self._last_rowid = max(self._last_rowid, max(values[0]))
+
+        # New matches are usually the newest: only re-sort when one arrived out of order.
+        # The filled part is already sorted, so checking from its last row on is enough
+        checked = slice(max(size - 1, 0), size + count)
+        if not _in_order(arrays['date_epoch'][checked], arrays['replay_id'][checked]):
+            order = np.lexsort((arrays['replay_id'][:size + count].astype(str), arrays['date_epoch'][:size + count]))
+            for name in arrays:
+                arrays[name] = arrays[name][order]
+        self._size = size + count
+
+    def _snapshot(self) -> Dict[str, Any]:
+        """Views of the filled part of every array, consistent with one refresh."""
+        version = self.db.read_pool.data_version()
+        # A refresh running on another thread publishes when it's done: once
+        # something has been published, answer from that instead of waiting
+        if self._lock.acquire(blocking=not self._loaded):
+            try:
+                self._refresh(version)
+            finally:
+                self._lock.release()
+        published_version, arrays = self._published
+        self._reads.behind = published_version != version
+        return arrays
+
+    def read_behind(self) -> bool:
+        """Whether this thread's last read answered from a refresh older than the latest commit."""
+        return getattr(self._reads, 'behind', False)
+
+    def _selection(self, arrays: Dict[str, Any], result: Optional[str], playlist: Optional[str],
+                   last_n_matches: Optional[int]):
+        """Positions of the newest `last_n_matches` rows matching the filters, oldest first."""
+        mask = np.ones(len(arrays['won']), dtype=bool)
+        if result is not None:
+            mask &= arrays['won'] == (result == 'win')
+        if playlist is not None:
+            mask &= arrays['playlist'] == playlist
+        positions = np.flatnonzero(mask)
+        if last_n_matches is not None:
+            positions = positions[max(len(positions) - last_n_matches, 0):]
+        return positions
+
+    def has_columns(self, columns: Sequence[str]) -> bool:
+        """Whether every column is held (registered later ones aren't until a reload)."""
+        return all(column in self.columns for column in columns)
+
+    def averages(self,
+                 stats: Optional[Sequence[str]] = None,
+                 last_n_matches: Optional[int] = None,
+                 result: Optional[str] = None,
+                 playlist: Optional[str] = None) -> Dict:
+        """
+        Averages over the most recent matches, like MatchDatabase.aggregate with 'avg'.
+
+        Args:
+            stats: Columns to average (default: every held column)
+            last_n_matches: Only the most recent N matches (after the filters)
+            result: Only 'win' or 'loss' matches
+            playlist: Only this playlist
+
+        Returns:
+            Dictionary with 'count' and 'avg_<column>' (None where every value is NULL)
+        """
+        arrays = self._snapshot()
+        positions = self._selection(arrays, result, playlist, last_n_matches)
+        averages = {'count': len(positions)}
+        for column in stats or self.columns:
+            averages[f'avg_{column}'] = _nanmean(arrays[column][positions])
+        return averages
+
+    def win_loss_deltas(self,
+                        stats: Optional[Sequence[str]] = None,
+                        last_n_matches: int = 20,
+                        playlist: Optional[str] = None) -> Dict[str, Optional[float]]:
+        """
+        How much higher each stat averages in wins than in losses.
+
+        Args:
+            stats: Columns to compare (default: every held column)
+            last_n_matches: Number of recent wins and of recent losses
+            playlist: Only this playlist
+
+        Returns:
+            Dictionary of column -> average in wins minus average in losses
+        """
+        arrays = self._snapshot()
+        wins = self._selection(arrays, 'win', playlist, last_n_matches)
+        losses = self._selection(arrays, 'loss', playlist, last_n_matches)
+        deltas = {}
+        for column in stats or self.columns:
+            win_average = _nanmean(arrays[column][wins])
+            loss_average = _nanmean(arrays[column][losses])
+            deltas[column] = None if win_average is None or loss_average is None else win_average - loss_average
+        return deltas
+
+    def win_correlations(self,
+                         stats: Optional[Sequence[str]] = None,
+                         last_n_matches: Optional[int] = None,
+                         playlist: Optional[str] = None) -> Dict[str, Optional[float]]:
+        """
+        Correlation of each stat with winning (point-biserial, i.e. Pearson against won = 1/0).
+
+        Args:
+            stats: Columns to correlate (default: every held column)
+            last_n_matches: Only the most recent N matches
+            playlist: Only this playlist
+
+        Returns:
+            Dictionary of column -> correlation in [-1, 1] (None if a side doesn't vary)
+        """
+        arrays = self._snapshot()
+        positions = self._selection(arrays, None, playlist, last_n_matches)
+        won = arrays['won'][positions].astype(np.float64)
+        correlations = {}
+        for column in stats or self.columns:
+            values = arrays[column][positions]
+            present = ~np.isnan(values)
+            x, y = values[present], won[present]
+            if len(x) < 2 or x.std() == 0 or y.std() == 0:
+                correlations[column] = None
+                continue
+            correlations[column] = float(np.mean((x - x.mean()) * (y - y.mean())) / (x.std() * y.std()))
+        return correlations
+
+    def percentiles(self,
+                    stats: Optional[Sequence[str]] = None,
+                    percents: Sequence[int] = (10, 50, 90),
+                    last_n_matches: Optional[int] = None,
+                    result: Optional[str] = None,
+                    playlist: Optional[str] = None) -> Dict[str, Dict[str, Optional[float]]]:
+        """
+        Nearest-rank percentiles, as the 'pNN' aggregates of MatchDatabase.aggregate.
+
+        Args:
+            stats: Columns to summarize (default: every held column)
+            percents: Whole percentages
+            last_n_matches: Only the most recent N matches (after the filters)
+            result: Only 'win' or 'loss' matches
+            playlist: Only this playlist
+
+        Returns:
+            Dictionary of column -> {'p<percent>': value}
+        """
+        arrays = self._snapshot()
+        positions = self._selection(arrays, result, playlist, last_n_matches)
+        summary = {}
+        for column in stats or self.columns:
+            values = arrays[column][positions]
+            values = values[~np.isnan(values)]
+            if not len(values):
+                summary[column] = {f'p{percent}': None for percent in percents}
+                continue
+            points = np.percentile(values, list(percents), method='inverted_cdf')
+            summary[column] = {f'p{percent}': float(point) for percent, point in zip(percents, points)}
+        return summary
+
+
+def _nanmean(values) -> Optional[float]:
+    """Mean ignoring NaNs (SQL AVG ignores NULLs), or None when nothing's left."""
+    present = values[~np.isnan(values)]
+    return float(present.mean()) if len(present) else None
+
+
+def _in_order(dates, ids) -> bool:
+    """Whether rows are sorted by (date, replay ID), the order SQL's recency queries use."""
+    if np.any(dates[1:] < dates[:-1]):
+        return False
+    # Matches played at the same instant (or both undated) are ordered by replay ID
+    return not any(ids[i] > ids[i + 1] for i in np.flatnonzero(dates[1:] == dates[:-1]))
@@ -1,31 +1,888 @@
 import sqlite3
 import json
 import os
-from datetime import datetime
-from typing import List, Dict, Optional
+import re
+import base64
+import queue
+import zlib
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import wraps
+from datetime import datetime, timezone
+from typing import List, Dict, Optional, Iterable, Iterator, Sequence, Set, Tuple, Any, Callable
+from itertools import islice
 from pathlib import Path
 
+from .aggregation import compile_aggregate
+from .columnar import ColumnarStats, columnar_available
+
+
+# Columns written by save_match, in _match_row order
+MATCH_INSERT_COLUMNS = (
+    'replay_id', 'player_id', 'date', 'date_epoch', 'duration', 'playlist', 'result', 'team_color',
+    'goals', 'assists', 'saves', 'shots', 'score', 'shooting_percentage',
+    'avg_boost', 'percent_zero_boost', 'percent_full_boost',
+    'amount_collected', 'amount_stolen',
+    'avg_speed', 'time_supersonic', 'percent_ground', 'percent_low_air', 'percent_high_air',
+    'percent_defensive_third', 'percent_offensive_third', 'percent_neutral_third',
+    'time_behind_ball', 'time_infront_ball',
+    'analyzed_at',
+)
+
+
+def insert_match_sql(extra_columns: Tuple[str, ...] = ()) -> str:
+    """INSERT OR REPLACE for a matches row, plus any registered stat columns."""
+    columns = MATCH_INSERT_COLUMNS + tuple(extra_columns)
+    return (f"INSERT OR REPLACE INTO matches ({', '.join(columns)}) "
+            f"VALUES ({', '.join('?' * len(columns))})")
+
+INSERT_STATS_SQL = "INSERT OR REPLACE INTO match_stats (player_id, replay_id, stats) VALUES (?, ?, ?)"
+
+# Every participant's stats kept in match_players: (column, dotted path into their stats)
+PARTICIPANT_STATS = (
+    ('goals', 'core.goals'),
+    ('assists', 'core.assists'),
+    ('saves', 'core.saves'),
+    ('shots', 'core.shots'),
+    ('score', 'core.score'),
+    ('avg_boost', 'boost.avg_amount'),
+    ('amount_collected', 'boost.amount_collected'),
+    ('percent_zero_boost', 'boost.percent_zero_boost'),
+    ('avg_speed', 'movement.avg_speed'),
+    ('time_supersonic', 'movement.time_supersonic_speed'),
+    ('percent_defensive_third', 'positioning.percent_defensive_third'),
+    ('percent_neutral_third', 'positioning.percent_neutral_third'),
+    ('percent_offensive_third', 'positioning.percent_offensive_third'),
+    ('time_behind_ball', 'positioning.time_behind_ball'),
+)
+PARTICIPANT_COLUMNS = ('replay_id', 'platform', 'platform_id', 'name', 'team_color', 'result') + tuple(
+    column for column, _ in PARTICIPANT_STATS)
+INSERT_PARTICIPANT_SQL = (f"INSERT OR REPLACE INTO match_players ({', '.join(PARTICIPANT_COLUMNS)}) "
+                          f"VALUES ({', '.join('?' * len(PARTICIPANT_COLUMNS))})")
+
+# Numeric columns that can be filtered on and sorted by
+STAT_COLUMNS = (
+    'duration',
+    'goals', 'assists', 'saves', 'shots', 'score', 'shooting_percentage',
+    'avg_boost', 'percent_zero_boost', 'percent_full_boost', 'amount_collected', 'amount_stolen',
+    'avg_speed', 'time_supersonic', 'percent_ground', 'percent_low_air', 'percent_high_air',
+    'percent_defensive_third', 'percent_offensive_third', 'percent_neutral_third',
+    'time_behind_ball', 'time_infront_ball',
+)
+
+# Every built-in matches column (the raw stats live in match_stats)
+SUMMARY_COLUMNS = ('replay_id', 'player_id', 'date', 'date_epoch', 'playlist', 'result', 'team_color') + STAT_COLUMNS + ('analyzed_at',)
+
+# Window sizes kept as maintained win/loss aggregates; other sizes fall back to a query
+ROLLING_WINDOWS = (10, 20)
+
+# Playlist key of the aggregates that span every playlist
+ALL_PLAYLISTS = '*'
+
+# Win/loss comparison fields and the column each one averages
+WIN_LOSS_AVERAGES = (
+    ('avg_goals', 'goals'),
+    ('avg_assists', 'assists'),
+    ('avg_saves', 'saves'),
+    ('avg_shots', 'shots'),
+    ('avg_shooting_pct', 'shooting_percentage'),
+    ('avg_boost', 'avg_boost'),
+    ('avg_percent_zero_boost', 'percent_zero_boost'),
+    ('avg_percent_full_boost', 'percent_full_boost'),
+    ('avg_boost_collected', 'amount_collected'),
+    ('avg_speed', 'avg_speed'),
+    ('avg_time_supersonic', 'time_supersonic'),
+    ('avg_percent_ground', 'percent_ground'),
+    ('avg_percent_low_air', 'percent_low_air'),
+    ('avg_percent_high_air', 'percent_high_air'),
+    ('avg_percent_defensive_third', 'percent_defensive_third'),
+    ('avg_percent_offensive_third', 'percent_offensive_third'),
+    ('avg_percent_neutral_third', 'percent_neutral_third'),
+    ('avg_time_behind_ball', 'time_behind_ball'),
+)
+ROLLING_SUM_COLUMNS = tuple(column for _, column in WIN_LOSS_AVERAGES)
+
+# get_averages fields: the win/loss ones plus a few more
+AVERAGE_FIELDS = WIN_LOSS_AVERAGES + (
+    ('avg_score', 'score'),
+    ('avg_boost_stolen', 'amount_stolen'),
+    ('avg_time_infront_ball', 'time_infront_ball'),
+)
+
+
+# Registered stat paths are dotted keys into a player's stats, e.g. 'movement.count_powerslide'
+STAT_PATH_PATTERN = re.compile(r"^[a-z0-9_]+(\.[a-z0-9_]+)+$")
+STAT_COLUMN_NAME_PATTERN = re.compile(r"^[a-z][a-z0-9_]*$")
+
+
+def stat_path_value(stats: Dict, path: str) -> Optional[float]:
+    """
+    Look up a numeric stat by dotted path.
+    
+    Args:
+        stats: A player's Ballchasing stats dictionary
+        path: Dotted path such as 'demo.inflicted'
+        
+    Returns:
+        The value as a float, or None if it's missing or not numeric
+    """
+    value: Any = stats
+    for key in path.split('.'):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    if isinstance(value, (int, float)):
+        return float(value)
+    return None
+
+
+def date_to_epoch(value: str) -> int:
+    """
+    Convert an ISO 8601 date to UTC epoch seconds.
+
+    Ballchasing dates carry the uploader's local offset, so their text
+    doesn't sort chronologically across offsets (or DST changes); the
+    epoch does. Values without an offset are taken as UTC.
+
+    Args:
+        value: Date such as '2024-10-20T21:15:03+02:00', '2024-10-20T19:15:03Z' or '2024-10-20'
+
+    Returns:
+        Seconds since 1970-01-01T00:00:00Z
+
+    Raises:
+        ValueError: If the value isn't an ISO 8601 date
+    """
+    moment = datetime.fromisoformat(value.strip().replace('Z', '+00:00'))
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp())
+
+
+def _epoch_or_none(value: Optional[str]) -> Optional[int]:
+    """date_to_epoch for stored dates: missing or malformed dates become NULL."""
+    if not value:
+        return None
+    try:
+        return date_to_epoch(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _fill_date_epoch(conn: sqlite3.Connection, rows: List[sqlite3.Row]):
+    """Derive date_epoch for rows saved before the column existed."""
+    conn.executemany("UPDATE matches SET date_epoch = ? WHERE replay_id = ?",
+                     [(_epoch_or_none(date), replay_id) for replay_id, date in rows])
+
+
+def encode_stats(stats: Dict) -> bytes:
+    """Compress a Ballchasing stats dictionary for the match_stats table."""
+    return zlib.compress(json.dumps(stats, separators=(',', ':')).encode())
+
+
+def decode_stats(blob: bytes) -> Dict:
+    """Inverse of encode_stats."""
+    return json.loads(zlib.decompress(blob))
+
+
+def _compress_stats_json(conn: sqlite3.Connection):
+    """Copy matches.stats_json into match_stats, compressed."""
+    source = conn.execute("SELECT replay_id, stats_json FROM matches WHERE stats_json IS NOT NULL")
+    while True:
+        rows = source.fetchmany(500)
+        if not rows:
+            break
+        conn.executemany("INSERT OR REPLACE INTO match_stats (replay_id, stats) VALUES (?, ?)", [
+            (replay_id, encode_stats(json.loads(stats_json))) for replay_id, stats_json in rows
+        ])
+
+
+def _rolling_members_sql() -> str:
+    """SELECT of every (player, result, playlist, window) membership, computed from the matches table."""
+    windows = " UNION ALL ".join(f"SELECT {int(size)} AS size" for size in ROLLING_WINDOWS)
+    return f"""
+        SELECT ranked.player_id, ranked.result, ranked.playlist, w.size AS window_size,
+               ranked.replay_id, ranked.date_epoch
+        FROM (
+            SELECT player_id, result, '{ALL_PLAYLISTS}' AS playlist, replay_id, date_epoch,
+                   ROW_NUMBER() OVER (PARTITION BY player_id, result
+                                      ORDER BY date_epoch DESC, replay_id DESC) AS position
+            FROM matches
+            UNION ALL
+            SELECT player_id, result, COALESCE(playlist, '') AS playlist, replay_id, date_epoch,
+                   ROW_NUMBER() OVER (PARTITION BY player_id, result, COALESCE(playlist, '')
+                                      ORDER BY date_epoch DESC, replay_id DESC) AS position
+            FROM matches
+        ) ranked
+        JOIN ({windows}) w ON ranked.position <= w.size
+    """
+
+
+def _rolling_totals_sql(members: str) -> str:
+    """SELECT of count and per-column sums for each window in `members`."""
+    sums = ", ".join(f"TOTAL(m.{column}) AS sum_{column}" for column in ROLLING_SUM_COLUMNS)
+    return f"""
+        SELECT mem.player_id, mem.result, mem.playlist, mem.window_size, COUNT(*) AS match_count, {sums}
+        FROM {members} mem
+        JOIN matches m ON m.player_id = mem.player_id AND m.replay_id = mem.replay_id
+        GROUP BY mem.player_id, mem.result, mem.playlist, mem.window_size
+    """
+
+
+def _rebuild_rolling_aggregates(conn: sqlite3.Connection):
+    """Recompute the rolling win/loss aggregates from the raw match rows."""
+    sum_columns = ", ".join(f"sum_{column}" for column in ROLLING_SUM_COLUMNS)
+    conn.execute("DELETE FROM rolling_aggregate_members")
+    conn.execute(f"""
+        INSERT INTO rolling_aggregate_members (player_id, result, playlist, window_size, replay_id, date_epoch)
+        {_rolling_members_sql()}
+    """)
+    conn.execute("DELETE FROM rolling_aggregates")
+    conn.execute(f"""
+        INSERT INTO rolling_aggregates (player_id, result, playlist, window_size, match_count, {sum_columns})
+        {_rolling_totals_sql("rolling_aggregate_members")}
+    """)
+
+
+def _rolling_scopes(conn: sqlite3.Connection, where: str, params: Sequence[Any]) -> Set[Tuple[str, str, str]]:
+    """(player_id, result, playlist) windows the matches rows selected by `where` belong to."""
+    scopes = set()
+    cursor = conn.execute(f"SELECT player_id, result, COALESCE(playlist, '') FROM matches WHERE {where}", params)
+    for player_id, result, playlist in cursor.fetchall():
+        scopes.add((player_id, result, ALL_PLAYLISTS))
+        scopes.add((player_id, result, playlist))
+    return scopes
+
+
+def _recount_rolling_scopes(conn: sqlite3.Connection, scopes: Iterable[Tuple[str, str, str]]):
+    """
+    Recompute the rolling aggregates of some (player_id, result, playlist) scopes.
+    
+    Each scope reads only its newest max(ROLLING_WINDOWS) matches, by index,
+    so the cost depends on how many scopes a write touched rather than on
+    the size of the history.
+    """
+    sum_columns = ", ".join(f"sum_{column}" for column in ROLLING_SUM_COLUMNS)
+    scope_where = "player_id = ? AND result = ? AND playlist = ?"
+    for scope in scopes:
+        player_id, result, playlist = scope
+        conditions, params = ["player_id = ?", "result = ?"], [player_id, result]
+        if playlist == '':
+            conditions.append("(playlist IS NULL OR playlist = '')")
+        elif playlist != ALL_PLAYLISTS:
+            conditions.append("playlist = ?")
+            params.append(playlist)
+        newest = conn.execute(f"""
+            SELECT replay_id, date_epoch FROM matches WHERE {' AND '.join(conditions)}
+            ORDER BY date_epoch DESC, replay_id DESC LIMIT ?
+        """, params + [max(ROLLING_WINDOWS)]).fetchall()
+        
+        conn.execute(f"DELETE FROM rolling_aggregate_members WHERE {scope_where}", scope)
+        conn.executemany("""
+            INSERT INTO rolling_aggregate_members (player_id, result, playlist, window_size, replay_id, date_epoch)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, [scope + (size, replay_id, date_epoch)
+              for size in ROLLING_WINDOWS for replay_id, date_epoch in newest[:size]])
+        conn.execute(f"DELETE FROM rolling_aggregates WHERE {scope_where}", scope)
+        conn.execute(f"""
+            INSERT INTO rolling_aggregates (player_id, result, playlist, window_size, match_count, {sum_columns})
+            {_rolling_totals_sql(f"(SELECT * FROM rolling_aggregate_members WHERE {scope_where})")}
+        """, scope)
+
+
+# sync_state key holding the player that matches saved before migration 6 belong to
+LEGACY_PLAYER_KEY = "legacy_player_id"
+
+
+def _set_aside_for_player_key(conn: sqlite3.Connection, table: str):
+    """
+    Rename `table` to <table>_legacy and recreate it, empty, with a leading
+    player_id and a (player_id, replay_id) primary key.
+    """
+    columns = [(name, kind) for _, name, kind, *_ in conn.execute(f"PRAGMA table_info({table})")]
+    definitions = ", ".join(
+        f"{name} {kind} NOT NULL" if name == 'replay_id' else f"{name} {kind}".strip()
+        for name, kind in columns
+    )
+    # The legacy copy is only walked by its primary key; free the other index names
+    indexes = conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+                           (table,)).fetchall()
+    for (index,) in indexes:
+        conn.execute(f"DROP INDEX {index}")
+    conn.execute(f"ALTER TABLE {table} RENAME TO {table}_legacy")
+    conn.execute(f"""
+        CREATE TABLE {table} (
+            player_id TEXT NOT NULL,
+            {definitions},
+            PRIMARY KEY (player_id, replay_id)
+        )
+    """)
+
+
+def _partition_by_player(conn: sqlite3.Connection, owner: Optional[str]):
+    """
+    Key matches, raw stats and rolling aggregates by player.
+    
+    Only the schema changes here: the existing rows move to *_legacy tables
+    and the matches.player_id backfill copies them back in chunks. They were
+    all the single tracked player's, so they're attributed to `owner` (the
+    opening MatchDatabase's player_id); with none given, a database that
+    already holds matches is left unmigrated rather than guessed at.
+    """
+    if owner is None and conn.execute("SELECT 1 FROM matches LIMIT 1").fetchone():
+        raise RuntimeError("Saved matches need an owner before they can be keyed by player: "
+                           "open the database with player_id (e.g. STEAM_ID) once to migrate it")
+    conn.execute("INSERT OR REPLACE INTO sync_state (key, value, updated_at) VALUES (?, ?, ?)",
+                 (LEGACY_PLAYER_KEY, owner or '', datetime.now().isoformat()))
+    _set_aside_for_player_key(conn, "matches")
+    _set_aside_for_player_key(conn, "match_stats")
+    
+    # Every access path now starts with the player
+    conn.execute("CREATE INDEX idx_matches_date ON matches (player_id, date_epoch, replay_id)")
+    conn.execute("CREATE INDEX idx_matches_result_date ON matches (player_id, result, date_epoch, replay_id)")
+    conn.execute("CREATE INDEX idx_matches_playlist_result_date "
+                 "ON matches (player_id, playlist, result, date_epoch, replay_id)")
+    # Replay-level checks (has anyone on the roster saved this replay?)
+    conn.execute("CREATE INDEX idx_matches_replay ON matches (replay_id)")
+    for (name,) in conn.execute("SELECT name FROM stat_columns WHERE indexed = 1").fetchall():
+        conn.execute(f"CREATE INDEX idx_matches_stat_{name} ON matches (player_id, {name}, replay_id)")
+    # Stat backfill checkpoints were replay_ids; the walk is now keyed by (player_id, replay_id)
+    conn.execute("UPDATE stat_columns SET backfill_after = NULL")
+    
+    # Recounted over the full history once the copy completes
+    conn.execute("DROP TABLE rolling_aggregates")
+    conn.execute("DROP TABLE rolling_aggregate_members")
+    conn.execute(f"""
+        CREATE TABLE rolling_aggregates (
+            player_id TEXT NOT NULL,
+            result TEXT NOT NULL,
+            playlist TEXT NOT NULL,
+            window_size INTEGER NOT NULL,
+            match_count INTEGER NOT NULL DEFAULT 0,
+            {", ".join(f"sum_{column} REAL NOT NULL DEFAULT 0" for column in ROLLING_SUM_COLUMNS)},
+            PRIMARY KEY (player_id, result, playlist, window_size)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE rolling_aggregate_members (
+            player_id TEXT NOT NULL,
+            result TEXT NOT NULL,
+            playlist TEXT NOT NULL,
+            window_size INTEGER NOT NULL,
+            replay_id TEXT NOT NULL,
+            date_epoch INTEGER,
+            PRIMARY KEY (player_id, result, playlist, window_size, replay_id)
+        )
+    """)
+    conn.execute("CREATE INDEX idx_rolling_members_oldest "
+                 "ON rolling_aggregate_members (player_id, result, playlist, window_size, date_epoch, replay_id)")
+    conn.execute("CREATE INDEX idx_rolling_members_replay ON rolling_aggregate_members (player_id, replay_id)")
+
+
+def _copy_legacy_matches(conn: sqlite3.Connection, rows: List[sqlite3.Row]):
+    """Copy a chunk of matches saved before migration 6, with their raw stats, to their owner."""
+    owner = conn.execute("SELECT value FROM sync_state WHERE key = ?", (LEGACY_PLAYER_KEY,)).fetchone()[0]
+    names = rows[0].keys()
+    values = []
+    for row in rows:
+        record = dict(row)
+        # Rows the date_epoch backfill hadn't reached before they were set aside
+        if record.get('date_epoch') is None:
+            record['date_epoch'] = _epoch_or_none(record['date'])
+        values.append((owner,) + tuple(record[name] for name in names))
+    # OR IGNORE: a row saved since the migration is newer than its legacy copy
+    conn.executemany(f"INSERT OR IGNORE INTO matches (player_id, {', '.join(names)}) "
+                     f"VALUES (?, {', '.join('?' * len(names))})", values)
+    
+    stats_names = ", ".join(row[1] for row in conn.execute("PRAGMA table_info(match_stats_legacy)"))
+    replay_ids = [row['replay_id'] for row in rows]
+    conn.execute(f"""
+        INSERT OR IGNORE INTO match_stats (player_id, {stats_names})
+        SELECT ?, {stats_names} FROM match_stats_legacy
+        WHERE replay_id IN ({', '.join('?' * len(replay_ids))})
+    """, [owner] + replay_ids)
+
+
+def _drop_legacy_matches(conn: sqlite3.Connection):
+    """Drop the tables the matches.player_id backfill copied from, and count the windows over all of it."""
+    conn.execute("DROP TABLE matches_legacy")
+    conn.execute("DROP TABLE match_stats_legacy")
+    conn.execute("DELETE FROM sync_state WHERE key = ?", (LEGACY_PLAYER_KEY,))
+    _rebuild_rolling_aggregates(conn)
+
+
+@dataclass(frozen=True)
+class Backfill:
+    """
+    Migration step that rewrites existing rows in small committed chunks.
+    
+    The migration itself only records the backfill; MatchDatabase.run_backfills()
+    then walks `source` in `key` order, one short transaction per chunk,
+    checkpointing in sync_state, so a large database is upgraded while
+    ingestion keeps writing and an interrupted run resumes where it stopped.
+    Later steps of the same migration must not depend on the backfilled
+    data; put that work in `on_complete`.
+    """
+    name: str
+    # SELECT including the key columns, without WHERE/ORDER BY/LIMIT
+    source: str
+    # Called with (connection, rows) for each chunk
+    apply: Callable[[sqlite3.Connection, List[sqlite3.Row]], None]
+    # Called once, in the transaction of the last chunk
+    on_complete: Optional[Callable[[sqlite3.Connection], None]] = None
+    # Unique, indexed columns the walk is ordered by
+    key: Tuple[str, ...] = ('replay_id',)
+    
+    @property
+    def state_key(self) -> str:
+        """sync_state key holding this backfill's checkpoint."""
+        return f"schema_backfill:{self.name}"
+
+
+@dataclass(frozen=True)
+class PlayerStep:
+    """Migration step that needs to know whose matches the database holds."""
+    # Called with (connection, the MatchDatabase's player_id or None)
+    apply: Callable[[sqlite3.Connection, Optional[str]], None]
+
+
+def _rebuild_rolling_aggregates_v2(conn: sqlite3.Connection):
+    """
+    Fill the rolling aggregates as migration 2 shipped it: keyed by result
+    and playlist, ordered by the raw date text.
+    
+    Frozen here because _rebuild_rolling_aggregates follows the current
+    schema; later migrations rebuild the tables in their own shape.
+    """
+    windows = " UNION ALL ".join(f"SELECT {int(size)} AS size" for size in ROLLING_WINDOWS)
+    sum_columns = ", ".join(f"sum_{column}" for column in ROLLING_SUM_COLUMNS)
+    sums = ", ".join(f"TOTAL(m.{column}) AS sum_{column}" for column in ROLLING_SUM_COLUMNS)
+    conn.execute("DELETE FROM rolling_aggregate_members")
+    conn.execute(f"""
+        INSERT INTO rolling_aggregate_members (result, playlist, window_size, replay_id, date)
+        SELECT ranked.result, ranked.playlist, w.size AS window_size, ranked.replay_id, ranked.date
+        FROM (
+            SELECT result, '{ALL_PLAYLISTS}' AS playlist, replay_id, date,
+                   ROW_NUMBER() OVER (PARTITION BY result ORDER BY date DESC, replay_id DESC) AS position
+            FROM matches
+            UNION ALL
+            SELECT result, COALESCE(playlist, '') AS playlist, replay_id, date,
+                   ROW_NUMBER() OVER (PARTITION BY result, COALESCE(playlist, '')
+                                      ORDER BY date DESC, replay_id DESC) AS position
+            FROM matches
+        ) ranked
+        JOIN ({windows}) w ON ranked.position <= w.size
+    """)
+    conn.execute("DELETE FROM rolling_aggregates")
+    conn.execute(f"""
+        INSERT INTO rolling_aggregates (result, playlist, window_size, match_count, {sum_columns})
+        SELECT mem.result, mem.playlist, mem.window_size, COUNT(*) AS match_count, {sums}
+        FROM rolling_aggregate_members mem
+        JOIN matches m ON m.replay_id = mem.replay_id
+        GROUP BY mem.result, mem.playlist, mem.window_size
+    """)
+
+
+# Ordered schema migrations: (user_version after applying, description, steps).
+# A step is an SQL statement, a callable taking the connection, a Backfill or a PlayerStep.
+# Append new entries; never edit or reorder ones that have shipped.
+SCHEMA_MIGRATIONS = [
+    (1, "Indexes for recent-match, win/loss and per-playlist access patterns", [
+        "DROP INDEX IF EXISTS idx_matches_date",
+        "DROP INDEX IF EXISTS idx_matches_result_date",
+        # replay_id is the keyset pagination tie-breaker, so it completes each index
+        "CREATE INDEX idx_matches_date ON matches (date, replay_id)",
+        "CREATE INDEX idx_matches_result_date ON matches (result, date, replay_id)",
+        "CREATE INDEX idx_matches_playlist_result_date ON matches (playlist, result, date, replay_id)",
+    ]),
+    (2, "Rolling win/loss aggregates", [
+        f"""CREATE TABLE rolling_aggregates (
+            result TEXT NOT NULL,
+            playlist TEXT NOT NULL,
+            window_size INTEGER NOT NULL,
+            match_count INTEGER NOT NULL DEFAULT 0,
+            {", ".join(f"sum_{column} REAL NOT NULL DEFAULT 0" for column in ROLLING_SUM_COLUMNS)},
+            PRIMARY KEY (result, playlist, window_size)
+        )""",
+        """CREATE TABLE rolling_aggregate_members (
+            result TEXT NOT NULL,
+            playlist TEXT NOT NULL,
+            window_size INTEGER NOT NULL,
+            replay_id TEXT NOT NULL,
+            date TIMESTAMP,
+            PRIMARY KEY (result, playlist, window_size, replay_id)
+        )""",
+        "CREATE INDEX idx_rolling_members_oldest "
+        "ON rolling_aggregate_members (result, playlist, window_size, date, replay_id)",
+        "CREATE INDEX idx_rolling_members_replay ON rolling_aggregate_members (replay_id)",
+        _rebuild_rolling_aggregates_v2,
+    ]),
+    (3, "Compressed raw stats in a side table", [
+        """CREATE TABLE match_stats (
+            replay_id TEXT PRIMARY KEY,
+            stats BLOB
+        )""",
+        _compress_stats_json,
+        "ALTER TABLE matches DROP COLUMN stats_json",
+    ]),
+    (4, "Registry of stat paths exposed as matches columns", [
+        """CREATE TABLE stat_columns (
+            name TEXT PRIMARY KEY,
+            path TEXT NOT NULL UNIQUE,
+            indexed INTEGER NOT NULL DEFAULT 0,
+            backfill_after TEXT,
+            backfilled INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP
+        )""",
+    ]),
+    (5, "UTC epoch date for ordering and date filters", [
+        "ALTER TABLE matches ADD COLUMN date_epoch INTEGER",
+        Backfill("matches.date_epoch", "SELECT replay_id, date FROM matches", _fill_date_epoch,
+                 # Windows are ranked by date_epoch, so they're recounted once it's complete
+                 on_complete=_rebuild_rolling_aggregates),
+        "DROP INDEX IF EXISTS idx_matches_date",
+        "DROP INDEX IF EXISTS idx_matches_result_date",
+        "DROP INDEX IF EXISTS idx_matches_playlist_result_date",
+        "CREATE INDEX idx_matches_date ON matches (date_epoch, replay_id)",
+        "CREATE INDEX idx_matches_result_date ON matches (result, date_epoch, replay_id)",
+        "CREATE INDEX idx_matches_playlist_result_date ON matches (playlist, result, date_epoch, replay_id)",
+        "DROP TABLE rolling_aggregate_members",
+        """CREATE TABLE rolling_aggregate_members (
+            result TEXT NOT NULL,
+            playlist TEXT NOT NULL,
+            window_size INTEGER NOT NULL,
+            replay_id TEXT NOT NULL,
+            date_epoch INTEGER,
+            PRIMARY KEY (result, playlist, window_size, replay_id)
+        )""",
+        "CREATE INDEX idx_rolling_members_oldest "
+        "ON rolling_aggregate_members (result, playlist, window_size, date_epoch, replay_id)",
+        "CREATE INDEX idx_rolling_members_replay ON rolling_aggregate_members (replay_id)",
+    ]),
+    (6, "Player identity: matches keyed by (player_id, replay_id)", [
+        PlayerStep(_partition_by_player),
+        Backfill("matches.player_id", "SELECT * FROM matches_legacy", _copy_legacy_matches,
+                 on_complete=_drop_legacy_matches),
+    ]),
+    (7, "Every participant of a saved match", [
+        # Only filled from here on: older matches kept just the tracked player's stats
+        f"""CREATE TABLE match_players (
+            replay_id TEXT NOT NULL,
+            platform TEXT NOT NULL,
+            platform_id TEXT NOT NULL,
+            name TEXT,
+            team_color TEXT NOT NULL,
+            result TEXT,
+            {", ".join(f"{column} REAL" for column, _ in PARTICIPANT_STATS)},
+            PRIMARY KEY (replay_id, platform, platform_id)
+        )""",
+        "CREATE INDEX idx_match_players_platform ON match_players (platform_id, platform, replay_id)",
+    ]),
+    (8, "Counter of rewritten matches rows, for caches that only append new ones", [
+        # New rows are found by rowid; anything else that changes a row bumps the counter.
+        # With recursive_triggers on, INSERT OR REPLACE's implicit delete fires the DELETE trigger
+        "CREATE TABLE matches_changes (rewrites INTEGER NOT NULL)",
+        "INSERT INTO matches_changes (rewrites) VALUES (0)",
+        """CREATE TRIGGER matches_rewritten_on_update AFTER UPDATE ON matches
+           BEGIN UPDATE matches_changes SET rewrites = rewrites + 1; END""",
+        """CREATE TRIGGER matches_rewritten_on_delete AFTER DELETE ON matches
+           BEGIN UPDATE matches_changes SET rewrites = rewrites + 1; END""",
+    ]),
+]
+
+
+def schema_backfills() -> List[Backfill]:
+    """Every Backfill step in SCHEMA_MIGRATIONS, in the order they were added."""
+    return [step for _, _, steps in SCHEMA_MIGRATIONS for step in steps if isinstance(step, Backfill)]
+
+
+class ReadConnectionPool:
+    """
+    Pool of read-only connections to one database file.
+    
+    Each connection is handed to one thread at a time, so it's safe to
+    disable sqlite3's same-thread check and share the pool across a thread
+    pool. Under WAL, readers see the last committed snapshot and never wait
+    on (or block) the writer.
+    """
+    
+    def __init__(self, db_path: str, max_size: int = 4, busy_timeout_ms: int = 5000):
+        """
+        Initialize the pool; connections are opened lazily.
+        
+        Args:
+            db_path: Path to an existing SQLite database file
+            max_size: Most connections open at once; further readers wait for one
+            busy_timeout_ms: How long a statement waits on a lock before failing
+        """
+        self.db_path = db_path
+        self.max_size = max(1, max_size)
+        self.busy_timeout_ms = busy_timeout_ms
+        # LIFO keeps the most recently used (warm page cache) connection in play
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._opened = 0
+        self._lock = threading.Lock()
+        self._closed = False
+        self._probe: Optional[sqlite3.Connection] = None
+        self._probe_lock = threading.Lock()
+    
+    def _open(self) -> sqlite3.Connection:
+        uri = f"{Path(self.db_path).resolve().as_uri()}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False,
+                               timeout=self.busy_timeout_ms / 1000)
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)}")
+        conn.execute("PRAGMA query_only = 1")
+        return conn
+    
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a connection for the duration of a `with` block."""
+        if self._closed:
+            raise sqlite3.ProgrammingError("Read pool is closed")
+        
+        conn = None
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                if self._opened < self.max_size:
+                    self._opened += 1
+                    try:
+                        conn = self._open()
+                    except Exception:
+                        self._opened -= 1
+                        raise
+        if conn is None:
+            conn = self._idle.get()
+        
+        try:
+            yield conn
+        finally:
+            # End the implicit read transaction so the next borrower sees fresh data
+            if conn.in_transaction:
+                conn.rollback()
+            if self._closed:
+                conn.close()
+            else:
+                self._idle.put(conn)
+    
+    def data_version(self) -> int:
+        """
+        Commit counter for the database file.
+        
+        Read from a connection that never writes, so it changes whenever
+        anything commits: this process's writer or another process.
+        """
+        with self._probe_lock:
+            if self._probe is None:
+                self._probe = self._open()
+            return self._probe.execute("PRAGMA data_version").fetchone()[0]
+    
+    def close(self):
+        """Close every idle connection; borrowed ones close when returned."""
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+        with self._probe_lock:
+            if self._probe is not None:
+                self._probe.close()
+                self._probe = None
+
+
+class QueryResultCache:
+    """
+    LRU cache of read results for one version of the database.
+    
+    Every entry belongs to the data version it was computed at; the first
+    lookup at a newer version drops them all, so nothing stale is served
+    and there is no per-entry invalidation to get wrong.
+    """
+    
+    def __init__(self, max_entries: int = 256):
+        """
+        Initialize the cache.
+        
+        Args:
+            max_entries: Results kept before the least recently used is evicted (0 disables caching)
+        """
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple, Any]" = OrderedDict()  # key -> result, oldest first
+        self._version: Optional[int] = None
+    
+    def get(self, key: Tuple, version: int) -> Tuple[bool, Any]:
+        """
+        Look up a result.
+        
+        Returns:
+            (found, result)
+        """
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, self._entries[key]
+            self.misses += 1
+            return False, None
+    
+    def put(self, key: Tuple, version: int, result: Any):
+        """Store a result computed at `version` (ignored if the database has moved on)."""
+        with self._lock:
+            if version != self._version:
+                return
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def _freeze(value: Any) -> Any:
+    """Hashable equivalent of a call argument (lists and dicts become tuples)."""
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple, set)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def cached_read(method: Callable) -> Callable:
+    """
+    Serve a MatchDatabase read from its result cache while the data is unchanged.
+    
+    Results are shared between callers, so treat them as read-only.
+    """
+    @wraps(method)
+    def wrapper(self: "MatchDatabase", *args, **kwargs):
+        if self.read_pool is None or not self.cache.max_entries:
+            return method(self, *args, **kwargs)
+        
+        key = (method.__name__, _freeze(args), _freeze(kwargs))
+        # Checked before reading: a commit racing the query can only make the
+        # entry look older than it is, never serve data older than its version
+        version = self.read_pool.data_version()
+        found, result = self.cache.get(key, version)
+        if not found:
+            outer = getattr(self._stale_reads, 'flag', False)
+            self._stale_reads.flag = False
+            try:
+                result = method(self, *args, **kwargs)
+                stale = self._stale_reads.flag
+            finally:
+                self._stale_reads.flag = outer or self._stale_reads.flag
+            # Answers from an older columnar refresh would outlive it in the cache
+            if not stale:
+                self.cache.put(key, version, result)
+        return result
+    return wrapper
+
 
 class MatchDatabase:
-    """Database for storing and retrieving Rocket League match history."""
+    """
+    Database for storing and retrieving Rocket League match history.
+    
+    The database runs in WAL mode with a single writer connection (`conn`)
+    used for ingestion and a pool of read-only connections for the
+    user-facing queries, so a Discord or MCP question asked mid-ingestion
+    reads the last committed state instead of hitting `database is locked`.
+    
+    The aggregate and list reads are cached until the next commit from any
+    connection (`cache` has the LRU bound and hit/miss counters), so a
+    conversation asking the same question repeatedly queries SQLite once.
+    """
     
-    def __init__(self, db_path: str = "data/matches.db"):
+    def __init__(self,
+                 db_path: str = "data/matches.db",
+                 read_pool_size: int = 4,
+                 busy_timeout_ms: int = 5000,
+                 defer_backfills: bool = False,
+                 cache_size: int = 256,
+                 player_id: Optional[str] = None,
+                 columnar: bool = False):
         """
         Initialize database connection.
         
         Args:
             db_path: Path to SQLite database file
+            read_pool_size: Maximum read-only connections kept open
+            busy_timeout_ms: How long a statement waits on another process's lock
+            defer_backfills: Leave migration backfills to a later run_backfills()
+                call instead of finishing them before returning
+            cache_size: Read results kept between writes (0 disables the cache)
+            player_id: Player the queries are scoped to when they aren't given
+                one (default: every player in the file)
+            columnar: Answer averages from in-memory NumPy arrays (see
+                ColumnarStats; ignored if NumPy isn't installed)
         """
         # Create data directory if it doesn't exist
         Path(db_path).parent.mkdir(parents=True, exist_ok=True)
         
         self.db_path = db_path
-        self.conn = sqlite3.connect(db_path)
+        self.player_id = player_id
+        # The writer may be handed between threads (e.g. asyncio.to_thread);
+        # _write_lock serializes statements on it instead of check_same_thread
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, timeout=busy_timeout_ms / 1000)
         self.conn.row_factory = sqlite3.Row  # Return rows as dictionaries
+        self._write_lock = threading.RLock()
+        self._stat_paths: Dict[str, str] = {}
+        self._stat_paths_version: Optional[int] = None
+        self._closed = False
+        self.cache = QueryResultCache(cache_size)
+        self.columnar = columnar and columnar_available()
+        self._columnar: Dict[Optional[str], ColumnarStats] = {}
+        self._columnar_lock = threading.Lock()
+        self._stale_reads = threading.local()
+        self._configure_connection(busy_timeout_ms)
         self._create_tables()
+        try:
+            self._migrate()
+        except Exception:
+            self.conn.close()
+            raise
+        if not defer_backfills:
+            self.run_backfills()
+        
+        # In-memory databases can't be shared between connections
+        self.read_pool = None
+        if db_path != ":memory:" and not db_path.startswith("file:"):
+            self.read_pool = ReadConnectionPool(db_path, read_pool_size, busy_timeout_ms)
+    
+    def _configure_connection(self, busy_timeout_ms: int):
+        """Switch the writer to WAL and tune durability for it."""
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        # NORMAL is durable against application crashes in WAL mode; only an
+        # OS crash or power loss can roll back the last commits
+        self.conn.execute("PRAGMA synchronous = NORMAL")
+        self.conn.execute(f"PRAGMA busy_timeout = {int(busy_timeout_ms)}")
+        # Makes replacements fire DELETE triggers (see migration 8)
+        self.conn.execute("PRAGMA recursive_triggers = ON")
+    
+    @contextmanager
+    def _reader(self) -> Iterator[sqlite3.Connection]:
+        """Connection for a read that shouldn't wait on ingestion."""
+        if self.read_pool is None:
+            with self._write_lock:
+                yield self.conn
+            return
+        with self.read_pool.connection() as conn:
+            yield conn
     
     def _create_tables(self):
-        """Create the matches table if it doesn't exist."""
+        """Create the matches, sync state and pending replay tables if they don't exist."""
         cursor = self.conn.cursor()
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS matches (
@@ -67,34 +924,449 @@ class MatchDatabase:
                 
                 -- Metadata
                 analyzed_at TIMESTAMP,
-                stats_json TEXT
+                stats_json TEXT  -- Moved to match_stats by migration 3
+            )
+        """)
+        
+        # Small key/value store for ingestion bookkeeping (backfill checkpoints etc.)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS sync_state (
+                key TEXT PRIMARY KEY,
+                value TEXT,
+                updated_at TIMESTAMP
+            )
+        """)
+        
+        # Replays listed before Ballchasing finished processing them
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS pending_replays (
+                replay_id TEXT PRIMARY KEY,
+                first_seen REAL,
+                attempts INTEGER DEFAULT 0,
+                next_check_at REAL,
+                parked INTEGER DEFAULT 0,
+                last_status TEXT
+            )
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_pending_replays_due
+            ON pending_replays (parked, next_check_at)
+        """)
+        
+        # Replays whose roster rows were all saved, wherever they live (shards included)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS processed_replays (
+                replay_id TEXT PRIMARY KEY,
+                processed_at REAL
             )
         """)
         self.conn.commit()
     
-    def match_exists(self, replay_id: str) -> bool:
+    @property
+    def schema_version(self) -> int:
+        """Schema version recorded in PRAGMA user_version."""
+        return self.conn.execute("PRAGMA user_version").fetchone()[0]
+    
+    def _migrate(self):
+        """Apply any SCHEMA_MIGRATIONS newer than the database's user_version."""
+        for version, description, statements in SCHEMA_MIGRATIONS:
+            if version <= self.schema_version:
+                continue
+            
+            print(f"🛠️  Migrating database to v{version}: {description}")
+            try:
+                # Explicit BEGIN: sqlite3 would otherwise autocommit each DDL statement
+                self.conn.execute("BEGIN")
+                for statement in statements:
+                    if isinstance(statement, Backfill):
+                        # Only recorded here; run_backfills() does the work in chunks
+                        self.set_sync_state(statement.state_key, json.dumps(
+                            {'after': None, 'done': 0, 'finished': False}
+                        ), commit=False)
+                    elif isinstance(statement, PlayerStep):
+                        statement.apply(self.conn, self.player_id)
+                    elif callable(statement):
+                        statement(self.conn)
+                    else:
+                        self.conn.execute(statement)
+                # PRAGMA can't take bound parameters; version is an int from the list above
+                self.conn.execute(f"PRAGMA user_version = {int(version)}")
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+    
+    def pending_backfills(self) -> List[str]:
+        """Names of migration backfills that haven't finished yet."""
+        pending = []
+        for backfill in schema_backfills():
+            state = self.get_sync_state(backfill.state_key)
+            if state and not json.loads(state)['finished']:
+                pending.append(backfill.name)
+        return pending
+    
+    def run_backfills(self,
+                      chunk_size: int = 500,
+                      progress: Optional[Callable[[str, int, int], None]] = None) -> int:
+        """
+        Finish the backfills recorded by schema migrations.
+        
+        Each chunk is its own short transaction (ingestion writes in between)
+        and checkpoints its position, so this is safe to run while the app
+        is live and resumes after an interruption. close() stops it after
+        the current chunk.
+        
+        Args:
+            chunk_size: Rows per transaction
+            progress: Called with (backfill name, rows done, rows in total) after each chunk
+            
+        Returns:
+            Number of rows processed by this call
+        """
+        processed = 0
+        for backfill in schema_backfills():
+            saved = self.get_sync_state(backfill.state_key)
+            if not saved or json.loads(saved)['finished']:
+                continue
+            state = json.loads(saved)
+            with self._write_lock:
+                total = self.conn.execute(f"SELECT COUNT(*) FROM ({backfill.source})").fetchone()[0]
+            if total:
+                print(f"🛠️  Backfilling {backfill.name} ({state['done']}/{total} rows done)")
+            
+            def checkpoint(conn: sqlite3.Connection, after: List, count: int):
+                state.update(after=after, done=state['done'] + count)
+                self.set_sync_state(backfill.state_key, json.dumps(state), commit=False)
+            
+            def finish(conn: sqlite3.Connection):
+                if backfill.on_complete:
+                    backfill.on_complete(conn)
+                state['finished'] = True
+                self.set_sync_state(backfill.state_key, json.dumps(state), commit=False)
+            
+            processed += self._run_in_chunks(
+                backfill.source, backfill.key, state['after'], backfill.apply, checkpoint, finish, chunk_size,
+                on_chunk=(lambda done: progress(backfill.name, state['done'], total)) if progress else None
+            )
+            if self._closed:
+                break
+            if total:
+                print(f"✅ Backfilled {backfill.name}")
+        return processed
+    
+    def _run_in_chunks(self,
+                       source: str,
+                       key: Tuple[str, ...],
+                       after: Optional[List],
+                       apply: Callable[[sqlite3.Connection, List[sqlite3.Row]], None],
+                       checkpoint: Callable[[sqlite3.Connection, List, int], None],
+                       finish: Callable[[sqlite3.Connection], None],
+                       chunk_size: int,
+                       on_chunk: Optional[Callable[[int], None]] = None) -> int:
+        """
+        Walk `source` in `key` order from `after`, one committed transaction per chunk.
+        
+        Args:
+            source: SELECT including the key columns, without WHERE/ORDER BY/LIMIT
+            key: Unique, indexed columns to walk in order
+            after: Key values to continue after (None to start at the beginning)
+            apply: Writes one chunk of rows
+            checkpoint: Records (last key values, rows in chunk) in the chunk's transaction
+            finish: Runs in the final transaction, once no rows are left
+            chunk_size: Rows per transaction
+            on_chunk: Called with the rows done so far after each commit
+            
+        Returns:
+            Number of rows processed (fewer than remain if close() interrupted it)
+        """
+        columns = ", ".join(key)
+        done = 0
+        while True:
+            with self._write_lock:
+                if self._closed:
+                    return done
+                where = f"WHERE ({columns}) > ({', '.join('?' * len(key))})" if after else ""
+                rows = self.conn.execute(f"""
+                    SELECT * FROM ({source})
+                    {where}
+                    ORDER BY {columns}
+                    LIMIT ?
+                """, list(after or []) + [chunk_size]).fetchall()
+                if not rows:
+                    finish(self.conn)
+                    self.conn.commit()
+                    return done
+                
+                apply(self.conn, rows)
+                after = [rows[-1][column] for column in key]
+                checkpoint(self.conn, after, len(rows))
+                self.conn.commit()
+            
+            done += len(rows)
+            if on_chunk:
+                on_chunk(done)
+    
+    def _player_scope(self, player_id: Optional[str], column: str = "player_id") -> Tuple[List[str], List[Any]]:
+        """SQL conditions and parameters restricting a query to one player (none for every player)."""
+        player_id = self.player_id if player_id is None else player_id
+        if player_id is None:
+            return [], []
+        return [f"{column} = ?"], [player_id]
+    
+    def _player_of(self, player_stats: Dict) -> str:
+        """Player ID for a Ballchasing player entry."""
+        return player_stats.get('id', {}).get('id') or self.player_id or ''
+    
+    def match_exists(self, replay_id: str, player_id: Optional[str] = None) -> bool:
         """
         Check if a match has already been analyzed.
         
         Args:
             replay_id: Ballchasing replay ID
+            player_id: Player to check for (default: the database's player)
             
         Returns:
             True if match exists in database
         """
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT 1 FROM matches WHERE replay_id = ?", (replay_id,))
-        return cursor.fetchone() is not None
+        conditions, params = self._player_scope(player_id)
+        with self._write_lock:
+            cursor = self.conn.cursor()
+            cursor.execute(f"SELECT 1 FROM matches WHERE {' AND '.join(conditions + ['replay_id = ?'])}",
+                           params + [replay_id])
+            return cursor.fetchone() is not None
     
-    def save_match(self, replay_id: str, match_data: Dict, player_stats: Dict):
+    def existing_replay_ids(self, replay_ids: Iterable[str], player_id: Optional[str] = None) -> Set[str]:
+        """
+        Check which of several matches are already in the database.
+        
+        Args:
+            replay_ids: Ballchasing replay IDs
+            player_id: Player to check for (default: the database's player)
+            
+        Returns:
+            Subset of the given IDs that already exist
+        """
+        conditions, params = self._player_scope(player_id)
+        with self._write_lock:
+            replay_ids = list(replay_ids)
+            existing = set()
+            cursor = self.conn.cursor()
+            # Stay well under SQLite's bound-parameter limit
+            for start in range(0, len(replay_ids), 500):
+                chunk = replay_ids[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                where = " AND ".join(conditions + [f"replay_id IN ({placeholders})"])
+                cursor.execute(f"SELECT replay_id FROM matches WHERE {where}", params + chunk)
+                existing.update(row[0] for row in cursor.fetchall())
+            return existing
+    
+    def save_match(self, replay_id: str, match_data: Dict, player_stats: Dict, commit: bool = True):
         """
         Save a match to the database.
         
         Args:
             replay_id: Ballchasing replay ID
             match_data: Full match details from API
-            player_stats: Your specific player stats
+            player_stats: The tracked player's entry (its 'id' decides whose match this is)
+            commit: Commit immediately; pass False to group several writes
+                    into one transaction and call commit() yourself
+        """
+        player_id = self._player_of(player_stats)
+        with self._write_lock:
+            cursor = self.conn.cursor()
+            cursor.execute("""
+                SELECT 1 FROM rolling_aggregate_members WHERE player_id = ? AND replay_id = ? LIMIT 1
+            """, (player_id, replay_id))
+            was_in_window = cursor.fetchone() is not None
+            key_where = "player_id = ? AND replay_id = ?"
+            old_scopes = _rolling_scopes(self.conn, key_where, (player_id, replay_id)) if was_in_window else set()
+            
+            stat_paths = self._registered_stat_paths(self.conn)
+            cursor.execute(insert_match_sql(tuple(stat_paths)),
+                           self._match_row(replay_id, match_data, player_stats)
+                           + self._stat_path_values(player_stats, stat_paths))
+            cursor.execute(INSERT_STATS_SQL, (player_id, replay_id, encode_stats(player_stats.get('stats', {}))))
+            cursor.executemany(INSERT_PARTICIPANT_SQL, self._participant_rows(replay_id, match_data))
+            if was_in_window:
+                # Re-saving a match that's already counted: its old values are gone, so recount its windows
+                _recount_rolling_scopes(self.conn, old_scopes | _rolling_scopes(self.conn, key_where,
+                                                                                 (player_id, replay_id)))
+            else:
+                self._add_to_rolling_aggregates(player_id, replay_id)
+            if commit:
+                self.conn.commit()
+    
+    def _add_to_rolling_aggregates(self, player_id: str, replay_id: str):
+        """
+        Slide a newly saved match into every rolling window it belongs to.
+        
+        Each window either has room, or the match replaces the window's oldest
+        member if it's newer; the sums are adjusted by the difference, so the
+        cost doesn't depend on the size of the history.
+        """
+        cursor = self.conn.cursor()
+        columns = ", ".join(ROLLING_SUM_COLUMNS)
+        cursor.execute(f"""
+            SELECT result, COALESCE(playlist, '') AS playlist, date_epoch, {columns}
+            FROM matches WHERE player_id = ? AND replay_id = ?
+        """, (player_id, replay_id))
+        match = cursor.fetchone()
+        
+        for playlist in (ALL_PLAYLISTS, match['playlist']):
+            for size in ROLLING_WINDOWS:
+                scope = (player_id, match['result'], playlist, size)
+                cursor.execute("""
+                    INSERT OR IGNORE INTO rolling_aggregates (player_id, result, playlist, window_size)
+                    VALUES (?, ?, ?, ?)
+                """, scope)
+                cursor.execute("""
+                    SELECT match_count FROM rolling_aggregates
+                    WHERE player_id = ? AND result = ? AND playlist = ? AND window_size = ?
+                """, scope)
+                count_delta = 1
+                deltas = [match[column] or 0 for column in ROLLING_SUM_COLUMNS]
+                
+                if cursor.fetchone()[0] >= size:
+                    # Full window: evict the oldest member, unless the new match is older still
+                    cursor.execute("""
+                        SELECT replay_id FROM rolling_aggregate_members
+                        WHERE player_id = ? AND result = ? AND playlist = ? AND window_size = ?
+                          AND (date_epoch, replay_id) < (?, ?)
+                        ORDER BY date_epoch, replay_id
+                        LIMIT 1
+                    """, scope + (match['date_epoch'], replay_id))
+                    oldest = cursor.fetchone()
+                    if oldest is None:
+                        continue
+                    cursor.execute(f"SELECT {columns} FROM matches WHERE player_id = ? AND replay_id = ?",
+                                   (player_id, oldest[0]))
+                    evicted = cursor.fetchone()
+                    count_delta = 0
+                    deltas = [new - (evicted[column] or 0)
+                              for new, column in zip(deltas, ROLLING_SUM_COLUMNS)]
+                    cursor.execute("""
+                        DELETE FROM rolling_aggregate_members
+                        WHERE player_id = ? AND result = ? AND playlist = ? AND window_size = ? AND replay_id = ?
+                    """, scope + (oldest[0],))
+                
+                cursor.execute("""
+                    INSERT INTO rolling_aggregate_members
+                        (player_id, result, playlist, window_size, replay_id, date_epoch)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """, scope + (replay_id, match['date_epoch']))
+                updates = ", ".join(f"sum_{column} = sum_{column} + ?" for column in ROLLING_SUM_COLUMNS)
+                cursor.execute(f"""
+                    UPDATE rolling_aggregates SET match_count = match_count + ?, {updates}
+                    WHERE player_id = ? AND result = ? AND playlist = ? AND window_size = ?
+                """, [count_delta] + deltas + list(scope))
+    
+    def save_matches(self,
+                     records: Iterable[Tuple[str, Dict, Dict]],
+                     chunk_size: int = 500,
+                     commit: bool = True) -> Dict[str, int]:
+        """
+        Save many matches in a single transaction.
+        
+        Rows are built lazily from `records` and written `chunk_size` at a
+        time with executemany, so arbitrarily large batches stream through
+        in constant memory and pay for a single commit. The rolling win/loss
+        aggregates are recounted once at the end.
+        
+        Args:
+            records: Iterable of (replay_id, match_data, player_stats) tuples
+            chunk_size: Rows per executemany call
+            commit: Commit at the end (False joins the caller's transaction)
+            
+        Returns:
+            Dictionary with 'inserted' and 'replaced' counts
+        """
+        with self._write_lock:
+            stat_paths = self._registered_stat_paths(self.conn)
+            rows = ((self._match_row(*record) + self._stat_path_values(record[2], stat_paths),
+                     (self._player_of(record[2]), record[0], encode_stats(record[2].get('stats', {}))),
+                     self._participant_rows(record[0], record[1]))
+                    for record in records)
+            return self._write_match_rows(insert_match_sql(tuple(stat_paths)), rows, chunk_size, commit)
+    
+    def _write_match_rows(self,
+                          sql: str,
+                          rows: Iterator[Tuple[Tuple, Optional[Tuple], List[Tuple]]],
+                          chunk_size: int,
+                          commit: bool,
+                          replace: bool = True) -> Dict[str, int]:
+        """
+        Write (matches row, match_stats row, participant rows) entries in chunks, in one transaction.
+        
+        Matches rows start with (replay_id, player_id); a match_stats row of
+        None leaves the raw stats alone. With replace=False, matches already
+        saved (or repeated in `rows`) are skipped rather than replaced.
+        
+        Returns:
+            Dictionary with 'inserted' and 'replaced' (or 'skipped') counts
         """
+        counts = {'inserted': 0, 'replaced' if replace else 'skipped': 0}
+        scopes: Set[Tuple[str, str, str]] = set()
+        cursor = self.conn.cursor()
+        
+        try:
+            while True:
+                chunk = list(islice(rows, chunk_size))
+                if not chunk:
+                    break
+                
+                # Count replacements, including duplicates within the chunk itself
+                seen = self._existing_keys([(row[1], row[0]) for row, _, _ in chunk])
+                written = []
+                for entry in chunk:
+                    key = (entry[0][1], entry[0][0])
+                    if key not in seen:
+                        counts['inserted'] += 1
+                        seen.add(key)
+                    elif replace:
+                        counts['replaced'] += 1
+                    else:
+                        counts['skipped'] += 1
+                        continue
+                    written.append(entry)
+                
+                if not written:
+                    continue
+                
+                # Windows the rows are leaving (when replaced) and joining
+                keys = [(row[1], row[0]) for row, _, _ in written]
+                where = f"(player_id, replay_id) IN (VALUES {', '.join('(?, ?)' for _ in keys)})"
+                key_params = [value for key in keys for value in key]
+                scopes |= _rolling_scopes(self.conn, where, key_params)
+                cursor.executemany(sql, [row for row, _, _ in written])
+                cursor.executemany(INSERT_STATS_SQL, [stats for _, stats, _ in written if stats is not None])
+                cursor.executemany(INSERT_PARTICIPANT_SQL,
+                                   [row for _, _, participants in written for row in participants])
+                scopes |= _rolling_scopes(self.conn, where, key_params)
+            
+            # One recount per touched window instead of sliding every row through it
+            _recount_rolling_scopes(self.conn, scopes)
+        except Exception:
+            if commit:
+                self.conn.rollback()  # Leave the caller's own transaction to the caller
+            raise
+        
+        if commit:
+            self.conn.commit()
+        return counts
+    
+    def _existing_keys(self, keys: List[Tuple[str, str]]) -> Set[Tuple[str, str]]:
+        """Which (player_id, replay_id) pairs are already saved (at most 500 per call)."""
+        if not keys:
+            return set()
+        values = ", ".join("(?, ?)" for _ in keys)
+        cursor = self.conn.execute(f"""
+            SELECT player_id, replay_id FROM matches
+            WHERE (player_id, replay_id) IN (VALUES {values})
+        """, [value for key in keys for value in key])
+        return {(row[0], row[1]) for row in cursor.fetchall()}
+    
+    def _match_row(self, replay_id: str, match_data: Dict, player_stats: Dict) -> Tuple:
+        """Build the matches row for one player's stats in a match."""
         stats = player_stats.get('stats', {})
         core = stats.get('core', {})
         boost = stats.get('boost', {})
@@ -105,21 +1377,11 @@ class MatchDatabase:
         team_color = self._find_player_team(match_data, player_stats)
         result = self._determine_result(match_data, team_color)
         
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            INSERT OR REPLACE INTO matches (
-                replay_id, date, duration, playlist, result, team_color,
-                goals, assists, saves, shots, score, shooting_percentage,
-                avg_boost, percent_zero_boost, percent_full_boost,
-                amount_collected, amount_stolen,
-                avg_speed, time_supersonic, percent_ground, percent_low_air, percent_high_air,
-                percent_defensive_third, percent_offensive_third, percent_neutral_third,
-                time_behind_ball, time_infront_ball,
-                analyzed_at, stats_json
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
+        return (
             replay_id,
+            self._player_of(player_stats),
             match_data.get('date'),
+            _epoch_or_none(match_data.get('date')),
             match_data.get('duration'),
             match_data.get('playlist_name'),
             result,
@@ -150,105 +1412,650 @@ class MatchDatabase:
             positioning.get('time_behind_ball', 0),
             positioning.get('time_infront_ball', 0),
             # Metadata
-            datetime.now().isoformat(),
-            json.dumps(stats)  # Store full stats for deep analysis
-        ))
-        self.conn.commit()
+            datetime.now().isoformat()
+        )
+    
+    def _stat_path_values(self, player_stats: Dict, stat_paths: Dict[str, str]) -> Tuple:
+        """Values of the registered stat columns for one player's stats."""
+        stats = player_stats.get('stats', {})
+        return tuple(stat_path_value(stats, path) for path in stat_paths.values())
+    
+    def _participant_rows(self, replay_id: str, match_data: Dict) -> List[Tuple]:
+        """match_players rows for everyone on both teams."""
+        rows = []
+        for team_color in ('blue', 'orange'):
+            result = self._determine_result(match_data, team_color)
+            for player in match_data.get(team_color, {}).get('players', []):
+                identity = player.get('id') or {}
+                # Unidentified players (e.g. splitscreen guests) are told apart by name
+                platform_id = identity.get('id') or player.get('name') or ''
+                stats = player.get('stats', {})
+                rows.append((replay_id, identity.get('platform') or '', platform_id, player.get('name'),
+                             team_color, result)
+                            + tuple(stat_path_value(stats, path) for _, path in PARTICIPANT_STATS))
+        return rows
+    
+    def export_matches(self,
+                       include_stats: bool = False,
+                       include_players: bool = False,
+                       batch_size: int = 500,
+                       player_id: Optional[str] = None) -> Iterator[Dict]:
+        """
+        Stream saved matches as plain dictionaries, in the form import_matches() takes.
+        
+        Matches are read in primary key order, `batch_size` at a time (keyset
+        pagination), each batch on a briefly borrowed read connection: memory
+        use doesn't grow with the history, and no read transaction stays open
+        while the caller works through a batch.
+        
+        Args:
+            include_stats: Add each match's raw Ballchasing stats as 'stats'
+            include_players: Add every participant (see get_match_players) as 'players'
+            batch_size: Matches read per query
+            player_id: Whose matches (default: the database's player, or every player's)
+            
+        Yields:
+            The match's matches columns, plus 'stats' and 'players' if asked for
+        """
+        scope, scope_params = self._player_scope(player_id)
+        after: Optional[Tuple[str, str]] = None
+        while True:
+            conditions, params = list(scope), list(scope_params)
+            if after is not None:
+                conditions.append("(player_id, replay_id) > (?, ?)")
+                params += list(after)
+            where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+            with self._reader() as conn:
+                cursor = conn.cursor()
+                cursor.execute(f"SELECT * FROM matches {where} ORDER BY player_id, replay_id LIMIT ?",
+                               params + [batch_size])
+                matches = [dict(row) for row in cursor.fetchall()]
+                if not matches:
+                    return
+                keys = [(match['player_id'], match['replay_id']) for match in matches]
+                after = keys[-1]
+                
+                if include_stats:
+                    cursor.execute(f"""
+                        SELECT player_id, replay_id, stats FROM match_stats
+                        WHERE (player_id, replay_id) IN (VALUES {', '.join('(?, ?)' for _ in keys)})
+                    """, [value for key in keys for value in key])
+                    stats = {(row[0], row[1]): decode_stats(row[2]) for row in cursor.fetchall()
+                             if row[2] is not None}
+                    for match, key in zip(matches, keys):
+                        match['stats'] = stats.get(key)
+                
+                if include_players:
+                    replay_ids = list({replay_id for _, replay_id in keys})
+                    cursor.execute(f"""
+                        SELECT * FROM match_players WHERE replay_id IN ({', '.join('?' * len(replay_ids))})
+                        ORDER BY team_color, score DESC
+                    """, replay_ids)
+                    players: Dict[str, List[Dict]] = {}
+                    for row in cursor.fetchall():
+                        player = dict(row)
+                        players.setdefault(player.pop('replay_id'), []).append(player)
+                    for match in matches:
+                        match['players'] = players.get(match['replay_id'], [])
+            
+            # Outside the borrow: the caller may query this database between matches
+            yield from matches
+    
+    def import_matches(self,
+                       records: Iterable[Dict],
+                       chunk_size: int = 500,
+                       replace: bool = False,
+                       commit: bool = True) -> Dict[str, int]:
+        """
+        Save matches from export_matches() in a single transaction.
+        
+        Records go through the same chunked writer as save_matches, so an
+        export of any size streams through in constant memory. Exported
+        values are stored as they are rather than derived again; registered
+        stat columns a record doesn't carry are filled from its raw stats
+        when it has them.
+        
+        Args:
+            records: Iterable of export_matches() dictionaries
+            chunk_size: Rows per executemany call
+            replace: Overwrite matches already saved (by player and replay ID) instead of skipping them
+            commit: Commit at the end (False joins the caller's transaction)
+            
+        Returns:
+            Dictionary with 'inserted' and 'skipped' counts ('replaced' instead of 'skipped' with replace=True)
+        """
+        with self._write_lock:
+            stat_paths = self._registered_stat_paths(self.conn)
+            rows = (self._imported_rows(record, stat_paths) for record in records)
+            return self._write_match_rows(insert_match_sql(tuple(stat_paths)), rows, chunk_size, commit,
+                                          replace=replace)
+    
+    def _imported_rows(self, record: Dict, stat_paths: Dict[str, str]) -> Tuple[Tuple, Optional[Tuple], List[Tuple]]:
+        """matches, match_stats and match_players rows for one exported match."""
+        replay_id = record['replay_id']
+        values = {**record, 'player_id': record.get('player_id') or self.player_id or ''}
+        if values.get('date_epoch') is None:
+            values['date_epoch'] = _epoch_or_none(values.get('date'))
+        stats = record.get('stats')
+        for name, path in stat_paths.items():
+            if values.get(name) is None and stats is not None:
+                values[name] = stat_path_value(stats, path)
+        
+        row = tuple(values.get(column) for column in MATCH_INSERT_COLUMNS + tuple(stat_paths))
+        stats_row = None if stats is None else (values['player_id'], replay_id, encode_stats(stats))
+        participants = [tuple({**player, 'replay_id': replay_id}.get(column) for column in PARTICIPANT_COLUMNS)
+                        for player in record.get('players') or []]
+        return row, stats_row, participants
+    
+    def commit(self):
+        """Commit writes made with commit=False."""
+        with self._write_lock:
+            self.conn.commit()
+    
+    @contextmanager
+    def transaction(self) -> Iterator['MatchDatabase']:
+        """
+        Group writes made with commit=False into one transaction.
+        
+        The writer stays held for the whole block, so another thread's commit
+        (a migration backfill finishing a chunk, say) can't land half of it.
+        Commits when the block ends, rolls back if it raises.
+        """
+        with self._write_lock:
+            try:
+                yield self
+            except BaseException:
+                self.conn.rollback()
+                raise
+            self.conn.commit()
+    
+    def get_sync_state(self, key: str) -> Optional[str]:
+        """
+        Read a value from the sync state store.
+        
+        Args:
+            key: State key (e.g. 'backfill:<job>')
+            
+        Returns:
+            Stored value or None if unset
+        """
+        with self._write_lock:
+            cursor = self.conn.cursor()
+            cursor.execute("SELECT value FROM sync_state WHERE key = ?", (key,))
+            row = cursor.fetchone()
+            return row[0] if row else None
+    
+    def set_sync_state(self, key: str, value: Optional[str], commit: bool = True):
+        """
+        Write a value to the sync state store.
+        
+        Args:
+            key: State key
+            value: Value to store (None deletes the key)
+            commit: Commit immediately (False joins the current transaction)
+        """
+        with self._write_lock:
+            cursor = self.conn.cursor()
+            if value is None:
+                cursor.execute("DELETE FROM sync_state WHERE key = ?", (key,))
+            else:
+                cursor.execute("""
+                    INSERT OR REPLACE INTO sync_state (key, value, updated_at)
+                    VALUES (?, ?, ?)
+                """, (key, value, datetime.now().isoformat()))
+            if commit:
+                self.conn.commit()
     
-    def get_recent_matches(self, limit: int = 10) -> List[Dict]:
+    @cached_read
+    def get_recent_matches(self, limit: int = 10, player_id: Optional[str] = None) -> List[Dict]:
         """
         Get most recent matches.
         
         Args:
             limit: Number of matches to retrieve
+            player_id: Only this player's matches (default: the database's player)
             
         Returns:
             List of match dictionaries
         """
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            SELECT * FROM matches 
-            ORDER BY date DESC 
+        conditions, params = self._player_scope(player_id)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self._reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                SELECT * FROM matches 
+                {where}
+                ORDER BY date_epoch DESC 
+                LIMIT ?
+            """, params + [limit])
+            
+            return [dict(row) for row in cursor.fetchall()]
+    
+    @cached_read
+    def query_matches(self,
+                      result: Optional[str] = None,
+                      playlist: Optional[str] = None,
+                      date_after: Optional[str] = None,
+                      date_before: Optional[str] = None,
+                      ranges: Optional[Dict[str, Tuple[Optional[float], Optional[float]]]] = None,
+                      sort_by: str = "date",
+                      sort_dir: str = "desc",
+                      limit: int = 10,
+                      cursor: Optional[str] = None,
+                      player_id: Optional[str] = None) -> Dict:
+        """
+        Search the full match history with filters, sorting and keyset paging.
+        
+        Everything is compiled into one parameterized SQL statement, so the
+        search covers every stored match, not just the most recent ones.
+        
+        Args:
+            result: 'win' or 'loss'
+            playlist: Playlist name (e.g. 'Ranked Doubles')
+            date_after: Only matches on or after this date (ISO format; no offset means UTC)
+            date_before: Only matches on or before this date (ISO format; a bare
+                date such as '2024-10-20' includes that whole day)
+            ranges: {column: (min, max)} for any column in stat_columns(); either bound may be None
+            sort_by: 'date' (played-at time, in UTC) or any column in stat_columns()
+            sort_dir: 'asc' or 'desc'
+            limit: Maximum matches to return (capped at 200)
+            cursor: `next_cursor` from a previous call to fetch the following page
+            player_id: Only this player's matches (default: the database's player)
+            
+        Returns:
+            Dictionary with 'matches' (list, without the raw stats blob) and
+            'next_cursor' (None on the last page)
+        """
+        columns = self.stat_columns()
+        if sort_by != 'date' and sort_by not in columns:
+            raise ValueError(f"Cannot sort by '{sort_by}'")
+        if sort_dir not in ('asc', 'desc'):
+            raise ValueError(f"sort_dir must be 'asc' or 'desc', not '{sort_dir}'")
+        limit = max(1, min(int(limit), 200))
+        sort_column = 'date_epoch' if sort_by == 'date' else sort_by
+        
+        conditions, params = self._player_scope(player_id)
+        
+        if result:
+            conditions.append("result = ?")
+            params.append(result)
+        if playlist:
+            conditions.append("playlist = ?")
+            params.append(playlist)
+        if date_after:
+            conditions.append("date_epoch >= ?")
+            params.append(date_to_epoch(date_after))
+        if date_before:
+            if len(date_before.strip()) == 10:
+                conditions.append("date_epoch < ?")
+                params.append(date_to_epoch(date_before) + 24 * 60 * 60)
+            else:
+                conditions.append("date_epoch <= ?")
+                params.append(date_to_epoch(date_before))
+        if sort_by not in STAT_COLUMNS and sort_by != 'date':
+            # Registered stats are NULL where Ballchasing didn't report them, and
+            # NULLs can't be paged through with a keyset cursor
+            conditions.append(f"{sort_by} IS NOT NULL")
+        
+        for column, (low, high) in (ranges or {}).items():
+            if column not in columns:
+                raise ValueError(f"Cannot filter on '{column}'")
+            if low is not None:
+                conditions.append(f"{column} >= ?")
+                params.append(low)
+            if high is not None:
+                conditions.append(f"{column} <= ?")
+                params.append(high)
+        
+        # Keyset pagination: continue strictly after the last row of the previous page
+        if cursor:
+            last_value, last_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            comparison = "<" if sort_dir == "desc" else ">"
+            conditions.append(f"({sort_column}, replay_id) {comparison} (?, ?)")
+            params.extend([last_value, last_id])
+        
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        sql = f"""
+            SELECT {', '.join(SUMMARY_COLUMNS + columns[len(STAT_COLUMNS):])} FROM matches
+            {where}
+            ORDER BY {sort_column} {sort_dir}, replay_id {sort_dir}
             LIMIT ?
-        """, (limit,))
+        """
+        
+        with self._reader() as conn:
+            db_cursor = conn.cursor()
+            db_cursor.execute(sql, params + [limit + 1])
+            matches = [dict(row) for row in db_cursor.fetchall()]
+        
+        next_cursor = None
+        if len(matches) > limit:
+            matches = matches[:limit]
+            last = matches[-1]
+            next_cursor = base64.urlsafe_b64encode(
+                json.dumps([last[sort_column], last['replay_id']]).encode()
+            ).decode()
         
-        return [dict(row) for row in cursor.fetchall()]
+        return {'matches': matches, 'next_cursor': next_cursor}
     
-    def get_averages(self, last_n_matches: int = 10) -> Dict:
+    @cached_read
+    def get_averages(self,
+                     last_n_matches: int = 10,
+                     stats: Optional[List[str]] = None,
+                     player_id: Optional[str] = None) -> Dict:
         """
         Calculate average stats over recent matches.
         
         Args:
             last_n_matches: Number of recent matches to include
+            stats: Extra columns to average (any of stat_columns()), returned as 'avg_<column>'
+            player_id: Only this player's matches (default: the database's player)
             
         Returns:
             Dictionary of average stats
         """
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            SELECT 
-                -- Core stats
-                AVG(goals) as avg_goals,
-                AVG(assists) as avg_assists,
-                AVG(saves) as avg_saves,
-                AVG(shots) as avg_shots,
-                AVG(score) as avg_score,
-                AVG(shooting_percentage) as avg_shooting_pct,
-                
-                -- Boost metrics
-                AVG(avg_boost) as avg_boost,
-                AVG(percent_zero_boost) as avg_percent_zero_boost,
-                AVG(percent_full_boost) as avg_percent_full_boost,
-                AVG(amount_collected) as avg_boost_collected,
-                AVG(amount_stolen) as avg_boost_stolen,
-                
-                -- Movement metrics
-                AVG(avg_speed) as avg_speed,
-                AVG(time_supersonic) as avg_time_supersonic,
-                AVG(percent_ground) as avg_percent_ground,
-                AVG(percent_low_air) as avg_percent_low_air,
-                AVG(percent_high_air) as avg_percent_high_air,
-                
-                -- Positioning metrics
-                AVG(percent_defensive_third) as avg_percent_defensive_third,
-                AVG(percent_offensive_third) as avg_percent_offensive_third,
-                AVG(percent_neutral_third) as avg_percent_neutral_third,
-                AVG(time_behind_ball) as avg_time_behind_ball,
-                AVG(time_infront_ball) as avg_time_infront_ball,
-                
-                COUNT(*) as match_count
-            FROM (
-                SELECT * FROM matches 
-                ORDER BY date DESC 
-                LIMIT ?
-            )
-        """, (last_n_matches,))
+        with self._reader() as conn:
+            columns = self._average_columns(conn, AVERAGE_FIELDS, stats)
+        columnar = self.columnar_stats(player_id)
+        if columnar is not None and columnar.has_columns(columns):
+            row = columnar.averages(columns, last_n_matches=last_n_matches)
+            self._note_columnar_read(columnar)
+        else:
+            with self._reader() as conn:
+                row = self._aggregate(conn, columns, ('avg',), last_n_matches=last_n_matches,
+                                      player_id=player_id)[0]
+        return self._average_fields(row, AVERAGE_FIELDS, stats, count_field='match_count')
+    
+    def columnar_stats(self, player_id: Optional[str] = None) -> Optional[ColumnarStats]:
+        """
+        The in-memory columnar copy of a player's matches.
         
-        row = cursor.fetchone()
-        if row:
-            return dict(row)
-        return {}
+        Nothing is read here: each of its reads loads or catches it up, or
+        answers from the last refresh while another thread runs one.
+        
+        Args:
+            player_id: Whose matches (default: the database's player)
+            
+        Returns:
+            The ColumnarStats, or None if the database wasn't opened with columnar=True,
+            NumPy isn't installed or there's no read pool to load it through
+        """
+        if not self.columnar or self.read_pool is None:
+            return None
+        player_id = self.player_id if player_id is None else player_id
+        # Not _write_lock: reads mustn't queue behind an ingestion transaction
+        with self._columnar_lock:
+            if player_id not in self._columnar:
+                with self._reader() as conn:
+                    columns = STAT_COLUMNS + tuple(self._registered_stat_paths(conn))
+                self._columnar[player_id] = ColumnarStats(self, player_id, columns)
+            return self._columnar[player_id]
+    
+    def _note_columnar_read(self, columnar: ColumnarStats):
+        """Keep a cached read out of the result cache if `columnar` answered it from an older refresh."""
+        if columnar.read_behind():
+            self._stale_reads.flag = True
+    
+    @cached_read
+    def aggregate(self,
+                  stats: Optional[List[str]] = None,
+                  aggregates: Iterable[str] = ('avg',),
+                  group_by: Iterable[str] = (),
+                  last_n_matches: Optional[int] = None,
+                  result: Optional[str] = None,
+                  playlist: Optional[str] = None,
+                  player_id: Optional[str] = None) -> List[Dict]:
+        """
+        Aggregate stats per group in one SQL statement.
+        
+        Args:
+            stats: Columns to aggregate (any of stat_columns(); default: every built-in stat)
+            aggregates: Any of 'avg', 'min', 'max', 'sum', 'median', 'stddev' and
+                percentiles such as 'p10' or 'p90'
+            group_by: Any of 'result', 'playlist', 'team_color', 'day', 'week',
+                'session' (matches less than 30 minutes apart; keyed by the
+                epoch of its first match) and 'player'
+            last_n_matches: Only each group's most recent N matches
+            result: Only 'win' or 'loss' matches
+            playlist: Only this playlist
+            player_id: Only this player's matches (default: the database's player)
+            
+        Returns:
+            One dictionary per group, ordered by the group keys, with the keys,
+            'count' and '<aggregate>_<column>' for every stat and aggregate
+        """
+        with self._reader() as conn:
+            columns = list(stats) if stats else list(STAT_COLUMNS)
+            self._check_stat_columns(conn, columns)
+            return self._aggregate(conn, columns, tuple(aggregates), tuple(group_by), last_n_matches,
+                                   result=result, playlist=playlist, player_id=player_id)
+    
+    def _aggregate(self, conn: sqlite3.Connection, columns: List[str], aggregates: Tuple[str, ...],
+                   group_by: Tuple[str, ...] = (), last_n_matches: Optional[int] = None,
+                   result: Optional[str] = None, playlist: Optional[str] = None,
+                   player_id: Optional[str] = None) -> List[Dict]:
+        """Run a compiled aggregation for already validated columns."""
+        scope, scope_params = self._player_scope(player_id)
+        filters, filter_params = [], []
+        if result is not None:
+            filters.append("result = ?")
+            filter_params.append(result)
+        if playlist is not None:
+            filters.append("playlist = ?")
+            filter_params.append(playlist)
+        query = compile_aggregate(columns, aggregates, group_by, scope, scope_params,
+                                  filters, filter_params, last_n_matches)
+        return query.finish(conn.execute(query.sql, query.params))
     
-    def get_match_by_id(self, replay_id: str) -> Optional[Dict]:
+    def _average_columns(self, conn: sqlite3.Connection, fields: Tuple[Tuple[str, str], ...],
+                         stats: Optional[List[str]]) -> List[str]:
+        """Columns behind `fields` plus validated extra stats, without duplicates."""
+        if stats:
+            self._check_stat_columns(conn, stats)
+        return list(dict.fromkeys([column for _, column in fields] + list(stats or [])))
+    
+    def _average_fields(self, row: Optional[Dict], fields: Tuple[Tuple[str, str], ...],
+                        stats: Optional[List[str]], count_field: str = 'count') -> Dict:
+        """Rename an aggregate row's averages to their field names (an empty group averages to None)."""
+        row = row or {}
+        averages = {count_field: row.get('count', 0)}
+        for field, column in fields:
+            averages[field] = row.get(f'avg_{column}')
+        for column in stats or []:
+            averages[f'avg_{column}'] = row.get(f'avg_{column}')
+        return averages
+    
+    def get_match_by_id(self,
+                        replay_id: str,
+                        include_stats: bool = True,
+                        player_id: Optional[str] = None) -> Optional[Dict]:
         """
         Get a specific match by replay ID.
         
         Args:
             replay_id: Ballchasing replay ID
+            include_stats: Also decode the full Ballchasing stats into 'full_stats'
+            player_id: Whose match (default: the database's player, or the first found)
             
         Returns:
             Match dictionary or None if not found
         """
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT * FROM matches WHERE replay_id = ?", (replay_id,))
-        row = cursor.fetchone()
-        if row:
+        conditions, params = self._player_scope(player_id)
+        with self._reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT * FROM matches WHERE {' AND '.join(conditions + ['replay_id = ?'])} LIMIT 1",
+                           params + [replay_id])
+            row = cursor.fetchone()
+            if not row:
+                return None
+            
             match = dict(row)
-            # Parse the JSON stats back into a dictionary
-            if match.get('stats_json'):
-                match['full_stats'] = json.loads(match['stats_json'])
+            if include_stats:
+                cursor.execute("SELECT stats FROM match_stats WHERE player_id = ? AND replay_id = ?",
+                               (match['player_id'], replay_id))
+                stats_row = cursor.fetchone()
+                if stats_row and stats_row[0] is not None:
+                    match['full_stats'] = decode_stats(stats_row[0])
             return match
-        return None
+    
+    def get_match_stats(self, replay_id: str, player_id: Optional[str] = None) -> Optional[Dict]:
+        """
+        Get the full Ballchasing stats stored for a match.
+        
+        Args:
+            replay_id: Ballchasing replay ID
+            player_id: Whose stats (default: the database's player, or the first found)
+            
+        Returns:
+            Decoded stats dictionary or None if not stored
+        """
+        conditions, params = self._player_scope(player_id)
+        with self._reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT stats FROM match_stats WHERE {' AND '.join(conditions + ['replay_id = ?'])} LIMIT 1",
+                           params + [replay_id])
+            row = cursor.fetchone()
+            return decode_stats(row[0]) if row and row[0] is not None else None
+    
+    def delete_match(self, replay_id: str, commit: bool = True, player_id: Optional[str] = None) -> bool:
+        """
+        Delete a match, its raw stats and its contribution to the rolling aggregates.
+        
+        Args:
+            replay_id: Ballchasing replay ID
+            commit: Commit immediately (False joins the current transaction)
+            player_id: Whose match (default: the database's player, or every player's)
+            
+        Returns:
+            True if the match existed
+        """
+        conditions, params = self._player_scope(player_id)
+        where = " AND ".join(conditions + ["replay_id = ?"])
+        params = params + [replay_id]
+        with self._write_lock:
+            cursor = self.conn.cursor()
+            cursor.execute(f"SELECT 1 FROM rolling_aggregate_members WHERE {where} LIMIT 1", params)
+            was_in_window = cursor.fetchone() is not None
+            scopes = _rolling_scopes(self.conn, where, params) if was_in_window else set()
+            
+            cursor.execute(f"DELETE FROM matches WHERE {where}", params)
+            deleted = cursor.rowcount > 0
+            cursor.execute(f"DELETE FROM match_stats WHERE {where}", params)
+            # Participants are per replay: kept while anyone's copy of the match is
+            cursor.execute("""
+                DELETE FROM match_players
+                WHERE replay_id = ? AND NOT EXISTS (SELECT 1 FROM matches WHERE replay_id = ?)
+            """, (replay_id, replay_id))
+            _recount_rolling_scopes(self.conn, scopes)
+            if commit:
+                self.conn.commit()
+            return deleted
+    
+    def get_match_players(self, replay_id: str) -> List[Dict]:
+        """
+        Get every participant of a saved match.
+        
+        Args:
+            replay_id: Ballchasing replay ID
+            
+        Returns:
+            List of participant dictionaries, blue team first
+        """
+        with self._reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT * FROM match_players WHERE replay_id = ?
+                ORDER BY team_color, score DESC
+            """, (replay_id,))
+            return [dict(row) for row in cursor.fetchall()]
+    
+    @cached_read
+    def get_teammates(self,
+                      min_matches: int = 1,
+                      limit: int = 20,
+                      player_id: Optional[str] = None) -> List[Dict]:
+        """
+        Get the player's record and average stats with each teammate.
+        
+        Args:
+            min_matches: Leave out teammates seen in fewer matches
+            limit: Maximum number of teammates (most matches together first)
+            player_id: Whose teammates (default: the database's player)
+            
+        Returns:
+            List of dictionaries with the teammate's identity, 'matches', 'wins',
+            'win_rate', the player's own averages and the teammate's ('teammate_avg_*')
+        """
+        conditions, params = self._player_scope(player_id, column="m.player_id")
+        conditions.append("mp.platform_id != m.player_id")
+        with self._reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                SELECT
+                    mp.platform, mp.platform_id, MAX(mp.name) as name,
+                    COUNT(*) as matches,
+                    SUM(m.result = 'win') as wins,
+                    ROUND(AVG(m.result = 'win'), 3) as win_rate,
+                    AVG(m.goals) as avg_goals,
+                    AVG(m.saves) as avg_saves,
+                    AVG(m.score) as avg_score,
+                    AVG(mp.goals) as teammate_avg_goals,
+                    AVG(mp.saves) as teammate_avg_saves,
+                    AVG(mp.score) as teammate_avg_score
+                FROM matches m
+                JOIN match_players mp ON mp.replay_id = m.replay_id AND mp.team_color = m.team_color
+                WHERE {' AND '.join(conditions)}
+                GROUP BY mp.platform, mp.platform_id
+                HAVING COUNT(*) >= ?
+                ORDER BY matches DESC, wins DESC
+                LIMIT ?
+            """, params + [min_matches, limit])
+            return [dict(row) for row in cursor.fetchall()]
+    
+    @cached_read
+    def get_opponent_history(self,
+                             opponent_id: str,
+                             limit: int = 20,
+                             player_id: Optional[str] = None) -> Dict:
+        """
+        Get the player's matches against one opponent.
+        
+        Args:
+            opponent_id: The opponent's platform ID (e.g. Steam ID)
+            limit: Maximum number of matches listed (newest first)
+            player_id: Whose matches (default: the database's player)
+            
+        Returns:
+            Dictionary with 'matches' (the player's match rows plus the
+            opponent's name, goals, saves and score), 'wins' and 'losses'
+        """
+        conditions, params = self._player_scope(player_id, column="m.player_id")
+        conditions.append("mp.platform_id = ?")
+        params.append(opponent_id)
+        joined = f"""
+            FROM match_players mp
+            JOIN matches m ON m.replay_id = mp.replay_id AND m.team_color != mp.team_color
+            WHERE {' AND '.join(conditions)}
+        """
+        with self._reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                SELECT COALESCE(SUM(m.result = 'win'), 0), COALESCE(SUM(m.result = 'loss'), 0)
+                {joined}
+            """, params)
+            wins, losses = cursor.fetchone()
+            cursor.execute(f"""
+                SELECT m.*, mp.name as opponent_name, mp.goals as opponent_goals,
+                       mp.saves as opponent_saves, mp.score as opponent_score
+                {joined}
+                ORDER BY m.date_epoch DESC, m.replay_id DESC
+                LIMIT ?
+            """, params + [limit])
+            return {
+                'opponent_id': opponent_id,
+                'wins': wins,
+                'losses': losses,
+                'matches': [dict(row) for row in cursor.fetchall()],
+            }
     
     def _find_player_team(self, match_data: Dict, player_stats: Dict) -> str:
         """Determine which team the player was on."""
@@ -269,97 +2076,443 @@ class MatchDatabase:
         else:
             return 'win' if orange_goals > blue_goals else 'loss'
     
-    def get_win_loss_averages(self, last_n_matches: int = 10) -> Dict:
+    @cached_read
+    def get_win_loss_averages(self,
+                              last_n_matches: int = 10,
+                              playlist: Optional[str] = None,
+                              stats: Optional[List[str]] = None,
+                              player_id: Optional[str] = None) -> Dict:
         """
         Calculate separate averages for wins and losses.
         
+        For one player, window sizes in ROLLING_WINDOWS are read from the
+        maintained rolling aggregates without touching the matches table;
+        other sizes, requests for extra stats and averages across every
+        player are computed from the most recent matches.
+        
         Args:
             last_n_matches: Number of recent matches to analyze
+            playlist: Only include this playlist (default: all playlists)
+            stats: Extra columns to average (any of stat_columns()), returned as 'avg_<column>'
+            player_id: Only this player's matches (default: the database's player)
             
         Returns:
             Dictionary with 'wins' and 'losses' subdictionaries
         """
-        cursor = self.conn.cursor()
+        player_id = self.player_id if player_id is None else player_id
+        if last_n_matches in ROLLING_WINDOWS and not stats and player_id is not None:
+            with self._reader() as conn:
+                wins = self._rolling_averages(conn, player_id, 'win', playlist, last_n_matches)
+                losses = self._rolling_averages(conn, player_id, 'loss', playlist, last_n_matches)
+        else:
+            with self._reader() as conn:
+                columns = self._average_columns(conn, WIN_LOSS_AVERAGES, stats)
+            # Outside the borrowed connection: a read may refresh, which borrows its own
+            columnar = self.columnar_stats(player_id)
+            if columnar is not None and columnar.has_columns(columns):
+                by_result = {}
+                for result in ('win', 'loss'):
+                    by_result[result] = columnar.averages(columns, last_n_matches, result, playlist)
+                    self._note_columnar_read(columnar)
+            else:
+                # Both results in one pass: the last N matches of each
+                with self._reader() as conn:
+                    groups = self._aggregate(conn, columns, ('avg',), ('result',), last_n_matches,
+                                             playlist=playlist, player_id=player_id)
+                by_result = {group['result']: group for group in groups}
+            wins = self._average_fields(by_result.get('win'), WIN_LOSS_AVERAGES, stats)
+            losses = self._average_fields(by_result.get('loss'), WIN_LOSS_AVERAGES, stats)
         
-        # Get averages for wins
+        return {
+            'wins': wins,
+            'losses': losses,
+            'total_wins': wins.get('count', 0),
+            'total_losses': losses.get('count', 0)
+        }
+    
+    def _rolling_averages(self, conn: sqlite3.Connection, player_id: str, result: str,
+                          playlist: Optional[str], window_size: int) -> Dict:
+        """Averages for one player's result from the maintained rolling aggregates."""
+        cursor = conn.cursor()
         cursor.execute("""
-            SELECT 
-                COUNT(*) as count,
-                AVG(goals) as avg_goals,
-                AVG(assists) as avg_assists,
-                AVG(saves) as avg_saves,
-                AVG(shots) as avg_shots,
-                AVG(shooting_percentage) as avg_shooting_pct,
-                AVG(avg_boost) as avg_boost,
-                AVG(percent_zero_boost) as avg_percent_zero_boost,
-                AVG(percent_full_boost) as avg_percent_full_boost,
-                AVG(amount_collected) as avg_boost_collected,
-                AVG(avg_speed) as avg_speed,
-                AVG(time_supersonic) as avg_time_supersonic,
-                AVG(percent_ground) as avg_percent_ground,
-                AVG(percent_low_air) as avg_percent_low_air,
-                AVG(percent_high_air) as avg_percent_high_air,
-                AVG(percent_defensive_third) as avg_percent_defensive_third,
-                AVG(percent_offensive_third) as avg_percent_offensive_third,
-                AVG(percent_neutral_third) as avg_percent_neutral_third,
-                AVG(time_behind_ball) as avg_time_behind_ball
-            FROM (
-                SELECT * FROM matches 
-                WHERE result = 'win'
-                ORDER BY date DESC 
-                LIMIT ?
+            SELECT * FROM rolling_aggregates
+            WHERE player_id = ? AND result = ? AND playlist = ? AND window_size = ?
+        """, (player_id, result, ALL_PLAYLISTS if playlist is None else playlist, window_size))
+        row = cursor.fetchone()
+        
+        count = row['match_count'] if row else 0
+        averages = {'count': count}
+        for field, column in WIN_LOSS_AVERAGES:
+            averages[field] = row[f'sum_{column}'] / count if count else None
+        return averages
+    
+    def _check_stat_columns(self, conn: sqlite3.Connection, stats: Iterable[str]):
+        """Raise ValueError unless every name is a built-in or registered stat column."""
+        columns = STAT_COLUMNS + tuple(self._registered_stat_paths(conn))
+        for column in stats:
+            if column not in columns:
+                raise ValueError(f"Cannot average '{column}'")
+    
+    def rebuild_rolling_aggregates(self, commit: bool = True):
+        """Recompute every rolling win/loss aggregate from the raw match rows."""
+        with self._write_lock:
+            _rebuild_rolling_aggregates(self.conn)
+            if commit:
+                self.conn.commit()
+    
+    def check_rolling_aggregates(self, repair: bool = False, tolerance: float = 1e-6) -> List[Dict]:
+        """
+        Compare the maintained rolling aggregates against a recount from the matches table.
+        
+        Args:
+            repair: Rebuild the aggregates if anything differs
+            tolerance: Allowed relative difference in sums (floating-point drift)
+            
+        Returns:
+            One dictionary per differing value ('player_id', 'result', 'playlist',
+            'window_size', 'field', 'stored', 'expected'); empty when consistent
+        """
+        fields = ['match_count'] + [f'sum_{column}' for column in ROLLING_SUM_COLUMNS]
+        
+        with self._write_lock:
+            cursor = self.conn.cursor()
+            cursor.execute(_rolling_totals_sql(f"({_rolling_members_sql()})"))
+            expected = {(row['player_id'], row['result'], row['playlist'], row['window_size']): row
+                        for row in cursor.fetchall()}
+            # Windows with nothing left in them may keep an all-zero row
+            cursor.execute("SELECT * FROM rolling_aggregates WHERE match_count > 0")
+            stored = {(row['player_id'], row['result'], row['playlist'], row['window_size']): row
+                      for row in cursor.fetchall()}
+            
+            mismatches = []
+            for key in sorted(expected.keys() | stored.keys()):
+                for field in fields:
+                    stored_value = stored[key][field] if key in stored else 0
+                    expected_value = expected[key][field] if key in expected else 0
+                    if abs(stored_value - expected_value) > tolerance * max(1.0, abs(expected_value)):
+                        mismatches.append({
+                            'player_id': key[0],
+                            'result': key[1],
+                            'playlist': key[2],
+                            'window_size': key[3],
+                            'field': field,
+                            'stored': stored_value,
+                            'expected': expected_value,
+                        })
+            
+            if mismatches and repair:
+                print(f"🔧 Rebuilding rolling aggregates ({len(mismatches)} values differed)")
+                self.rebuild_rolling_aggregates()
+        
+        return mismatches
+    
+    def _registered_stat_paths(self, conn: sqlite3.Connection) -> Dict[str, str]:
+        """Registered {column: stat path}, reloaded whenever the schema has changed."""
+        # Registering a path alters the matches table, which bumps schema_version,
+        # so other processes sharing the file pick new columns up too
+        version = conn.execute("PRAGMA schema_version").fetchone()[0]
+        if version != self._stat_paths_version:
+            rows = conn.execute("SELECT name, path FROM stat_columns ORDER BY created_at, name").fetchall()
+            self._stat_paths = {name: path for name, path in rows}
+            self._stat_paths_version = version
+        return self._stat_paths
+    
+    def stat_columns(self) -> Tuple[str, ...]:
+        """Columns that can be filtered, sorted and averaged: STAT_COLUMNS plus registered stat paths."""
+        with self._reader() as conn:
+            return STAT_COLUMNS + tuple(self._registered_stat_paths(conn))
+    
+    def register_stat_path(self, path: str, name: Optional[str] = None, index: bool = False) -> str:
+        """
+        Expose a stat from the raw Ballchasing stats as a matches column.
+        
+        New matches fill the column as they're saved; matches already stored
+        are filled by backfill_stat_columns(), which can run while the app is
+        live. Registering an already registered path just returns its column.
+        
+        Args:
+            path: Dotted path into a player's stats (e.g. 'movement.count_powerslide')
+            name: Column name (default: the path with dots replaced by underscores)
+            index: Also index the column, for filtering and sorting on it
+            
+        Returns:
+            The column name
+        """
+        if not STAT_PATH_PATTERN.match(path):
+            raise ValueError(f"Invalid stat path '{path}'")
+        name = name or path.replace('.', '_')
+        if not STAT_COLUMN_NAME_PATTERN.match(name):
+            raise ValueError(f"Invalid column name '{name}'")
+        
+        with self._write_lock:
+            registered = self._registered_stat_paths(self.conn)
+            existing = next((column for column, known in registered.items() if known == path), None)
+            if existing is None:
+                columns = {row[1] for row in self.conn.execute("PRAGMA table_info(matches)")}
+                if name in columns:
+                    raise ValueError(f"Column '{name}' already exists")
+            
+            try:
+                if not self.conn.in_transaction:
+                    self.conn.execute("BEGIN")  # Keep the DDL and registry row together
+                if existing is None:
+                    self.conn.execute(f"ALTER TABLE matches ADD COLUMN {name} REAL")
+                    self.conn.execute("""
+                        INSERT INTO stat_columns (name, path, created_at) VALUES (?, ?, ?)
+                    """, (name, path, datetime.now().isoformat()))
+                    print(f"📐 Registered stat column {name} ({path})")
+                else:
+                    name = existing
+                if index:
+                    # Per player, with replay_id completing it for keyset pagination, like the date indexes
+                    self.conn.execute(f"CREATE INDEX IF NOT EXISTS idx_matches_stat_{name} "
+                                      f"ON matches (player_id, {name}, replay_id)")
+                    self.conn.execute("UPDATE stat_columns SET indexed = 1 WHERE name = ?", (name,))
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+        return name
+    
+    def backfill_stat_columns(self,
+                              chunk_size: int = 500,
+                              progress: Optional[Callable[[str, int], None]] = None) -> int:
+        """
+        Fill registered stat columns for matches saved before they were registered.
+        
+        Walks match_stats in (player_id, replay_id) order with one short transaction
+        per chunk and records its position after each, so ingestion keeps writing
+        in between and an interrupted run resumes where it stopped.
+        
+        Args:
+            chunk_size: Matches per transaction
+            progress: Called with (column, rows done so far) after each chunk
+            
+        Returns:
+            Number of rows updated
+        """
+        with self._write_lock:
+            pending = self.conn.execute("""
+                SELECT name, path, backfill_after FROM stat_columns WHERE backfilled = 0
+            """).fetchall()
+        
+        updated = 0
+        for name, path, after in pending:
+            def apply(conn: sqlite3.Connection, rows: List[sqlite3.Row]):
+                values = [(stat_path_value(decode_stats(stats), path) if stats is not None else None,
+                           player_id, replay_id)
+                          for player_id, replay_id, stats in rows]
+                conn.executemany(f"UPDATE matches SET {name} = ? WHERE player_id = ? AND replay_id = ?", values)
+            
+            def checkpoint(conn: sqlite3.Connection, last: List, count: int):
+                conn.execute("UPDATE stat_columns SET backfill_after = ? WHERE name = ?", (json.dumps(last), name))
+            
+            def finish(conn: sqlite3.Connection):
+                conn.execute("UPDATE stat_columns SET backfilled = 1 WHERE name = ?", (name,))
+            
+            updated += self._run_in_chunks(
+                "SELECT player_id, replay_id, stats FROM match_stats", ('player_id', 'replay_id'),
+                json.loads(after) if after else None, apply, checkpoint, finish, chunk_size,
+                on_chunk=(lambda done: progress(name, done)) if progress else None
             )
-        """, (last_n_matches,))
+        return updated
+    
+    def get_stat_columns(self) -> List[Dict]:
+        """Get the stat path registry with each column's index and backfill status."""
+        with self._reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM stat_columns ORDER BY created_at, name")
+            return [dict(row) for row in cursor.fetchall()]
+    
+    def get_pending_replay(self, replay_id: str) -> Optional[Dict]:
+        """
+        Get the pending-queue entry for a replay.
         
-        win_row = cursor.fetchone()
-        wins = dict(win_row) if win_row else {}
+        Args:
+            replay_id: Ballchasing replay ID
+            
+        Returns:
+            Entry dictionary or None if the replay isn't queued
+        """
+        with self._write_lock:
+            cursor = self.conn.cursor()
+            cursor.execute("SELECT * FROM pending_replays WHERE replay_id = ?", (replay_id,))
+            row = cursor.fetchone()
+            return dict(row) if row else None
+    
+    def upsert_pending_replay(self,
+                              replay_id: str,
+                              first_seen: float,
+                              attempts: int,
+                              next_check_at: float,
+                              parked: bool,
+                              last_status: Optional[str],
+                              commit: bool = True):
+        """Insert or update a pending-queue entry."""
+        with self._write_lock:
+            cursor = self.conn.cursor()
+            cursor.execute("""
+                INSERT OR REPLACE INTO pending_replays (
+                    replay_id, first_seen, attempts, next_check_at, parked, last_status
+                ) VALUES (?, ?, ?, ?, ?, ?)
+            """, (replay_id, first_seen, attempts, next_check_at, int(parked), last_status))
+            if commit:
+                self.conn.commit()
+    
+    def get_due_pending_replays(self, now: float, limit: int = 50) -> List[str]:
+        """
+        Get queued replays whose next check time has passed.
         
-        # Get averages for losses
-        cursor.execute("""
-            SELECT 
-                COUNT(*) as count,
-                AVG(goals) as avg_goals,
-                AVG(assists) as avg_assists,
-                AVG(saves) as avg_saves,
-                AVG(shots) as avg_shots,
-                AVG(shooting_percentage) as avg_shooting_pct,
-                AVG(avg_boost) as avg_boost,
-                AVG(percent_zero_boost) as avg_percent_zero_boost,
-                AVG(percent_full_boost) as avg_percent_full_boost,
-                AVG(amount_collected) as avg_boost_collected,
-                AVG(avg_speed) as avg_speed,
-                AVG(time_supersonic) as avg_time_supersonic,
-                AVG(percent_ground) as avg_percent_ground,
-                AVG(percent_low_air) as avg_percent_low_air,
-                AVG(percent_high_air) as avg_percent_high_air,
-                AVG(percent_defensive_third) as avg_percent_defensive_third,
-                AVG(percent_offensive_third) as avg_percent_offensive_third,
-                AVG(percent_neutral_third) as avg_percent_neutral_third,
-                AVG(time_behind_ball) as avg_time_behind_ball
-            FROM (
-                SELECT * FROM matches 
-                WHERE result = 'loss'
-                ORDER BY date DESC 
+        Args:
+            now: Current epoch time
+            limit: Maximum number of IDs to return
+            
+        Returns:
+            Replay IDs, most overdue first (parked replays are excluded)
+        """
+        with self._write_lock:
+            cursor = self.conn.cursor()
+            cursor.execute("""
+                SELECT replay_id FROM pending_replays
+                WHERE parked = 0 AND next_check_at <= ?
+                ORDER BY next_check_at
                 LIMIT ?
-            )
-        """, (last_n_matches,))
+            """, (now, limit))
+            return [row[0] for row in cursor.fetchall()]
+    
+    def get_parked_replays(self) -> List[Dict]:
+        """Get replays that were given up on after repeated failed checks."""
+        with self._reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM pending_replays WHERE parked = 1 ORDER BY first_seen")
+            return [dict(row) for row in cursor.fetchall()]
+    
+    def delete_pending_replay(self, replay_id: str, commit: bool = True):
+        """Remove a replay from the pending queue."""
+        with self._write_lock:
+            cursor = self.conn.cursor()
+            cursor.execute("DELETE FROM pending_replays WHERE replay_id = ?", (replay_id,))
+            if commit:
+                self.conn.commit()
+    
+    def mark_replay_processed(self, replay_id: str, commit: bool = True):
+        """Record that every roster row of a replay has been saved."""
+        with self._write_lock:
+            cursor = self.conn.cursor()
+            cursor.execute("INSERT OR REPLACE INTO processed_replays (replay_id, processed_at) VALUES (?, ?)",
+                           (replay_id, time.time()))
+            if commit:
+                self.conn.commit()
+    
+    def processed_replay_ids(self, replay_ids: Iterable[str]) -> Set[str]:
+        """
+        Check which of several replays were recorded by mark_replay_processed().
         
-        loss_row = cursor.fetchone()
-        losses = dict(loss_row) if loss_row else {}
+        Args:
+            replay_ids: Ballchasing replay IDs
+            
+        Returns:
+            Subset of the given IDs already processed
+        """
+        with self._write_lock:
+            replay_ids = list(replay_ids)
+            processed = set()
+            cursor = self.conn.cursor()
+            for start in range(0, len(replay_ids), 500):
+                chunk = replay_ids[start:start + 500]
+                cursor.execute(f"SELECT replay_id FROM processed_replays "
+                               f"WHERE replay_id IN ({','.join('?' * len(chunk))})", chunk)
+                processed.update(row[0] for row in cursor.fetchall())
+            return processed
+    
+    def close(self):
+        """Close database connection (a running backfill stops after its current chunk)."""
+        with self._write_lock:
+            self._closed = True
+            self.conn.close()
+        if self.read_pool is not None:
+            self.read_pool.close()
+
+
+class PlayerShards:
+    """
+    Match history split into one database file per player.
+    
+    Every shard is an ordinary MatchDatabase scoped to its player, with its
+    own writer and read pool, so one player's heavy backfill never holds a
+    lock another player's reads or ingestion wait on.
+    """
+    
+    def __init__(self, shard_dir: str = "data/players", **options):
+        """
+        Initialize the shard set; shards are opened on first use.
         
-        return {
-            'wins': wins,
-            'losses': losses,
-            'total_wins': wins.get('count', 0),
-            'total_losses': losses.get('count', 0)
-        }
+        Args:
+            shard_dir: Directory holding one <player_id>.db per player
+            **options: MatchDatabase keyword arguments applied to every shard
+        """
+        self.shard_dir = Path(shard_dir)
+        self.shard_dir.mkdir(parents=True, exist_ok=True)
+        self.options = options
+        self._shards: Dict[str, MatchDatabase] = {}
+        self._lock = threading.Lock()
+    
+    def path_for(self, player_id: str) -> Path:
+        """Database file holding a player's matches."""
+        # Also keeps the ID from naming a file outside shard_dir
+        if not re.match(r"^[A-Za-z0-9_-][A-Za-z0-9_.-]*$", player_id or ''):
+            raise ValueError(f"Invalid player ID '{player_id}'")
+        return self.shard_dir / f"{player_id}.db"
+    
+    def for_player(self, player_id: str) -> MatchDatabase:
+        """The (shared, lazily opened) database for one player."""
+        with self._lock:
+            if player_id not in self._shards:
+                self._shards[player_id] = MatchDatabase(str(self.path_for(player_id)),
+                                                        player_id=player_id, **self.options)
+            return self._shards[player_id]
+    
+    def players(self) -> List[str]:
+        """Players that have a shard on disk."""
+        return sorted(path.stem for path in self.shard_dir.glob("*.db"))
     
     def close(self):
-        """Close database connection."""
-        self.conn.close()
+        """Close every open shard."""
+        with self._lock:
+            for shard in self._shards.values():
+                shard.close()
+            self._shards.clear()
 
 
 # Helper function to create database instance
-def create_database(db_path: str = "data/matches.db") -> MatchDatabase:
-    """Create a database instance."""
-    return MatchDatabase(db_path)
\ No newline at end of file
+def create_database(db_path: str = "data/matches.db",
+                    defer_backfills: bool = False,
+                    player_id: Optional[str] = None,
+                    cache_size: int = 256) -> MatchDatabase:
+    """Create a database instance (COLUMNAR_STATS=1 keeps NumPy copies of the stats for averages)."""
+    return MatchDatabase(db_path, defer_backfills=defer_backfills, player_id=player_id, cache_size=cache_size,
+                         columnar=os.getenv("COLUMNAR_STATS", "0") == "1")
+
+
+def needs_player_owner(db_path: str) -> bool:
+    """
+    Whether opening `db_path` would key saved matches by player (migration 6),
+    so MatchDatabase must be given the player_id they belong to.
+    """
+    if not Path(db_path).exists():
+        return False
+    conn = sqlite3.connect(f"{Path(db_path).resolve().as_uri()}?mode=ro", uri=True)
+    try:
+        if conn.execute("PRAGMA user_version").fetchone()[0] >= 6:
+            return False
+        if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'matches'").fetchone():
+            return False
+        return conn.execute("SELECT 1 FROM matches LIMIT 1").fetchone() is not None
+    finally:
+        conn.close()
+
+
+def create_player_shards(**options) -> Optional[PlayerShards]:
+    """Per-player database files under DB_SHARD_DIR, or None to keep every player in one file."""
+    shard_dir = os.getenv("DB_SHARD_DIR")
+    return PlayerShards(shard_dir, **options) if shard_dir else None
\ No newline at end of file
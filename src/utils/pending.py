@@ -0,0 +1,74 @@
+"""Tracking of replays that Ballchasing hasn't finished processing yet."""
+
+import random
+import time
+from typing import Dict, List, Optional
+
+from .database import MatchDatabase
+
+
+class PendingReplayTracker:
+    """
+    Queue of replay IDs to re-check with exponential backoff.
+
+    A replay is listed as soon as it's uploaded, but its stats appear only
+    once Ballchasing has processed it. Such replays are queued here and
+    re-checked on their own schedule until they are ready, or parked after
+    `max_attempts` checks (or an explicit 'failed' status).
+    """
+
+    def __init__(self,
+                 db: MatchDatabase,
+                 base_delay: float = 15,
+                 max_delay: float = 1800,
+                 max_attempts: int = 12):
+        """
+        Initialize the tracker.
+
+        Args:
+            db: Match database holding the queue
+            base_delay: Seconds before the first re-check
+            max_delay: Longest wait between re-checks
+            max_attempts: Checks after which a replay is parked
+        """
+        self.db = db
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_attempts = max_attempts
+
+    def defer(self, replay_id: str, status: Optional[str] = None, commit: bool = True) -> bool:
+        """
+        Queue (or re-queue) a replay that isn't ready yet.
+
+        Args:
+            replay_id: Ballchasing replay ID
+            status: Status Ballchasing reported ('pending', 'failed', ...)
+            commit: Commit immediately (False joins the current transaction)
+
+        Returns:
+            True if the replay was parked instead of being scheduled again
+        """
+        now = time.time()
+        entry = self.db.get_pending_replay(replay_id)
+        attempts = (entry['attempts'] if entry else 0) + 1
+        first_seen = entry['first_seen'] if entry else now
+
+        parked = status == 'failed' or attempts >= self.max_attempts
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+        delay *= random.uniform(0.8, 1.2)  # Spread re-checks of replays uploaded together
+
+        self.db.upsert_pending_replay(replay_id, first_seen, attempts, now + delay, parked, status,
+                                      commit=commit)
+        return parked
+
+    def due(self, limit: int = 50) -> List[str]:
+        """Replay IDs whose next check is due."""
+        return self.db.get_due_pending_replays(time.time(), limit=limit)
+
+    def resolve(self, replay_id: str, commit: bool = True):
+        """Drop a replay from the queue once it has been ingested (or ruled out)."""
+        self.db.delete_pending_replay(replay_id, commit=commit)
+
+    def parked(self) -> List[Dict]:
+        """Replays given up on, for manual inspection."""
+        return self.db.get_parked_replays()
@@ -0,0 +1,127 @@
+"""Incremental polling of Ballchasing for newly uploaded replays."""
+
+import json
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from .ballchasing_client import AsyncBallchasingClient
+from .async_database import AsyncMatchDatabase
+
+
+class ReplayPoller:
+    """
+    Lists only replays uploaded after a persisted high-water mark.
+
+    The watermark is the upload time of the newest replay seen plus the IDs
+    uploaded at that exact instant, so an idle poll is a single (empty) list
+    call and no database lookups, and bursts spanning several pages are
+    paged through instead of being cut off.
+    """
+
+    STATE_KEY = "poll:watermark"
+
+    def __init__(self,
+                 client: AsyncBallchasingClient,
+                 db: AsyncMatchDatabase,
+                 uploader: str = "me",
+                 bootstrap_count: int = 5):
+        """
+        Initialize the poller.
+
+        Args:
+            client: Async Ballchasing client
+            db: Async match database (holds the watermark)
+            uploader: Uploader filter ('me' or a Steam ID)
+            bootstrap_count: Replays to look at on the very first poll, before any watermark exists
+        """
+        self.client = client
+        self.db = db
+        self.uploader = uploader
+        self.bootstrap_count = bootstrap_count
+        self._last_listed: List[Dict] = []
+
+    async def _load_watermark(self) -> Optional[Dict]:
+        """Read the watermark ({'created': ..., 'replay_ids': [...]}) from the database."""
+        value = await self.db.get_sync_state(self.STATE_KEY)
+        return json.loads(value) if value else None
+
+    async def poll(self) -> List[Dict]:
+        """
+        Fetch replays uploaded since the watermark that aren't in the database yet.
+
+        Returns:
+            Replay summaries, oldest upload first
+        """
+        watermark = await self._load_watermark()
+
+        if watermark is None:
+            replays = await self.client.get_replays(
+                uploader=self.uploader,
+                count=self.bootstrap_count,
+                sort_by="upload-date",
+                sort_dir="desc"
+            )
+            replays.reverse()
+        else:
+            filters = {
+                "uploader": self.uploader,
+                "created-after": watermark['created'],
+                "sort-by": "upload-date",
+                "sort-dir": "asc",
+            }
+            replays = []
+            async for page, _ in self.client.iter_replay_pages(filters):
+                replays.extend(page)
+
+            # created-after may be inclusive; drop what was already seen at the boundary
+            seen = set(watermark.get('replay_ids', []))
+            replays = [replay for replay in replays if replay['id'] not in seen]
+
+        self._last_listed = replays
+        if not replays:
+            return []
+
+        # Saved here, or processed with its rows in other players' shard files
+        replay_ids = [replay['id'] for replay in replays]
+        existing = await self.db.existing_replay_ids(replay_ids)
+        existing |= await self.db.processed_replay_ids(replay_ids)
+        return [replay for replay in replays if replay['id'] not in existing]
+
+    async def advance(self, replays: Optional[List[Dict]] = None):
+        """
+        Move the watermark past the given replays (default: everything the last poll listed).
+
+        Call this once the replays returned by poll() have been handled.
+        """
+        replays = replays if replays is not None else self._last_listed
+        self._last_listed = []
+
+        timed = [(_parse_created(replay.get('created')), replay) for replay in replays]
+        timed = [(created, replay) for created, replay in timed if created]
+        if not timed:
+            return
+
+        newest, _ = max(timed, key=lambda item: item[0])
+        watermark = await self._load_watermark()
+        if watermark and _parse_created(watermark['created']) > newest:
+            return
+
+        boundary_ids = [replay['id'] for created, replay in timed if created == newest]
+        if watermark and _parse_created(watermark['created']) == newest:
+            boundary_ids = sorted(set(boundary_ids) | set(watermark.get('replay_ids', [])))
+
+        newest_raw = next(replay['created'] for created, replay in timed if created == newest)
+        await self.db.set_sync_state(self.STATE_KEY, json.dumps({
+            'created': newest_raw,
+            'replay_ids': boundary_ids
+        }))
+
+
+def _parse_created(value: Optional[str]) -> Optional[datetime]:
+    """Parse Ballchasing's RFC3339 upload timestamp."""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
@@ -0,0 +1,210 @@
+"""Token-bucket rate limiting for the Ballchasing API."""
+
+import asyncio
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Mapping, Optional
+
+
+@dataclass(frozen=True)
+class TierLimits:
+    """Request allowance for one Ballchasing patron tier."""
+    per_second: float
+    per_hour: Optional[int]  # None means no hourly cap
+
+
+# Ballchasing's published per-tier API allowances. Unknown tiers fall back to "regular".
+TIER_LIMITS = {
+    "regular": TierLimits(per_second=2, per_hour=1000),
+    "gold": TierLimits(per_second=2, per_hour=2000),
+    "diamond": TierLimits(per_second=4, per_hour=5000),
+    "champion": TierLimits(per_second=8, per_hour=None),
+    "gc": TierLimits(per_second=16, per_hour=None),
+}
+
+
+class TokenBucket:
+    """
+    Classic token bucket: holds up to `capacity` tokens, refilled at `rate` per second.
+
+    Tokens are reserved up front, so concurrent callers queue behind each other
+    instead of racing for the same refill.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        """
+        Initialize the bucket (starts full).
+
+        Args:
+            rate: Tokens added per second
+            capacity: Maximum tokens the bucket can hold (burst size)
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now: float):
+        """Add tokens earned since the last update."""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def reserve(self, now: float) -> float:
+        """
+        Take one token, going into debt if the bucket is empty.
+
+        Returns:
+            Seconds the caller must wait before the token is actually available
+        """
+        self._refill(now)
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+    def drain_to(self, remaining: float, now: float):
+        """Clamp the bucket to what the server says is left."""
+        self._refill(now)
+        self.tokens = min(self.tokens, remaining)
+
+
+class RateLimiter:
+    """
+    Rate limiter for Ballchasing requests, shared by every caller of a client.
+
+    Combines a per-second and an optional per-hour token bucket, follows the
+    server's rate-limit headers and backs off with jitter after a 429.
+    Usable from both asyncio code (`acquire`) and blocking code (`acquire_blocking`).
+    """
+
+    def __init__(self,
+                 tier: str = "regular",
+                 backoff_base: float = 2.0,
+                 backoff_cap: float = 60.0):
+        """
+        Initialize the limiter.
+
+        Args:
+            tier: Ballchasing patron tier (regular, gold, diamond, champion, gc)
+            backoff_base: First backoff delay in seconds after a 429 without Retry-After
+            backoff_cap: Longest backoff delay in seconds
+        """
+        self.tier = tier if tier in TIER_LIMITS else "regular"
+        limits = TIER_LIMITS[self.tier]
+        self.per_second = TokenBucket(limits.per_second, limits.per_second)
+        self.per_hour = TokenBucket(limits.per_hour / 3600, limits.per_hour) if limits.per_hour else None
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Reserve a slot in every bucket and return how long to wait for it."""
+        with self._lock:
+            now = time.monotonic()
+            wait = self.per_second.reserve(now)
+            if self.per_hour:
+                wait = max(wait, self.per_hour.reserve(now))
+            return max(wait, self.paused_until - now)
+
+    async def acquire(self):
+        """Wait (without blocking the event loop) until a request may be sent."""
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def acquire_blocking(self):
+        """Wait (blocking the current thread) until a request may be sent."""
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    def pause(self, seconds: float):
+        """Hold back every caller for at least `seconds`."""
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def update_from_headers(self, headers: Mapping[str, str]):
+        """
+        Sync the limiter with quota information returned by the server.
+
+        Args:
+            headers: Response headers (X-RateLimit-Remaining / X-RateLimit-Reset if present)
+        """
+        remaining = _parse_float(headers.get("X-RateLimit-Remaining"))
+        if remaining is None:
+            return
+
+        with self._lock:
+            now = time.monotonic()
+            bucket = self.per_hour or self.per_second
+            bucket.drain_to(remaining, now)
+
+        if remaining <= 0:
+            reset = _parse_float(headers.get("X-RateLimit-Reset"))
+            if reset is not None:
+                # Either an epoch timestamp or a number of seconds from now
+                self.pause(max(0.0, reset - time.time()) if reset > 1e9 else reset)
+
+    def backoff_delay(self, attempt: int, headers: Optional[Mapping[str, str]] = None) -> float:
+        """
+        Compute how long to back off after a 429 and pause the limiter for it.
+
+        Args:
+            attempt: Zero-based retry attempt
+            headers: Headers of the 429 response
+
+        Returns:
+            Seconds every caller will now wait
+        """
+        retry_after = parse_retry_after(headers.get("Retry-After")) if headers else None
+        if retry_after is not None:
+            delay = retry_after + random.uniform(0, 1)
+        else:
+            # Exponential backoff with full jitter
+            delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+
+        self.pause(delay)
+        return delay
+
+
+def _parse_float(value: Optional[str]) -> Optional[float]:
+    """Parse a numeric header, returning None if absent or malformed."""
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse a Retry-After header.
+
+    Args:
+        value: Either delay-seconds or an HTTP date
+
+    Returns:
+        Seconds to wait, or None if the header is missing or unparseable
+    """
+    seconds = _parse_float(value)
+    if seconds is not None:
+        return max(0.0, seconds)
+    if not value:
+        return None
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+# Helper function to create limiter from environment
+def create_rate_limiter() -> RateLimiter:
+    """Create a rate limiter for the tier in BALLCHASING_TIER (default: regular)."""
+    return RateLimiter(tier=os.getenv("BALLCHASING_TIER", "regular").lower())
@@ -0,0 +1,204 @@
+"""On-disk cache for Ballchasing replay detail responses."""
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional
+
+
+@dataclass
+class CachedReplay:
+    """A cached replay detail response plus the validators needed to revalidate it."""
+    replay_id: str
+    body: Dict
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+    @property
+    def is_final(self) -> bool:
+        """True once Ballchasing has finished processing; final replays never change."""
+        return self.body.get('status') == 'ok'
+
+    def conditional_headers(self) -> Dict[str, str]:
+        """Headers for a conditional GET that returns 304 if the replay is unchanged."""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class ReplayCache:
+    """
+    Size-bounded LRU cache of replay details, stored as one file per replay.
+
+    Files live under a two-character fan-out directory derived from a hash of
+    the replay ID, so no single directory grows too large.
+    """
+
+    def __init__(self,
+                 cache_dir: str = "data/replay_cache",
+                 max_bytes: int = 512 * 1024 * 1024,
+                 compress: bool = True):
+        """
+        Initialize the cache, indexing whatever is already on disk.
+
+        Args:
+            cache_dir: Directory holding cached responses
+            max_bytes: Total size after which least recently used entries are evicted
+            compress: Gzip new entries (existing entries are read either way)
+        """
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.compress = compress
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Path, int]" = OrderedDict()  # path -> size, oldest first
+        self._total_bytes = 0
+        self._load_index()
+
+    def _load_index(self):
+        """Rebuild the LRU order from file modification times."""
+        files = []
+        for path in self.cache_dir.glob("*/*.json*"):
+            stat = path.stat()
+            files.append((stat.st_mtime, path, stat.st_size))
+
+        for _, path, size in sorted(files):
+            self._entries[path] = size
+            self._total_bytes += size
+
+    def _path_for(self, replay_id: str, compressed: bool) -> Path:
+        """Location of a replay's cache file."""
+        shard = hashlib.sha1(replay_id.encode()).hexdigest()[:2]
+        suffix = ".json.gz" if compressed else ".json"
+        return self.cache_dir / shard / f"{replay_id}{suffix}"
+
+    def get(self, replay_id: str) -> Optional[CachedReplay]:
+        """
+        Look up a replay.
+
+        Args:
+            replay_id: Ballchasing replay ID
+
+        Returns:
+            The cached entry, or None if it isn't cached
+        """
+        for compressed in (True, False):
+            path = self._path_for(replay_id, compressed)
+            try:
+                raw = path.read_bytes()
+            except FileNotFoundError:
+                continue
+
+            if compressed:
+                raw = gzip.decompress(raw)
+            entry = json.loads(raw)
+            self._touch(path)
+            self.hits += 1
+            return CachedReplay(
+                replay_id=replay_id,
+                body=entry['body'],
+                etag=entry.get('etag'),
+                last_modified=entry.get('last_modified')
+            )
+
+        self.misses += 1
+        return None
+
+    def put(self,
+            replay_id: str,
+            body: Dict,
+            etag: Optional[str] = None,
+            last_modified: Optional[str] = None):
+        """
+        Store a replay detail response.
+
+        Args:
+            replay_id: Ballchasing replay ID
+            body: Parsed JSON response
+            etag: ETag header of the response
+            last_modified: Last-Modified header of the response
+        """
+        raw = json.dumps({
+            'replay_id': replay_id,
+            'etag': etag,
+            'last_modified': last_modified,
+            'body': body
+        }, separators=(',', ':')).encode()
+        if self.compress:
+            raw = gzip.compress(raw)
+
+        path = self._path_for(replay_id, self.compress)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Write atomically so a crash never leaves a truncated entry behind
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        tmp_path.write_bytes(raw)
+        os.replace(tmp_path, path)
+
+        # Drop a copy stored with the other compression setting, if any
+        self._remove(self._path_for(replay_id, not self.compress))
+
+        with self._lock:
+            self._total_bytes += len(raw) - self._entries.pop(path, 0)
+            self._entries[path] = len(raw)
+        self._evict()
+
+    def refresh(self, replay_id: str):
+        """Mark an entry as just used after a 304 revalidation."""
+        for compressed in (True, False):
+            path = self._path_for(replay_id, compressed)
+            if path in self._entries:
+                self._touch(path)
+
+    def _touch(self, path: Path):
+        """Move an entry to the most recently used end."""
+        with self._lock:
+            if path in self._entries:
+                self._entries.move_to_end(path)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+
+    def _remove(self, path: Path):
+        """Delete one entry from disk and the index."""
+        with self._lock:
+            self._total_bytes -= self._entries.pop(path, 0)
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+
+    def _evict(self):
+        """Delete least recently used entries until the cache fits its budget."""
+        while True:
+            with self._lock:
+                if self._total_bytes <= self.max_bytes or len(self._entries) <= 1:
+                    return
+                path = next(iter(self._entries))
+            self._remove(path)
+
+    @property
+    def size_bytes(self) -> int:
+        """Total size of all cached entries."""
+        return self._total_bytes
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# Helper function to create cache from environment
+def create_replay_cache() -> ReplayCache:
+    """Create a replay cache sized by REPLAY_CACHE_MAX_MB (default 512)."""
+    max_mb = int(os.getenv("REPLAY_CACHE_MAX_MB", "512"))
+    return ReplayCache(max_bytes=max_mb * 1024 * 1024)
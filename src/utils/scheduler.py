@@ -0,0 +1,86 @@
+"""Adaptive poll scheduling that follows the player's play sessions."""
+
+import asyncio
+import os
+import time
+from typing import Optional
+
+
+class AdaptivePollScheduler:
+    """
+    Decides how long to wait between Ballchasing polls.
+
+    Polls at `min_interval` right after an upload is seen, then backs off
+    exponentially on every empty poll. While a session is considered active
+    (an upload within `session_window` seconds) the interval is capped at
+    `session_max_interval` so the next match is still picked up quickly;
+    once the session ends it decays all the way to `max_interval`.
+    """
+
+    def __init__(self,
+                 min_interval: float = 5,
+                 max_interval: float = 300,
+                 decay: float = 1.5,
+                 session_window: float = 900,
+                 session_max_interval: float = 30):
+        """
+        Initialize the scheduler.
+
+        Args:
+            min_interval: Seconds between polls right after activity
+            max_interval: Longest wait between polls when idle
+            decay: Factor the interval grows by after each empty poll
+            session_window: Seconds after the last upload during which a session counts as active
+            session_max_interval: Longest wait between polls during an active session
+        """
+        self.min_interval = min_interval
+        self.max_interval = max(max_interval, min_interval)
+        self.decay = decay
+        self.session_window = session_window
+        self.session_max_interval = min(session_max_interval, self.max_interval)
+        self.interval = min_interval
+        self.last_activity: Optional[float] = None
+        self._wake_event = asyncio.Event()
+
+    @property
+    def in_session(self) -> bool:
+        """True if an upload was seen within the session window."""
+        return (self.last_activity is not None
+                and time.monotonic() - self.last_activity < self.session_window)
+
+    def record_poll(self, new_matches: int):
+        """
+        Update the interval after a poll.
+
+        Args:
+            new_matches: Number of new replays the poll found
+        """
+        if new_matches > 0:
+            self.last_activity = time.monotonic()
+            self.interval = self.min_interval
+            return
+
+        cap = self.session_max_interval if self.in_session else self.max_interval
+        self.interval = min(cap, self.interval * self.decay)
+
+    def wake(self):
+        """Poll now and return to fast polling (e.g. a user just asked about their last game)."""
+        self.interval = self.min_interval
+        self._wake_event.set()
+
+    async def wait(self):
+        """Sleep until the next poll is due or wake() is called."""
+        try:
+            await asyncio.wait_for(self._wake_event.wait(), timeout=self.interval)
+        except asyncio.TimeoutError:
+            pass
+        self._wake_event.clear()
+
+
+# Helper function to create scheduler from environment
+def create_scheduler() -> AdaptivePollScheduler:
+    """Create a scheduler bounded by POLL_MIN_INTERVAL / POLL_MAX_INTERVAL (seconds)."""
+    return AdaptivePollScheduler(
+        min_interval=float(os.getenv("POLL_MIN_INTERVAL", "5")),
+        max_interval=float(os.getenv("POLL_MAX_INTERVAL", "300"))
+    )
@@ -0,0 +1,50 @@
+"""Command-line management of stat paths exposed as match columns."""
+
+import argparse
+import os
+
+from .database import create_database
+
+
+def _main():
+    """Command-line entry point."""
+    from dotenv import load_dotenv
+
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Expose Ballchasing stats as filterable match columns")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add = commands.add_parser("add", help="Register a stat path, e.g. movement.count_powerslide")
+    add.add_argument("path", help="Dotted path into a player's stats")
+    add.add_argument("--name", help="Column name (default: path with dots replaced by underscores)")
+    add.add_argument("--index", action="store_true", help="Index the column for filters and sorts")
+    add.add_argument("--no-backfill", action="store_true", help="Only fill matches saved from now on")
+
+    commands.add_parser("list", help="Show registered stat paths")
+    commands.add_parser("backfill", help="Fill registered columns for existing matches")
+    parser.add_argument("--steam-id", default=os.getenv("STEAM_ID"),
+                        help="Player that matches saved before player keys belong to (default: STEAM_ID)")
+    args = parser.parse_args()
+
+    db = create_database(player_id=args.steam_id)
+    try:
+        if args.command == "add":
+            name = db.register_stat_path(args.path, name=args.name, index=args.index)
+            print(f"✅ {args.path} is available as '{name}'")
+        if args.command == "backfill" or (args.command == "add" and not args.no_backfill):
+            updated = db.backfill_stat_columns(
+                progress=lambda column, done: print(f"   📄 {column}: {done} matches filled")
+            )
+            print(f"✅ Backfilled {updated} rows")
+        if args.command == "list":
+            for column in db.get_stat_columns():
+                status = "backfilled" if column['backfilled'] else "backfill pending"
+                index = ", indexed" if column['indexed'] else ""
+                print(f"{column['name']:32} {column['path']:40} ({status}{index})")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    _main()
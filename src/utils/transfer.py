@@ -0,0 +1,211 @@
+"""Streaming NDJSON export and import of the match store, for moving it between machines or shards."""
+
+import argparse
+import gzip
+import json
+import os
+from itertools import chain, islice
+from typing import Dict, IO, Iterable, Iterator, List, Optional
+
+from .database import MatchDatabase, PlayerShards
+
+# zlib's default: a third of the time level 9 (gzip's default) takes, for a file ~8% larger
+COMPRESS_LEVEL = 6
+
+
+def _open(path: str, mode: str, name: Optional[str] = None) -> IO[str]:
+    """Open an export file as text, gzip-compressed if its name (default: `path`) ends in '.gz'."""
+    if (name or path).endswith(".gz"):
+        return gzip.open(path, mode + "t", compresslevel=COMPRESS_LEVEL, encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def write_export(records: Iterable[Dict], path: str) -> int:
+    """
+    Write match records to a file, one JSON object per line.
+
+    The file is written under a temporary name and renamed when complete,
+    so an interrupted export never leaves a truncated file behind.
+
+    Args:
+        records: Dictionaries from MatchDatabase.export_matches
+        path: Destination (gzip-compressed if it ends in '.gz')
+
+    Returns:
+        Number of matches written
+    """
+    partial = path + ".partial"
+    count = 0
+    with _open(partial, "w", name=path) as file:
+        for record in records:
+            file.write(json.dumps(record, separators=(",", ":")) + "\n")
+            count += 1
+    os.replace(partial, path)
+    return count
+
+
+def read_export(path: str) -> Iterator[Dict]:
+    """Match records from an export file, read one line at a time."""
+    with _open(path, "r") as file:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
+def import_records(db: MatchDatabase,
+                   records: Iterable[Dict],
+                   batch_size: int = 50000,
+                   replace: bool = False) -> Dict[str, int]:
+    """
+    Save exported matches, committing every `batch_size` matches.
+
+    Each batch is one MatchDatabase.import_matches transaction, so ingestion
+    running against the same file gets the writer between batches.
+
+    Args:
+        db: Database to fill
+        records: Dictionaries from read_export (consumed lazily)
+        batch_size: Matches per transaction
+        replace: Overwrite matches already saved instead of skipping them
+
+    Returns:
+        Dictionary with 'inserted' and 'skipped' counts ('replaced' with replace=True)
+    """
+    records = iter(records)
+    totals: Dict[str, int] = {}
+    while True:
+        counts = db.import_matches(islice(records, batch_size), replace=replace)
+        if not any(counts.values()):
+            return totals or counts
+        for key, value in counts.items():
+            totals[key] = totals.get(key, 0) + value
+
+
+def import_sharded(shards: PlayerShards,
+                   records: Iterable[Dict],
+                   default_player: Optional[str] = None,
+                   batch_size: int = 50000,
+                   replace: bool = False) -> Dict[str, Dict[str, int]]:
+    """
+    Save exported matches into each player's shard, reading `records` once.
+
+    Records are routed to per-player batches; when `batch_size` are held in
+    all, the biggest batch is saved as one import_matches transaction on its
+    shard, so memory stays bounded however many players the file holds.
+
+    Args:
+        shards: Per-player databases to fill
+        records: Dictionaries from read_export (consumed lazily)
+        default_player: Player of records without a player_id
+        batch_size: Matches held before a batch is saved
+        replace: Overwrite matches already saved instead of skipping them
+
+    Returns:
+        Dictionary of player -> import_matches counts
+    """
+    batches: Dict[str, List[Dict]] = {}
+    totals: Dict[str, Dict[str, int]] = {}
+    held = 0
+
+    def flush(player: str) -> int:
+        batch = batches.pop(player)
+        counts = shards.for_player(player).import_matches(batch, replace=replace)
+        for key, value in counts.items():
+            totals.setdefault(player, {})[key] = totals.get(player, {}).get(key, 0) + value
+        return len(batch)
+
+    for record in records:
+        player = record.get('player_id') or default_player
+        if not player:
+            raise ValueError(f"Match {record.get('replay_id')} has no player_id and no default player was given")
+        batches.setdefault(player, []).append(record)
+        held += 1
+        if held >= batch_size:
+            held -= flush(max(batches, key=lambda name: len(batches[name])))
+    for player in list(batches):
+        flush(player)
+    return totals
+
+
+def _main():
+    """Command-line entry point."""
+    from dotenv import load_dotenv
+    from .database import create_database, create_player_shards, needs_player_owner
+
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Move match history between machines or shards as NDJSON")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export = commands.add_parser("export", help="Write matches to a file (gzip-compressed if it ends in .gz)")
+    export.add_argument("path", help="File to write, e.g. matches.ndjson.gz")
+    export.add_argument("--stats", action="store_true", help="Include each match's raw Ballchasing stats")
+    export.add_argument("--players", action="store_true", help="Include every participant of each match")
+    export.add_argument("--all-players", action="store_true", help="Export every stored player's matches")
+
+    load = commands.add_parser("import", help="Save matches from an export file, skipping ones already saved")
+    load.add_argument("path", help="File written by export")
+    load.add_argument("--replace", action="store_true", help="Overwrite matches that are already saved")
+    load.add_argument("--batch-size", type=int, default=50000, help="Matches per transaction")
+
+    for command in (export, load):
+        command.add_argument("--steam-id", default=os.getenv("STEAM_ID"),
+                             help="Player whose matches are exported, or who imported matches "
+                                  "without a player belong to (default: STEAM_ID)")
+    args = parser.parse_args()
+
+    shards = create_player_shards()
+    db: Optional[MatchDatabase] = None
+    try:
+        # Checked before any work: matches saved before player IDs, and imported ones
+        # without a player_id (an export file is all one way or the other), need an owner
+        records = read_export(args.path) if args.command == "import" else None
+        if not args.steam_id:
+            unowned = None
+            if not shards and needs_player_owner("data/matches.db"):
+                unowned = "the database holds matches saved before player IDs"
+            elif shards and args.command == "export" and not args.all_players:
+                unowned = "no player to export (use --all-players for everyone)"
+            elif records is not None:
+                first = next(records, None)
+                if first is not None and not first.get('player_id'):
+                    unowned = f"{args.path} has matches without a player_id"
+                records = chain([first] if first is not None else [], records)
+            if unowned:
+                parser.error(f"{unowned}: pass --steam-id (or set STEAM_ID)")
+        elif not shards and needs_player_owner("data/matches.db"):
+            create_database(player_id=args.steam_id).close()  # Migrate, so every player can be opened
+
+        if args.command == "export":
+            options = dict(include_stats=args.stats, include_players=args.players)
+            if shards:
+                players = shards.players() if args.all_players else [args.steam_id]
+                records = (record for player in players
+                           for record in shards.for_player(player).export_matches(**options))
+            else:
+                db = create_database(player_id=None if args.all_players else args.steam_id)
+                records = db.export_matches(**options)
+            count = write_export(records, args.path)
+            print(f"✅ Exported {count} matches to {args.path}")
+
+        if args.command == "import":
+            if shards:
+                results = import_sharded(shards, records, default_player=args.steam_id,
+                                         batch_size=args.batch_size, replace=args.replace)
+                targets = [(shards.for_player(player), counts) for player, counts in sorted(results.items())]
+            else:
+                db = create_database(player_id=args.steam_id)
+                targets = [(db, import_records(db, records, batch_size=args.batch_size, replace=args.replace))]
+            for target, counts in targets:
+                kept = (f"{counts['replaced']} replaced" if args.replace
+                        else f"{counts['skipped']} already saved")
+                print(f"✅ Imported {counts['inserted']} matches into {target.db_path} ({kept})")
+    finally:
+        if db is not None:
+            db.close()
+        if shards:
+            shards.close()
+
+
+if __name__ == "__main__":
+    _main()
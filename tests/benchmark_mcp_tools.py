@@ -0,0 +1,102 @@
+"""
+Per-call latency of the MCP tools: a fresh database per call vs the shared pool.
+
+"Per call" reproduces the old behaviour (open the database, run the query,
+close it), with backfills deferred and the result cache off so only the
+connection setup differs. "Pooled" goes through src.mcp_server.tools with
+the result cache off, so every call borrows a connection from the
+process-lifetime read pool and runs its query. "Cached" is the server as
+shipped: with no writes in between, repeats come from the result cache.
+
+    python tests/benchmark_mcp_tools.py --matches 2000 --rounds 200
+"""
+
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import argparse
+import statistics
+import tempfile
+import time
+
+from tests.test_match_database import make_records
+from src.mcp_server import tools
+from src.utils.database import create_database
+
+# (tool name, pooled tool call, equivalent call on a MatchDatabase)
+CALLS = [
+    ("get_latest_match", lambda: tools.get_latest_match(),
+     lambda db: db.get_recent_matches(limit=1)),
+    ("get_win_loss_comparison", lambda: tools.get_win_loss_comparison(20),
+     lambda db: db.get_win_loss_averages(last_n_matches=20)),
+    ("get_player_averages", lambda: tools.get_player_averages(10),
+     lambda db: db.get_averages(last_n_matches=10)),
+    ("query_matches", lambda: tools.query_matches(result="win", min_goals=2, limit=20),
+     lambda db: db.query_matches(result="win", ranges={"goals": (2, None)}, limit=20)),
+    ("get_match_details", lambda: tools.get_match_details("replay-00042"),
+     lambda db: db.get_match_by_id("replay-00042")),
+]
+
+
+def time_calls(call, rounds):
+    """Latencies in milliseconds of `rounds` calls."""
+    latencies = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        call()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def summarize(latencies):
+    latencies = sorted(latencies)
+    return statistics.median(latencies), latencies[int(0.95 * (len(latencies) - 1))]
+
+
+def run_benchmark(args):
+    db_path = str(Path(tempfile.mkdtemp()) / "matches.db")
+    seed_db = create_database(db_path)
+    seed_db.save_matches(make_records(args.matches))
+    seed_db.close()
+
+    def per_call(query):
+        def call():
+            db = create_database(db_path, defer_backfills=True, cache_size=0)
+            try:
+                query(db)
+            finally:
+                db.close()
+        return call
+
+    def shared(cache_size):
+        """Latencies of every tool through the shared handle, opened with `cache_size`."""
+        tools.open_database(db_path, cache_size=cache_size)
+        try:
+            summaries = []
+            for _, tool_call, _ in CALLS:
+                tool_call()  # Warm the pool and statement cache once, as a running server would be
+                summaries.append(summarize(time_calls(tool_call, args.rounds)))
+            return summaries, tools.get_database().cache
+        finally:
+            tools.close_database()
+
+    before = [summarize(time_calls(per_call(query), args.rounds)) for _, _, query in CALLS]
+    pooled, _ = shared(cache_size=0)
+    cached, cache = shared(cache_size=256)
+
+    print(f"⏱️  {args.rounds} calls per tool against {args.matches} matches (p50 / p95, ms)\n")
+    print(f"{'Tool':<26}{'per call':>20}{'pooled':>20}{'speedup':>9}{'cached':>20}{'speedup':>9}")
+    for (name, _, _), slow, pool, hit in zip(CALLS, before, pooled, cached):
+        print(f"{name:<26}{slow[0]:>10.3f} / {slow[1]:<7.3f}{pool[0]:>10.3f} / {pool[1]:<7.3f}"
+              f"{slow[0] / pool[0]:>8.1f}x{hit[0]:>10.3f} / {hit[1]:<7.3f}{slow[0] / hit[0]:>8.1f}x")
+    print(f"\n🗃️  Result cache: {cache.hits} hits, {cache.misses} misses")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark MCP tool call latency")
+    parser.add_argument("--matches", type=int, default=2000, help="Matches in the benchmark database")
+    parser.add_argument("--rounds", type=int, default=200, help="Calls per tool and mode")
+    run_benchmark(parser.parse_args())
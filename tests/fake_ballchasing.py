@@ -0,0 +1,407 @@
+"""
+Local stand-in for the Ballchasing API.
+
+Serves /api/replays and /api/replays/{id} from recorded cassettes or
+synthetic data, with configurable latency, 429 injection, pagination and
+processing delays. In record mode, requests it can't answer are forwarded
+to the real API and the responses are captured into the cassette.
+
+Run standalone:
+    python tests/fake_ballchasing.py --synthetic 500 --latency 0.05 --rate-limit 2
+    python tests/fake_ballchasing.py --record tests/cassettes/me.json.gz
+Then point the app at it with BALLCHASING_BASE_URL=http://127.0.0.1:8765/api
+"""
+
+import argparse
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import random
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from aiohttp import ClientSession, web
+
+PLAYLISTS = [
+    ("ranked-duels", "Ranked Duels", 1),
+    ("ranked-doubles", "Ranked Doubles", 2),
+    ("ranked-standard", "Ranked Standard", 3),
+]
+
+
+def _rfc3339(moment: datetime) -> str:
+    return moment.isoformat().replace("+00:00", "Z")
+
+
+def synthetic_player(rng: random.Random, steam_id: str, name: str) -> Dict:
+    """A player entry shaped like Ballchasing's replay details."""
+    goals = rng.choice([0, 0, 1, 1, 1, 2, 2, 3, 4])
+    shots = goals + rng.randint(0, 4)
+    return {
+        "id": {"platform": "steam", "id": steam_id},
+        "name": name,
+        "stats": {
+            "core": {
+                "shots": shots,
+                "goals": goals,
+                "saves": rng.randint(0, 4),
+                "assists": rng.randint(0, 2),
+                "score": 100 * goals + rng.randint(50, 400),
+                "shooting_percentage": round(100 * goals / shots, 2) if shots else 0,
+            },
+            "boost": {
+                "avg_amount": round(rng.uniform(25, 60), 2),
+                "amount_collected": rng.randint(800, 2500),
+                "amount_stolen": rng.randint(50, 600),
+                "percent_zero_boost": round(rng.uniform(3, 25), 2),
+                "percent_full_boost": round(rng.uniform(3, 20), 2),
+                "count_stolen_big": rng.randint(0, 8),
+                "count_stolen_small": rng.randint(0, 25),
+            },
+            "movement": {
+                "avg_speed": rng.randint(1300, 1800),
+                "time_supersonic_speed": round(rng.uniform(20, 90), 2),
+                "percent_ground": round(rng.uniform(50, 70), 2),
+                "percent_low_air": round(rng.uniform(25, 40), 2),
+                "percent_high_air": round(rng.uniform(1, 10), 2),
+                "count_powerslide": rng.randint(20, 120),
+            },
+            "positioning": {
+                "percent_defensive_third": round(rng.uniform(35, 55), 2),
+                "percent_neutral_third": round(rng.uniform(25, 40), 2),
+                "percent_offensive_third": round(rng.uniform(10, 30), 2),
+                "time_behind_ball": round(rng.uniform(150, 250), 2),
+                "time_infront_ball": round(rng.uniform(50, 120), 2),
+            },
+            "demo": {"inflicted": rng.randint(0, 4), "taken": rng.randint(0, 4)},
+        },
+    }
+
+
+def synthetic_replay(replay_id: str, steam_id: str, created: datetime, rng: random.Random) -> Dict:
+    """A complete replay details payload with `steam_id` on one of the teams."""
+    playlist_id, playlist_name, team_size = rng.choice(PLAYLISTS)
+    played = created - timedelta(minutes=rng.randint(1, 30))
+    teams = {"blue": [], "orange": []}
+    tracked_team = rng.choice(["blue", "orange"])
+    for color in teams:
+        for slot in range(team_size):
+            if color == tracked_team and slot == 0:
+                teams[color].append(synthetic_player(rng, steam_id, "Tracked"))
+            else:
+                other_id = str(76561190000000000 + rng.randint(0, 10 ** 9))
+                teams[color].append(synthetic_player(rng, other_id, f"{color}-{slot}"))
+
+    details = {
+        "id": replay_id,
+        "status": "ok",
+        "title": f"{playlist_name} {played:%Y-%m-%d %H:%M}",
+        "created": _rfc3339(created),
+        "date": played.astimezone(timezone(timedelta(hours=rng.choice([-5, 0, 2])))).isoformat(),
+        "duration": rng.randint(300, 420),
+        "playlist_id": playlist_id,
+        "playlist_name": playlist_name,
+    }
+    for color, players in teams.items():
+        details[color] = {
+            "color": color,
+            "players": players,
+            "stats": {"core": {"goals": sum(p["stats"]["core"]["goals"] for p in players)}},
+        }
+    return details
+
+
+def summary_for(details: Dict) -> Dict:
+    """The /replays list entry for a replay."""
+    return {
+        "id": details["id"],
+        "replay_title": details.get("title"),
+        "created": details.get("created"),
+        "date": details.get("date"),
+        "playlist_id": details.get("playlist_id"),
+        "playlist_name": details.get("playlist_name"),
+        "duration": details.get("duration"),
+    }
+
+
+class FakeBallchasing:
+    """In-process Ballchasing API stand-in built on aiohttp."""
+
+    def __init__(self,
+                 latency: float = 0.0,
+                 latency_jitter: float = 0.0,
+                 rate_limit_per_second: Optional[float] = None,
+                 inject_429_probability: float = 0.0,
+                 retry_after: float = 1.0,
+                 processing_delay: float = 0.0,
+                 upstream: Optional[str] = None,
+                 api_key: Optional[str] = None,
+                 steam_id: str = "76561198000000000",
+                 seed: Optional[int] = None):
+        """
+        Initialize the stand-in.
+
+        Args:
+            latency: Base delay added to every response, in seconds
+            latency_jitter: Extra random delay of up to this many seconds
+            rate_limit_per_second: Answer 429 once more requests than this arrive within a second
+            inject_429_probability: Chance of answering any request with a 429
+            retry_after: Retry-After value sent with 429 responses
+            processing_delay: Seconds after upload during which a replay reports status 'pending'
+            upstream: Real API root to forward unknown requests to (record mode)
+            api_key: API key for the upstream in record mode
+            steam_id: Player placed in every synthetic replay
+            seed: Random seed for reproducible synthetic data and fault injection
+        """
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.rate_limit_per_second = rate_limit_per_second
+        self.inject_429_probability = inject_429_probability
+        self.retry_after = retry_after
+        self.processing_delay = processing_delay
+        self.upstream = upstream.rstrip("/") if upstream else None
+        self.api_key = api_key
+        self.steam_id = steam_id
+        self.rng = random.Random(seed)
+
+        self.replays: Dict[str, Dict] = {}
+        self.uploaded_at: Dict[str, float] = {}
+        self.stats = {"list": 0, "details": 0, "not_modified": 0, "rate_limited": 0, "forwarded": 0}
+        self._recent_requests = deque()
+        self._runner: Optional[web.AppRunner] = None
+        self._upstream_session: Optional[ClientSession] = None
+
+        self.app = web.Application()
+        self.app.router.add_get("/api/replays", self._handle_list)
+        self.app.router.add_get("/api/replays/{replay_id}", self._handle_details)
+
+    # Data -----------------------------------------------------------------
+
+    def add_replay(self, details: Optional[Dict] = None, created: Optional[datetime] = None) -> str:
+        """
+        Add (upload) a replay.
+
+        Args:
+            details: Full details payload; a synthetic one is generated if omitted
+            created: Upload time for synthetic replays (default: now)
+
+        Returns:
+            The replay ID
+        """
+        if details is None:
+            replay_id = "%08x-%04x-%04x" % (self.rng.getrandbits(32), self.rng.getrandbits(16),
+                                            self.rng.getrandbits(16))
+            details = synthetic_replay(replay_id, self.steam_id,
+                                       created or datetime.now(timezone.utc), self.rng)
+        self.replays[details["id"]] = details
+        self.uploaded_at[details["id"]] = time.time()
+        return details["id"]
+
+    def add_synthetic_history(self, count: int, days: int = 180):
+        """Add `count` synthetic replays uploaded over the last `days` days."""
+        now = datetime.now(timezone.utc)
+        for _ in range(count):
+            created = now - timedelta(seconds=self.rng.uniform(0, days * 86400))
+            replay_id = self.add_replay(created=created)
+            self.uploaded_at[replay_id] = 0  # Long since processed
+
+    def load_cassette(self, path: str):
+        """Load replays from a cassette file (.json or .json.gz)."""
+        raw = Path(path).read_bytes()
+        if path.endswith(".gz"):
+            raw = gzip.decompress(raw)
+        for details in json.loads(raw)["replays"]:
+            self.replays[details["id"]] = details
+            self.uploaded_at[details["id"]] = 0
+
+    def save_cassette(self, path: str):
+        """Write every replay with full details to a cassette file (.json or .json.gz)."""
+        replays = [details for details in self.replays.values() if "blue" in details]
+        raw = json.dumps({"version": 1, "replays": replays}).encode()
+        if path.endswith(".gz"):
+            raw = gzip.compress(raw)
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        Path(path).write_bytes(raw)
+
+    # Server lifecycle -----------------------------------------------------
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """
+        Start serving.
+
+        Returns:
+            API root to pass as base_url (e.g. http://127.0.0.1:8765/api)
+        """
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        bound_port = site._server.sockets[0].getsockname()[1]
+        return f"http://{host}:{bound_port}/api"
+
+    async def stop(self):
+        """Stop serving."""
+        if self._upstream_session:
+            await self._upstream_session.close()
+        if self._runner:
+            await self._runner.cleanup()
+
+    # Handlers -------------------------------------------------------------
+
+    async def _before_response(self) -> Optional[web.Response]:
+        """Apply latency and fault injection; returns a 429 response if throttled."""
+        delay = self.latency + self.rng.uniform(0, self.latency_jitter)
+        if delay:
+            await asyncio.sleep(delay)
+
+        now = time.monotonic()
+        self._recent_requests.append(now)
+        while self._recent_requests and now - self._recent_requests[0] > 1:
+            self._recent_requests.popleft()
+
+        throttled = (self.rate_limit_per_second is not None
+                     and len(self._recent_requests) > self.rate_limit_per_second)
+        if throttled or self.rng.random() < self.inject_429_probability:
+            self.stats["rate_limited"] += 1
+            return web.json_response({"error": "rate limited"}, status=429,
+                                     headers={"Retry-After": str(self.retry_after)})
+        return None
+
+    async def _forward(self, request: web.Request) -> Dict:
+        """Fetch the same path from the real API (record mode)."""
+        if self._upstream_session is None:
+            self._upstream_session = ClientSession(headers={"Authorization": self.api_key or ""})
+        url = self.upstream + request.path[len("/api"):]
+        async with self._upstream_session.get(url, params=request.query) as response:
+            response.raise_for_status()
+            self.stats["forwarded"] += 1
+            return await response.json()
+
+    def _filtered_summaries(self, query) -> List[Dict]:
+        """Apply Ballchasing's list filters and sorting."""
+        items = []
+        player_id = query.get("player-id")
+        for details in self.replays.values():
+            if query.get("playlist") and details.get("playlist_id") != query["playlist"]:
+                continue
+            if player_id:
+                pid = player_id.partition(":")[2]
+                players = details.get("blue", {}).get("players", []) + \
+                    details.get("orange", {}).get("players", [])
+                if not any(p.get("id", {}).get("id") == pid for p in players):
+                    continue
+            items.append(summary_for(details))
+
+        def moment(value):
+            return datetime.fromisoformat(value.replace("Z", "+00:00")) if value else None
+
+        bounds = [("created-after", "created", 1), ("created-before", "created", -1),
+                  ("replay-date-after", "date", 1), ("replay-date-before", "date", -1)]
+        for param, field, direction in bounds:
+            if query.get(param):
+                limit = moment(query[param])
+                items = [item for item in items
+                         if item.get(field) and (moment(item[field]) - limit).total_seconds() * direction > 0]
+
+        sort_field = "created" if query.get("sort-by") == "upload-date" else "date"
+        items.sort(key=lambda item: moment(item[sort_field]), reverse=query.get("sort-dir", "desc") == "desc")
+        return items
+
+    async def _handle_list(self, request: web.Request) -> web.Response:
+        self.stats["list"] += 1
+        throttled = await self._before_response()
+        if throttled:
+            return throttled
+
+        if self.upstream:
+            data = await self._forward(request)
+            for item in data.get("list", []):
+                self.replays.setdefault(item["id"], {"id": item["id"], **item})
+            return web.json_response(data)
+
+        count = min(int(request.query.get("count", 150)), 200)
+        offset = int(request.query.get("after", 0))
+        items = self._filtered_summaries(request.query)
+        page = items[offset:offset + count]
+
+        body = {"count": len(items), "list": page}
+        if offset + count < len(items):
+            body["next"] = str(request.url.update_query({"after": offset + count}))
+        return web.json_response(body)
+
+    async def _handle_details(self, request: web.Request) -> web.Response:
+        self.stats["details"] += 1
+        throttled = await self._before_response()
+        if throttled:
+            return throttled
+
+        replay_id = request.match_info["replay_id"]
+        details = self.replays.get(replay_id)
+        if self.upstream and (details is None or "blue" not in details):
+            details = await self._forward(request)
+            self.replays[replay_id] = details
+            self.uploaded_at[replay_id] = 0
+        if details is None:
+            return web.json_response({"error": "replay not found"}, status=404)
+
+        if time.time() - self.uploaded_at.get(replay_id, 0) < self.processing_delay:
+            details = {"id": replay_id, "status": "pending", "created": details.get("created")}
+
+        body = json.dumps(details).encode()
+        etag = '"%s"' % hashlib.md5(body).hexdigest()
+        if request.headers.get("If-None-Match") == etag:
+            self.stats["not_modified"] += 1
+            return web.Response(status=304, headers={"ETag": etag})
+        return web.Response(body=body, content_type="application/json", headers={"ETag": etag})
+
+
+async def _serve(args):
+    fake = FakeBallchasing(
+        latency=args.latency,
+        latency_jitter=args.jitter,
+        rate_limit_per_second=args.rate_limit,
+        inject_429_probability=args.inject_429,
+        processing_delay=args.processing_delay,
+        upstream="https://ballchasing.com/api" if args.record else None,
+        api_key=os.getenv("BALLCHASING_API_KEY"),
+        seed=args.seed,
+    )
+    if args.cassette and Path(args.cassette).exists():
+        fake.load_cassette(args.cassette)
+    if args.synthetic:
+        fake.add_synthetic_history(args.synthetic)
+
+    base_url = await fake.start(port=args.port)
+    print(f"🏟️  Fake Ballchasing serving {len(fake.replays)} replays at {base_url}")
+    print(f"   export BALLCHASING_BASE_URL={base_url}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        if args.record:
+            fake.save_cassette(args.record)
+            print(f"💾 Recorded {len(fake.replays)} replays to {args.record}")
+        await fake.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local Ballchasing API stand-in")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--cassette", help="Cassette file to serve")
+    parser.add_argument("--synthetic", type=int, default=0, help="Generate this many synthetic replays")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Random extra latency (seconds)")
+    parser.add_argument("--rate-limit", type=float, help="Requests per second before answering 429")
+    parser.add_argument("--inject-429", type=float, default=0.0, help="Probability of a random 429")
+    parser.add_argument("--processing-delay", type=float, default=0.0,
+                        help="Seconds new uploads report status 'pending'")
+    parser.add_argument("--record", help="Forward to the real API and record into this cassette")
+    parser.add_argument("--seed", type=int)
+    try:
+        asyncio.run(_serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
@@ -31,20 +31,17 @@ if matches:
     print("="*60)
     for col in column_names:
         value = match[col]
-        # Truncate long values for readability
-        if col == 'stats_json':
-            print(f"{col:30} = (JSON blob - see below)")
-        elif isinstance(value, float):
+        if isinstance(value, float):
             print(f"{col:30} = {value:.2f}")
         else:
             print(f"{col:30} = {value}")
     
     print("\n" + "="*60)
-    print("STATS_JSON (Full Ballchasing Data):")
+    print("FULL STATS (Full Ballchasing Data):")
     print("="*60)
     
-    # Parse the JSON string
-    if match.get('stats_json'):
-        full_stats = json.loads(match['stats_json'])
+    # Raw stats are stored compressed and only decoded on request
+    full_stats = db.get_match_stats(match['replay_id'])
+    if full_stats:
         print(json.dumps(full_stats, indent=2))
     
\ No newline at end of file
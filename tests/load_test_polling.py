@@ -0,0 +1,137 @@
+"""
+Load test of the polling pipeline against the local Ballchasing stand-in.
+
+Uploads synthetic replays at a multiple of a real player's rate while
+main.check_and_analyze_new_matches polls, then reports ingestion lag and
+API usage. Analysis and Discord posting are replaced by no-op stand-ins.
+
+    python tests/load_test_polling.py --speedup 100 --duration 60
+"""
+
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import argparse
+import asyncio
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime
+
+import main
+from tests.fake_ballchasing import FakeBallchasing, summary_for
+from src.utils.ballchasing_client import AsyncBallchasingClient
+from src.utils.async_database import AsyncMatchDatabase
+from src.utils.database import MatchDatabase
+from src.utils.pending import PendingReplayTracker
+from src.utils.poller import ReplayPoller
+from src.utils.rate_limiter import RateLimiter
+from src.utils.scheduler import AdaptivePollScheduler
+
+REAL_SECONDS_PER_UPLOAD = 7 * 60  # One ranked match every ~7 minutes while playing
+
+
+class NullAnalyzer:
+    def analyze_match(self, current_stats, win_loss_data, match_info):
+        return ""
+
+    def format_discord_message(self, feedback, match_info, current_stats):
+        return ""
+
+
+class NullBot:
+    async def post_report(self, message):
+        pass
+
+
+async def run_load_test(args):
+    fake = FakeBallchasing(
+        latency=args.latency,
+        latency_jitter=args.latency,
+        rate_limit_per_second=args.server_rate_limit,
+        processing_delay=args.processing_delay,
+        seed=args.seed,
+    )
+    fake.add_synthetic_history(args.history)
+    base_url = await fake.start()
+
+    db = AsyncMatchDatabase(MatchDatabase(str(Path(tempfile.mkdtemp()) / "matches.db")))
+    client = AsyncBallchasingClient("load-test", base_url=base_url, rate_limiter=RateLimiter(tier=args.tier))
+    poller = ReplayPoller(client, db)
+    pending = PendingReplayTracker(db.sync, base_delay=1, max_delay=10)
+    scheduler = AdaptivePollScheduler(min_interval=args.min_interval, max_interval=args.max_interval)
+    main.MY_STEAM_ID = fake.steam_id
+    main.ROSTER = [fake.steam_id]
+
+    # Prime the watermark so the history isn't counted as new uploads
+    await poller.poll()
+    await poller.advance([summary_for(details) for details in fake.replays.values()])
+    fake.stats.update({key: 0 for key in fake.stats})
+
+    upload_interval = REAL_SECONDS_PER_UPLOAD / args.speedup
+    uploaded = []
+    rng = random.Random(args.seed)
+    deadline = time.monotonic() + args.duration
+
+    async def uploader():
+        while time.monotonic() < deadline:
+            await asyncio.sleep(rng.expovariate(1 / upload_interval))
+            uploaded.append(fake.add_replay())
+
+    async def polling_loop():
+        while time.monotonic() < deadline + args.drain:
+            new_matches = await main.check_and_analyze_new_matches(
+                client, db, NullAnalyzer(), NullBot(), poller, pending)
+            scheduler.record_poll(new_matches)
+            await scheduler.wait()
+
+    print(f"🏋️  Uploading one replay every {upload_interval:.2f}s on average for {args.duration}s "
+          f"({args.speedup}x real rate)\n")
+    start = time.monotonic()
+    await asyncio.gather(uploader(), polling_loop())
+    elapsed = time.monotonic() - start
+
+    lags = []
+    for replay_id in uploaded:
+        match = await db.get_match_by_id(replay_id)
+        if match:
+            saved_at = datetime.fromisoformat(match['analyzed_at']).timestamp()
+            lags.append(saved_at - fake.uploaded_at[replay_id])
+
+    await client.close()
+    await fake.stop()
+    await db.close()
+
+    print("\n" + "=" * 60)
+    print("LOAD TEST RESULTS")
+    print("=" * 60)
+    print(f"Uploads:           {len(uploaded)}")
+    print(f"Ingested:          {len(lags)}")
+    if lags:
+        lags.sort()
+        print(f"Lag p50 / p95 / max: {statistics.median(lags):.2f}s / "
+              f"{lags[int(0.95 * (len(lags) - 1))]:.2f}s / {lags[-1]:.2f}s")
+    print(f"List calls:        {fake.stats['list']} ({60 * fake.stats['list'] / elapsed:.1f}/min)")
+    print(f"Detail calls:      {fake.stats['details']}")
+    print(f"304 revalidations: {fake.stats['not_modified']}")
+    print(f"429 responses:     {fake.stats['rate_limited']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the polling pipeline")
+    parser.add_argument("--speedup", type=float, default=100, help="Multiple of a real player's upload rate")
+    parser.add_argument("--duration", type=float, default=60, help="Seconds to keep uploading")
+    parser.add_argument("--drain", type=float, default=15, help="Seconds to keep polling after the last upload")
+    parser.add_argument("--history", type=int, default=200, help="Replays already on the server")
+    parser.add_argument("--latency", type=float, default=0.05, help="Server latency in seconds")
+    parser.add_argument("--server-rate-limit", type=float, help="Server-side requests/second before 429")
+    parser.add_argument("--processing-delay", type=float, default=3, help="Seconds new replays stay 'pending'")
+    parser.add_argument("--tier", default="regular", help="Client rate-limit tier")
+    parser.add_argument("--min-interval", type=float, default=1)
+    parser.add_argument("--max-interval", type=float, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    asyncio.run(run_load_test(parser.parse_args()))
@@ -38,9 +38,7 @@ if confirm.lower() != 'yes':
     exit()
 
 # Delete the match
-cursor = db.conn.cursor()
-cursor.execute("DELETE FROM matches WHERE replay_id = ?", (replay_id,))
-db.conn.commit()
+db.delete_match(replay_id)
 
 print(f"\n✅ Deleted match {replay_id}")
 print("\nYou can now run main.py and it will re-detect and analyze this match!")
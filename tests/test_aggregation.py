@@ -0,0 +1,103 @@
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import math
+import statistics
+
+import pytest
+
+from tests.test_match_database import STEAM_ID, make_records, save_at
+from src.utils.database import MatchDatabase
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = MatchDatabase(str(tmp_path / "matches.db"), player_id=STEAM_ID)
+    database.save_matches(make_records(120))
+    yield database
+    database.close()
+
+
+def nearest_rank(values, percent):
+    ordered = sorted(values)
+    return ordered[max(1, math.ceil(len(ordered) * percent / 100)) - 1]
+
+
+def test_aggregates_match_python_statistics(db):
+    matches = db.get_recent_matches(120)
+    [group] = db.aggregate(['goals', 'avg_speed'], ['avg', 'min', 'max', 'sum', 'median', 'stddev', 'p10', 'p90'])
+
+    assert group['count'] == 120
+    for column in ('goals', 'avg_speed'):
+        values = [match[column] for match in matches]
+        assert group[f'avg_{column}'] == pytest.approx(statistics.mean(values))
+        assert group[f'min_{column}'] == min(values)
+        assert group[f'max_{column}'] == max(values)
+        assert group[f'sum_{column}'] == sum(values)
+        assert group[f'median_{column}'] == pytest.approx(statistics.median(values))
+        assert group[f'stddev_{column}'] == pytest.approx(statistics.stdev(values))
+        assert group[f'p10_{column}'] == nearest_rank(values, 10)
+        assert group[f'p90_{column}'] == nearest_rank(values, 90)
+
+
+def test_last_n_applies_per_group(db):
+    matches = db.get_recent_matches(120)
+    groups = db.aggregate(['score'], ['avg', 'median'], group_by=['playlist', 'result'], last_n_matches=7)
+
+    assert len(groups) == len({(m['playlist'], m['result']) for m in matches})
+    assert [(g['playlist'], g['result']) for g in groups] == sorted((g['playlist'], g['result']) for g in groups)
+    for group in groups:
+        # get_recent_matches is newest first
+        values = [m['score'] for m in matches
+                  if (m['playlist'], m['result']) == (group['playlist'], group['result'])][:7]
+        assert group['count'] == len(values)
+        assert group['avg_score'] == pytest.approx(statistics.mean(values))
+        assert group['median_score'] == pytest.approx(statistics.median(values))
+
+
+def test_win_loss_averages_agree_with_grouped_aggregation(db):
+    served = db.get_win_loss_averages(15, playlist="Ranked Doubles", stats=['amount_stolen'])
+    for group in db.aggregate(['goals', 'amount_stolen'], group_by=['result'], last_n_matches=15,
+                              playlist="Ranked Doubles"):
+        averages = served['wins' if group['result'] == 'win' else 'losses']
+        assert averages['count'] == group['count']
+        assert averages['avg_goals'] == pytest.approx(group['avg_goals'])
+        assert averages['avg_amount_stolen'] == pytest.approx(group['avg_amount_stolen'])
+
+
+def test_sessions_split_on_gaps(tmp_path):
+    database = MatchDatabase(str(tmp_path / "sessions.db"), player_id=STEAM_ID)
+    try:
+        for i, minute in enumerate([0, 10, 25, 200, 215, 600]):
+            save_at(database, f"match-{i}", f"2024-10-01T{minute // 60:02d}:{minute % 60:02d}:00Z")
+        groups = database.aggregate(['goals'], group_by=['session'])
+        assert [g['count'] for g in groups] == [3, 2, 1]
+        assert groups[1]['session'] == database.get_match_by_id("match-3")['date_epoch']
+
+        # Filters pick matches after sessions are formed, so a session survives losing its first match
+        first = database.get_match_by_id("match-0")['result']
+        other = 'loss' if first == 'win' else 'win'
+        sessions = {g['session'] for g in database.aggregate(['goals'], group_by=['session'], result=other)}
+        assert sessions <= {g['session'] for g in groups}
+    finally:
+        database.close()
+
+
+def test_week_groups_and_unregistered_nulls(db):
+    name = db.register_stat_path("demo.inflicted")  # Not backfilled: NULL for every match
+    groups = db.aggregate([name, 'goals'], ['avg', 'median'], group_by=['week'])
+    assert sum(g['count'] for g in groups) == 120
+    assert all(g['week'].startswith("2024-W") for g in groups)
+    assert all(g[f'median_{name}'] is None and g['median_goals'] is not None for g in groups)
+
+
+def test_rejects_unknown_names(db):
+    with pytest.raises(ValueError):
+        db.aggregate(['goals'], ['mode'])
+    with pytest.raises(ValueError):
+        db.aggregate(['goals'], group_by=['weather'])
+    with pytest.raises(ValueError):
+        db.aggregate(['goals; DROP TABLE matches'])
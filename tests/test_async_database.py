@@ -0,0 +1,142 @@
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import asyncio
+import json
+import threading
+import time
+
+from main import save_roster_rows
+from tests.test_match_database import make_records
+from src.utils.async_database import AsyncMatchDatabase, create_async_database
+from src.utils.database import PlayerShards
+from src.utils.pending import PendingReplayTracker
+from src.utils.poller import ReplayPoller
+
+
+def test_async_database_matches_sync_results(tmp_path):
+    records = make_records(40)
+
+    async def run():
+        db = create_async_database(str(tmp_path / "matches.db"))
+        try:
+            assert await db.save_matches(records[:30]) == {'inserted': 30, 'replaced': 0}
+            for record in records[30:]:
+                await db.save_match(*record, commit=False)
+            await db.commit()
+
+            assert await db.match_exists("replay-00035")
+            assert await db.existing_replay_ids(["replay-00001", "missing"]) == {"replay-00001"}
+            assert await db.get_recent_matches(5) == db.sync.get_recent_matches(5)
+            assert await db.get_win_loss_averages(20) == db.sync.get_win_loss_averages(20)
+            page = await db.query_matches(result="win", limit=3)
+            assert page == db.sync.query_matches(result="win", limit=3)
+        finally:
+            await db.close()
+
+    asyncio.run(run())
+
+
+def test_event_loop_keeps_running_during_queries(tmp_path):
+    async def run():
+        db = create_async_database(str(tmp_path / "matches.db"))
+        await db.save_matches(make_records(2000))
+
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0)
+
+        task = asyncio.create_task(ticker())
+        await asyncio.gather(*(db.get_averages(2000) for _ in range(20)))
+        task.cancel()
+        await db.close()
+        return ticks
+
+    ticks = asyncio.run(run())
+    # The loop kept scheduling other coroutines while SQLite worked
+    assert ticks > 20
+
+
+class ListingClient:
+    """Just enough of AsyncBallchasingClient for the poller: two uploads, then nothing new."""
+
+    async def get_replays(self, **filters):
+        return [{'id': "replay-b", 'created': "2024-10-01T12:05:00Z"},
+                {'id': "replay-a", 'created': "2024-10-01T12:00:00Z"}]
+
+    async def iter_replay_pages(self, filters):
+        yield [], None
+
+
+def test_poller_and_pending_queue_stay_off_the_event_loop(tmp_path):
+    async def run():
+        db = create_async_database(str(tmp_path / "matches.db"))
+        pending = PendingReplayTracker(db.sync, base_delay=0)
+        threads = []
+        for name in ("get_sync_state", "set_sync_state", "existing_replay_ids", "upsert_pending_replay"):
+            method = getattr(db.sync, name)
+
+            def recording(*args, _method=method, **kwargs):
+                threads.append(threading.current_thread().name)
+                return _method(*args, **kwargs)
+            setattr(db.sync, name, recording)
+        try:
+            poller = ReplayPoller(ListingClient(), db)
+            assert [replay['id'] for replay in await poller.poll()] == ["replay-a", "replay-b"]
+            await poller.advance()
+            watermark = json.loads(await db.get_sync_state(ReplayPoller.STATE_KEY))
+            assert watermark == {'created': "2024-10-01T12:05:00Z", 'replay_ids': ["replay-b"]}
+            assert await poller.poll() == []
+
+            assert await db.run(pending.defer, "replay-c", "pending") is False
+            assert (await db.get_pending_replay("replay-c"))['attempts'] == 1
+            assert await db.get_due_pending_replays(time.time() + 1) == ["replay-c"]
+            await db.delete_pending_replay("replay-c")
+            assert await db.get_pending_replay("replay-c") is None
+        finally:
+            await db.close()
+        return threads
+
+    threads = asyncio.run(run())
+    assert len(threads) >= 6
+    assert all(name.startswith("match-db-writer") for name in threads)
+
+
+def test_poller_skips_replays_processed_into_shards_before_a_crash(tmp_path):
+    (_, details, player), = make_records(1)
+    listed = {'id': details['id'], 'created': details['created']}
+
+    class OneUpload:
+        async def get_replays(self, **filters):
+            return [listed]
+
+    async def run():
+        db = create_async_database(str(tmp_path / "matches.db"))
+        shards = PlayerShards(str(tmp_path / "players"))
+        shard = AsyncMatchDatabase(shards.for_player(player['id']['id']))
+        pending = PendingReplayTracker(db.sync)
+        try:
+            # Crashed after the shard save: the replay comes back, and saving it again is harmless
+            poller = ReplayPoller(OneUpload(), db)
+            assert await poller.poll() == [listed]
+            await shard.save_match(details['id'], details, player)
+            assert await ReplayPoller(OneUpload(), db).poll() == [listed]
+
+            # Crashed after the shared writer call, before advance(): not reported twice
+            await shard.save_match(details['id'], details, player)
+            await db.run(save_roster_rows, db.sync, pending, details['id'], details, [])
+            assert await db.existing_replay_ids([details['id']]) == set()
+            assert await ReplayPoller(OneUpload(), db).poll() == []
+        finally:
+            await shard.close()
+            shards.close()
+            await db.close()
+
+    asyncio.run(run())
@@ -0,0 +1,226 @@
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import json
+import time
+from datetime import datetime
+
+import pytest
+
+from tests.fake_ballchasing import FakeBallchasing
+from tests.test_ballchasing_client import run_against_fake
+from tests.test_match_database import STEAM_ID
+from src.utils.backfill import BackfillEngine
+from src.utils.database import MatchDatabase
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = MatchDatabase(str(tmp_path / "matches.db"), player_id=STEAM_ID)
+    yield database
+    database.close()
+
+
+def history(count, seed=1, **kwargs):
+    fake = FakeBallchasing(seed=seed, steam_id=STEAM_ID, **kwargs)
+    fake.add_synthetic_history(count)
+    return fake
+
+
+def saved_ids(db):
+    return {row[0] for row in db.conn.execute("SELECT replay_id FROM matches")}
+
+
+def interrupt_fetch(client, on_call):
+    """Make the `on_call`th details fetch fail, as if the connection dropped."""
+    fetch = client.get_many_replay_details
+    calls = []
+
+    async def flaky(replay_ids):
+        calls.append(replay_ids)
+        if len(calls) == on_call:
+            raise ConnectionError("connection reset")
+        return await fetch(replay_ids)
+    client.get_many_replay_details = flaky
+
+
+def test_max_pages_keeps_a_checkpoint_the_next_run_resumes(db):
+    fake = history(45)
+
+    async def scenario(client):
+        first = await BackfillEngine(client, db, STEAM_ID, page_size=20).run(max_pages=1)
+        listed_before_resume = fake.stats["list"]
+        second = await BackfillEngine(client, db, STEAM_ID, page_size=20).run()
+        return first, listed_before_resume, second
+
+    first, listed_before_resume, second = run_against_fake(fake, scenario)
+    assert (first["pages"], first["saved"], first["done"]) == (1, 20, False)
+    assert first["next_url"]
+    # The second run starts at page 2 rather than listing page 1 again
+    assert fake.stats["list"] - listed_before_resume == 2
+    assert (second["pages"], second["saved"], second["done"]) == (3, 45, True)
+    assert saved_ids(db) == set(fake.replays)
+
+
+def test_interrupted_run_resumes_after_its_last_completed_page(db):
+    fake = history(45)
+
+    async def scenario(client):
+        interrupt_fetch(client, on_call=2)
+        with pytest.raises(ConnectionError):
+            await BackfillEngine(client, db, STEAM_ID, page_size=20).run()
+        checkpoint = json.loads(db.get_sync_state(BackfillEngine.checkpoint_key({}, STEAM_ID)))
+        saved_then = len(saved_ids(db))
+        del client.get_many_replay_details
+        resumed = await BackfillEngine(client, db, STEAM_ID, page_size=20).run()
+        return checkpoint, saved_then, resumed
+
+    checkpoint, saved_then, resumed = run_against_fake(fake, scenario)
+    assert (checkpoint["pages"], checkpoint["saved"]) == (1, 20)
+    assert saved_then == 20
+    assert (resumed["pages"], resumed["saved"], resumed["done"]) == (3, 45, True)
+    assert saved_ids(db) == set(fake.replays)
+
+
+def test_completed_backfill_is_not_listed_again(db):
+    fake = history(30)
+
+    async def scenario(client):
+        await BackfillEngine(client, db, STEAM_ID, page_size=20).run()
+        listed, fetched = fake.stats["list"], fake.stats["details"]
+        rerun = await BackfillEngine(client, db, STEAM_ID, page_size=20).run()
+        return rerun, fake.stats["list"] - listed, fake.stats["details"] - fetched
+
+    rerun, listed, fetched = run_against_fake(fake, scenario)
+    assert rerun["done"] and rerun["saved"] == 30
+    assert (listed, fetched) == (0, 0)
+
+
+def test_restart_ignores_the_checkpoint_and_skips_saved_matches(db):
+    fake = history(30)
+
+    async def scenario(client):
+        await BackfillEngine(client, db, STEAM_ID, page_size=20).run()
+        fetched = fake.stats["details"]
+        rerun = await BackfillEngine(client, db, STEAM_ID, page_size=20).run(restart=True)
+        return rerun, fake.stats["details"] - fetched
+
+    rerun, fetched = run_against_fake(fake, scenario)
+    assert (rerun["pages"], rerun["listed"], rerun["saved"], rerun["skipped"]) == (2, 30, 0, 30)
+    assert fetched == 0
+
+
+def test_each_filter_set_is_its_own_job(db):
+    fake = history(40)
+    doubles = {replay_id for replay_id, details in fake.replays.items()
+               if details["playlist_id"] == "ranked-doubles"}
+
+    async def scenario(client):
+        engine = BackfillEngine(client, db, STEAM_ID, page_size=20)
+        filtered = await engine.run(playlist="ranked-doubles")
+        everything = await engine.run()
+        return filtered, everything
+
+    filtered, everything = run_against_fake(fake, scenario)
+    assert filtered["done"] and filtered["listed"] == filtered["saved"] == len(doubles)
+    # The unfiltered job didn't inherit the filtered job's completed checkpoint
+    assert everything["done"] and everything["listed"] == 40
+    assert everything["saved"] == 40 - len(doubles)
+    assert saved_ids(db) == set(fake.replays)
+    assert db.get_sync_state(BackfillEngine.checkpoint_key({"playlist": "ranked-doubles"}, STEAM_ID))
+
+
+def test_checkpoints_are_kept_per_stored_player(db):
+    assert BackfillEngine.checkpoint_key({}, STEAM_ID) != BackfillEngine.checkpoint_key({}, "76561198000000001")
+    with pytest.raises(ValueError):
+        BackfillEngine(None, db, None)
+
+
+def test_legacy_checkpoint_is_only_resumed_when_asked(db):
+    fake = history(45)
+
+    async def scenario(client):
+        await BackfillEngine(client, db, STEAM_ID, page_size=20).run(max_pages=1)
+        # As saved before checkpoint keys named the player
+        key = BackfillEngine.checkpoint_key({}, STEAM_ID)
+        db.set_sync_state(BackfillEngine.legacy_checkpoint_key({}), db.get_sync_state(key))
+        db.set_sync_state(key, None)
+
+        ignored = await BackfillEngine(client, db, STEAM_ID, page_size=20).run(max_pages=1)
+        db.set_sync_state(key, None)
+        resumed = await BackfillEngine(client, db, STEAM_ID, page_size=20, resume_legacy=True).run()
+        return ignored, resumed
+
+    ignored, resumed = run_against_fake(fake, scenario)
+    assert ignored["pages"] == 1 and ignored["saved"] == 0
+    assert (resumed["pages"], resumed["done"]) == (3, True)
+    assert db.get_sync_state(BackfillEngine.legacy_checkpoint_key({})) is None
+
+
+def test_replays_still_processing_are_deferred_to_the_pending_queue(db):
+    fake = history(10, processing_delay=60)
+    fresh = [fake.add_replay() for _ in range(3)]
+
+    async def scenario(client):
+        return await BackfillEngine(client, db, STEAM_ID).run()
+
+    state = run_against_fake(fake, scenario)
+    assert state["done"] and state["saved"] == 10
+    assert saved_ids(db) == set(fake.replays) - set(fresh)
+    for replay_id in fresh:
+        assert db.get_pending_replay(replay_id)["last_status"] == "pending"
+
+
+def test_a_page_and_its_checkpoint_are_saved_together(db, monkeypatch):
+    fake = history(45, processing_delay=60)
+    listing = sorted(fake.replays, key=lambda replay_id: datetime.fromisoformat(fake.replays[replay_id]["date"]),
+                     reverse=True)
+    for replay_id in listing[1::20]:
+        fake.uploaded_at[replay_id] = time.time()  # One replay still processing on every page
+    set_sync_state = db.set_sync_state
+    checkpoints = []
+
+    def failing_second_checkpoint(key, value, commit=True):
+        checkpoints.append(value)
+        if len(checkpoints) == 2:
+            raise OSError("disk full")
+        set_sync_state(key, value, commit=commit)
+    monkeypatch.setattr(db, "set_sync_state", failing_second_checkpoint)
+
+    async def scenario(client):
+        with pytest.raises(OSError):
+            await BackfillEngine(client, db, STEAM_ID, page_size=20).run()
+
+    run_against_fake(fake, scenario)
+    monkeypatch.undo()
+    db.commit()  # Nothing of the failed page may be left waiting for a later commit
+    checkpoint = json.loads(db.get_sync_state(BackfillEngine.checkpoint_key({}, STEAM_ID)))
+    assert checkpoint["pages"] == 1
+    assert len(saved_ids(db)) == checkpoint["saved"]
+    pending = [row[0] for row in db.conn.execute("SELECT replay_id FROM pending_replays")]
+    assert pending == [listing[1]]
+
+
+def test_rolling_aggregates_match_an_uninterrupted_backfill(db, tmp_path):
+    fake = history(36, seed=5)
+    uninterrupted = MatchDatabase(str(tmp_path / "uninterrupted.db"), player_id=STEAM_ID)
+
+    async def scenario(client):
+        await BackfillEngine(client, uninterrupted, STEAM_ID, page_size=8).run()
+        await BackfillEngine(client, db, STEAM_ID, page_size=8).run(max_pages=2)
+        interrupt_fetch(client, on_call=2)
+        with pytest.raises(ConnectionError):
+            await BackfillEngine(client, db, STEAM_ID, page_size=8).run()
+        del client.get_many_replay_details
+        await BackfillEngine(client, db, STEAM_ID, page_size=8).run()
+
+    try:
+        run_against_fake(fake, scenario)
+        assert db.check_rolling_aggregates() == []
+        query = "SELECT * FROM rolling_aggregates ORDER BY result, playlist, window_size"
+        assert db.conn.execute(query).fetchall() == uninterrupted.conn.execute(query).fetchall()
+    finally:
+        uninterrupted.close()
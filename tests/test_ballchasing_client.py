@@ -0,0 +1,82 @@
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import asyncio
+from tests.fake_ballchasing import FakeBallchasing
+from src.utils.ballchasing_client import AsyncBallchasingClient, find_replay_player
+from src.utils.rate_limiter import RateLimiter
+from src.utils.replay_cache import ReplayCache
+
+
+def run_against_fake(fake, scenario, **client_kwargs):
+    """Start the fake API, run `scenario(client)` and shut everything down."""
+    async def run():
+        base_url = await fake.start()
+        client = AsyncBallchasingClient("test-key", base_url=base_url,
+                                        rate_limiter=RateLimiter(tier="gc"), **client_kwargs)
+        try:
+            return await scenario(client)
+        finally:
+            await client.close()
+            await fake.stop()
+
+    return asyncio.run(run())
+
+
+def test_pagination_walks_every_page():
+    fake = FakeBallchasing(seed=1)
+    fake.add_synthetic_history(45)
+
+    async def scenario(client):
+        pages = [page async for page, _ in client.iter_replay_pages({"sort-by": "upload-date"}, count=20)]
+        return [len(page) for page in pages]
+
+    assert run_against_fake(fake, scenario) == [20, 20, 5]
+
+
+def test_concurrent_details_survive_429s():
+    fake = FakeBallchasing(seed=2, inject_429_probability=0.3, retry_after=0)
+    fake.add_synthetic_history(10)
+    replay_ids = list(fake.replays)
+
+    async def scenario(client):
+        client.rate_limiter.backoff_cap = 0.05
+        return await client.get_many_replay_details(replay_ids)
+
+    details = run_against_fake(fake, scenario)
+    assert set(details) == set(replay_ids)
+    assert fake.stats["rate_limited"] > 0
+    assert all(find_replay_player(d, fake.steam_id) for d in details.values())
+
+
+def test_cache_revalidates_pending_replays(tmp_path):
+    fake = FakeBallchasing(seed=3, processing_delay=60)
+    replay_id = fake.add_replay()
+
+    async def scenario(client):
+        first = await client.get_replay_details(replay_id)
+        second = await client.get_replay_details(replay_id)
+        fake.processing_delay = 0
+        third = await client.get_replay_details(replay_id)
+        fourth = await client.get_replay_details(replay_id)
+        return first, second, third, fourth
+
+    first, second, third, fourth = run_against_fake(fake, scenario, cache=ReplayCache(str(tmp_path)))
+    assert first["status"] == second["status"] == "pending"
+    assert third["status"] == fourth["status"] == "ok"
+    assert fake.stats["not_modified"] == 1
+    assert fake.stats["details"] == 3  # the final read came from disk
+
+
+def test_cassette_roundtrip(tmp_path):
+    fake = FakeBallchasing(seed=4)
+    fake.add_synthetic_history(3)
+    cassette = str(tmp_path / "replays.json.gz")
+    fake.save_cassette(cassette)
+
+    replayed = FakeBallchasing()
+    replayed.load_cassette(cassette)
+    assert replayed.replays == fake.replays
@@ -0,0 +1,158 @@
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from tests.test_match_database import STEAM_ID, make_records, save_at
+from src.utils.database import MatchDatabase
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = MatchDatabase(str(tmp_path / "matches.db"), player_id=STEAM_ID, columnar=True)
+    database.save_matches(make_records(150))
+    yield database
+    database.close()
+
+
+def assert_same_averages(db, **filters):
+    columnar = db.columnar_stats()
+    [expected] = db.aggregate(['goals', 'avg_boost', 'time_behind_ball'], **filters)
+    served = columnar.averages(['goals', 'avg_boost', 'time_behind_ball'], **filters)
+    assert served == pytest.approx(expected)
+
+
+def test_averages_match_sql(db):
+    assert_same_averages(db)
+    assert_same_averages(db, last_n_matches=25)
+    assert_same_averages(db, last_n_matches=15, result='loss', playlist="Ranked Doubles")
+
+
+def test_database_serves_averages_from_columns(db, tmp_path):
+    plain = MatchDatabase(db.db_path, player_id=STEAM_ID)
+    try:
+        assert db.get_averages(30) == pytest.approx(plain.get_averages(30))
+        served = db.get_win_loss_averages(15, playlist="Ranked Standard", stats=['amount_stolen'])
+        expected = plain.get_win_loss_averages(15, playlist="Ranked Standard", stats=['amount_stolen'])
+        assert served['wins'] == pytest.approx(expected['wins'])
+        assert served['losses'] == pytest.approx(expected['losses'])
+    finally:
+        plain.close()
+
+
+def test_new_matches_are_appended_without_reloading(db):
+    columnar = db.columnar_stats()
+    columnar.refresh()
+    assert len(columnar) == 150
+    rewrites = columnar._rewrites
+
+    save_at(db, "newest", "2030-01-01T00:00:00Z")
+    save_at(db, "out-of-order", "2000-01-01T00:00:00Z")
+    columnar.refresh()
+    assert len(columnar) == 152 and columnar._rewrites == rewrites
+    assert_same_averages(db, last_n_matches=10)
+    assert_same_averages(db, last_n_matches=152)
+
+
+def test_rewrites_from_any_connection_reload(db):
+    columnar = db.columnar_stats()
+    other = MatchDatabase(db.db_path, player_id=STEAM_ID)
+    try:
+        # A replacement keeps the row count, so only the trigger can tell
+        replay_id, details, player = make_records(1)[0]
+        other.save_match(replay_id, {**details, 'date': "2031-01-01T00:00:00Z"}, player)
+        assert_same_averages(db, last_n_matches=5)
+        other.delete_match("replay-00002")
+        assert_same_averages(db, last_n_matches=5)
+        assert len(columnar) == 149
+    finally:
+        other.close()
+
+
+def test_reads_answer_from_last_refresh_while_another_runs(db):
+    columnar = db.columnar_stats()
+    columnar.refresh()
+    save_at(db, "newest", "2030-01-01T00:00:00Z")
+
+    with ThreadPoolExecutor(max_workers=1) as pool, columnar._lock:  # Another thread mid-refresh
+        read = pool.submit(columnar.averages, ['goals'])
+        assert read.result(timeout=5)['count'] == 150
+    assert columnar.averages(['goals'])['count'] == 151
+
+
+def held_refresh(columnar, monkeypatch):
+    """Make the next refresh stop in its SQLite fetch until the returned event is set."""
+    fetching, release = threading.Event(), threading.Event()
+    fetch = columnar._fetch
+
+    def slow_fetch(conn, after_rowid):
+        fetching.set()
+        release.wait(5)
+        return fetch(conn, after_rowid)
+    monkeypatch.setattr(columnar, '_fetch', slow_fetch)
+    return fetching, release
+
+
+def test_database_reads_do_not_wait_on_a_running_refresh(db, monkeypatch):
+    assert db.get_averages(200)['match_count'] == 150
+    save_at(db, "newest", "2030-01-01T00:00:00Z")
+    fetching, release = held_refresh(db.columnar_stats(), monkeypatch)
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        refreshing = pool.submit(db.columnar_stats().refresh)
+        assert fetching.wait(5)
+        try:
+            assert pool.submit(db.get_averages, 200).result(timeout=2)['match_count'] == 150
+        finally:
+            release.set()
+        refreshing.result(timeout=5)
+    assert db.get_averages(200)['match_count'] == 151
+
+
+def test_database_reads_wait_for_the_first_load(db, monkeypatch):
+    fetching, release = held_refresh(db.columnar_stats(), monkeypatch)
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        loading = pool.submit(db.columnar_stats().refresh)
+        assert fetching.wait(5)
+        read = pool.submit(db.get_averages, 200)
+        time.sleep(0.2)
+        assert not read.done()  # Nothing published yet to answer from
+        release.set()
+        assert read.result(timeout=5)['match_count'] == 150
+        loading.result(timeout=5)
+
+
+def test_vectorized_analytics(db):
+    columnar = db.columnar_stats()
+    matches = db.get_recent_matches(150)
+    goals = [m['goals'] for m in matches]
+    won = [1.0 if m['result'] == 'win' else 0.0 for m in matches]
+
+    assert columnar.win_correlations(['goals'])['goals'] == pytest.approx(statistics.correlation(goals, won))
+
+    wins = [m['goals'] for m in matches if m['result'] == 'win'][:20]
+    losses = [m['goals'] for m in matches if m['result'] == 'loss'][:20]
+    assert columnar.win_loss_deltas(['goals'])['goals'] == pytest.approx(statistics.mean(wins) - statistics.mean(losses))
+
+    [group] = db.aggregate(['score'], ['p10', 'p90'], last_n_matches=60)
+    assert columnar.percentiles(['score'], (10, 90), last_n_matches=60)['score'] == {
+        'p10': group['p10_score'], 'p90': group['p90_score']}
+
+
+def test_disabled_without_flag(tmp_path):
+    database = MatchDatabase(str(tmp_path / "plain.db"))
+    try:
+        assert database.columnar_stats() is None
+    finally:
+        database.close()
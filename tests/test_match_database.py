@@ -0,0 +1,618 @@
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import random
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from tests.fake_ballchasing import synthetic_player, synthetic_replay
+from src.utils.ballchasing_client import find_replay_player
+from src.utils import database
+from src.utils.database import ROLLING_SUM_COLUMNS, ROLLING_WINDOWS, WIN_LOSS_AVERAGES, MatchDatabase
+
+STEAM_ID = "76561198000000000"
+
+
+def make_records(count, seed=0):
+    """(replay_id, details, player) tuples for synthetic matches, newest first."""
+    rng = random.Random(seed)
+    now = datetime(2024, 10, 1, tzinfo=timezone.utc)
+    records = []
+    for i in range(count):
+        details = synthetic_replay(f"replay-{i:05d}", STEAM_ID, now - timedelta(hours=i), rng)
+        records.append((details["id"], details, find_replay_player(details, STEAM_ID)))
+    return records
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = MatchDatabase(str(tmp_path / "matches.db"), player_id=STEAM_ID)
+    yield database
+    database.close()
+
+
+def test_save_matches_counts_inserts_and_replacements(db):
+    records = make_records(50)
+    assert db.save_matches(iter(records), chunk_size=7) == {'inserted': 50, 'replaced': 0}
+    assert db.save_matches(records[:5] + records[:2] + make_records(53)[50:]) == {'inserted': 3, 'replaced': 7}
+    assert len(db.existing_replay_ids(r[0] for r in make_records(60))) == 53
+
+
+def test_save_matches_matches_save_match(db, tmp_path):
+    records = make_records(5)
+    db.save_matches(records)
+
+    other = MatchDatabase(str(tmp_path / "single.db"))
+    for record in records:
+        other.save_match(*record)
+
+    ignore = {'analyzed_at'}
+    for replay_id, _, _ in records:
+        bulk = {k: v for k, v in db.get_match_by_id(replay_id).items() if k not in ignore}
+        single = {k: v for k, v in other.get_match_by_id(replay_id).items() if k not in ignore}
+        assert bulk == single
+    other.close()
+
+
+def test_save_matches_rolls_back_on_error(db):
+    records = make_records(3) + [("broken", None, {})]
+    with pytest.raises(AttributeError):
+        db.save_matches(records)
+    assert db.existing_replay_ids(r[0] for r in records) == set()
+
+
+def test_query_matches_covers_full_history(db):
+    records = make_records(300)
+    db.save_matches(records)
+
+    # The best game is deliberately older than the newest 100
+    best = db.query_matches(sort_by='goals', limit=1)['matches'][0]
+    everything = [db.get_match_by_id(r[0]) for r in records]
+    assert best['goals'] == max(m['goals'] for m in everything)
+
+    page = db.query_matches(result='win', ranges={'saves': (1, 2), 'avg_boost': (30, None)}, limit=200)
+    expected = [m for m in everything
+                if m['result'] == 'win' and 1 <= m['saves'] <= 2 and m['avg_boost'] >= 30]
+    assert {m['replay_id'] for m in page['matches']} == {m['replay_id'] for m in expected}
+    assert all('stats_json' not in m for m in page['matches'])
+
+
+def test_query_matches_keyset_pages_are_disjoint_and_ordered(db):
+    db.save_matches(make_records(95))
+    seen, cursor, values = [], None, []
+    while True:
+        page = db.query_matches(sort_by='score', sort_dir='asc', limit=20, cursor=cursor)
+        seen.extend(m['replay_id'] for m in page['matches'])
+        values.extend(m['score'] for m in page['matches'])
+        cursor = page['next_cursor']
+        if not cursor:
+            break
+    assert len(seen) == len(set(seen)) == 95
+    assert values == sorted(values)
+
+
+def test_query_matches_rejects_unknown_columns(db):
+    with pytest.raises(ValueError):
+        db.query_matches(sort_by='goals; DROP TABLE matches')
+    with pytest.raises(ValueError):
+        db.query_matches(ranges={'stats_json': (0, None)})
+
+
+def test_database_runs_in_wal_mode(db):
+    assert db.conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    with db.read_pool.connection() as reader:
+        with pytest.raises(sqlite3.OperationalError):
+            reader.execute("DELETE FROM matches")
+
+
+def test_reads_do_not_wait_on_open_write_transaction(db):
+    records = make_records(20)
+    db.save_matches(records[:10])
+    db.save_matches(records[10:], commit=False)  # Ingestion mid-transaction
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda _: len(db.get_recent_matches(50)), range(32)))
+    assert results == [10] * 32  # Last committed snapshot, without blocking
+    assert time.monotonic() - started < 2
+
+    db.commit()
+    assert len(db.get_recent_matches(50)) == 20
+
+
+def test_transaction_keeps_other_commits_out_until_it_ends(db):
+    records = make_records(3)
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        with db.transaction():
+            db.save_match(*records[0], commit=False)
+            # e.g. a migration backfill committing its next chunk
+            other = pool.submit(db.set_sync_state, "backfill:test", "chunk")
+            time.sleep(0.2)
+            assert not other.done()
+            assert db.get_match_by_id(records[0][0]) is None
+            db.save_match(*records[1], commit=False)
+        other.result(timeout=5)
+    assert len(db.get_recent_matches(10)) == 2
+
+    with pytest.raises(RuntimeError):
+        with db.transaction():
+            db.save_match(*records[2], commit=False)
+            raise RuntimeError("fetch failed")
+    assert db.get_match_by_id(records[2][0]) is None
+    assert db.check_rolling_aggregates() == []
+
+
+def expected_win_loss(db, records, window, playlist=None):
+    """Win/loss averages recomputed in Python from the stored rows."""
+    rows = [db.get_match_by_id(r[0]) for r in records]
+    averages = {}
+    for result in ('win', 'loss'):
+        recent = sorted((m for m in rows if m['result'] == result
+                         and (playlist is None or m['playlist'] == playlist)),
+                        key=lambda m: (m['date_epoch'], m['replay_id']), reverse=True)[:window]
+        averages[result] = {
+            'count': len(recent),
+            'avg_goals': sum(m['goals'] for m in recent) / len(recent) if recent else None,
+            'avg_boost': sum(m['avg_boost'] for m in recent) / len(recent) if recent else None,
+        }
+    return averages
+
+
+def test_rolling_aggregates_follow_out_of_order_saves(db):
+    records = make_records(120, seed=3)
+    shuffled = records[:]
+    random.Random(1).shuffle(shuffled)
+    for record in shuffled:
+        db.save_match(*record)
+    # Re-saving matches inside and outside the windows
+    for record in records[:3] + records[-3:]:
+        db.save_match(*record)
+
+    assert db.check_rolling_aggregates() == []
+    for window in ROLLING_WINDOWS:
+        for playlist in (None, records[0][1]['playlist_name']):
+            served = db.get_win_loss_averages(window, playlist=playlist)
+            expected = expected_win_loss(db, records, window, playlist)
+            for key, result in (('wins', 'win'), ('losses', 'loss')):
+                assert served[key]['count'] == expected[result]['count']
+                assert served[key]['avg_goals'] == pytest.approx(expected[result]['avg_goals'])
+                assert served[key]['avg_boost'] == pytest.approx(expected[result]['avg_boost'])
+
+
+def test_rolling_aggregates_match_query_path(db):
+    db.save_matches(make_records(80))
+    window = ROLLING_WINDOWS[-1]
+    served = db.get_win_loss_averages(window)
+    computed = db.aggregate(stats=ROLLING_SUM_COLUMNS, group_by=['result'], last_n_matches=window)
+    wins = next(group for group in computed if group['result'] == 'win')
+    assert served['wins']['count'] == wins['count']
+    for field, column in WIN_LOSS_AVERAGES:
+        assert served['wins'][field] == pytest.approx(wins[f'avg_{column}'])
+
+
+def test_rolling_aggregate_checker_repairs_drift(db):
+    db.save_matches(make_records(40))
+    db.conn.execute("UPDATE rolling_aggregates SET sum_goals = sum_goals + 5 WHERE result = 'win'")
+    db.commit()
+
+    mismatches = db.check_rolling_aggregates(repair=True)
+    assert mismatches and {m['field'] for m in mismatches} == {'sum_goals'}
+    assert db.check_rolling_aggregates() == []
+
+
+def test_rewrites_recount_only_the_windows_they_touch(db, monkeypatch):
+    records = make_records(60, seed=5)
+    db.save_matches(records)
+
+    def full_rebuild(conn):
+        raise AssertionError("a write rebuilt every rolling window")
+    monkeypatch.setattr(database, '_rebuild_rolling_aggregates', full_rebuild)
+
+    # Moving matches to the other result and another playlist takes them out of their old windows
+    moved = []
+    for replay_id, details, player in records[:8]:
+        details = dict(details, playlist_name="Moved",
+                       blue=dict(details['blue'], stats=details['orange']['stats']),
+                       orange=dict(details['orange'], stats=details['blue']['stats']))
+        moved.append((replay_id, details, player))
+    assert db.save_matches(moved[:6]) == {'inserted': 0, 'replaced': 6}
+    for record in moved[6:]:
+        db.save_match(*record)
+    assert db.check_rolling_aggregates() == []
+
+    assert db.delete_match(records[0][0])
+    db.save_matches(records[1:3])
+    assert db.check_rolling_aggregates() == []
+
+
+def test_raw_stats_are_compressed_and_decoded_on_request(db):
+    records = make_records(3)
+    db.save_matches(records[:2])
+    db.save_match(*records[2])
+
+    assert 'stats_json' not in db.get_recent_matches(1)[0]
+    for replay_id, _, player in records:
+        assert db.get_match_by_id(replay_id)['full_stats'] == player['stats']
+        assert 'full_stats' not in db.get_match_by_id(replay_id, include_stats=False)
+        assert db.get_match_stats(replay_id) == player['stats']
+
+
+def test_migration_moves_existing_stats_json(tmp_path, monkeypatch):
+    path = str(tmp_path / "old.db")
+    # A database as it was before raw stats moved out of the matches table
+    monkeypatch.setattr(database, "SCHEMA_MIGRATIONS", database.SCHEMA_MIGRATIONS[:2])
+    old = MatchDatabase(path)
+    old.conn.execute("INSERT INTO matches (replay_id, date, result, stats_json) VALUES (?, ?, ?, ?)",
+                     ("old-1", "2024-01-01T00:00:00", "win", '{"core": {"goals": 3}}'))
+    old.commit()
+    old.close()
+    monkeypatch.undo()
+
+    migrated = MatchDatabase(path, player_id=STEAM_ID)
+    assert migrated.get_match_stats("old-1") == {"core": {"goals": 3}}
+    columns = {row[1] for row in migrated.conn.execute("PRAGMA table_info(matches)")}
+    assert 'stats_json' not in columns
+    migrated.close()
+
+
+def save_at(db, replay_id, date):
+    """Save a synthetic match played at an exact ISO date."""
+    _, details, player = make_records(1)[0]
+    db.save_match(replay_id, {**details, "id": replay_id, "date": date}, player)
+
+
+def test_dates_are_ordered_and_filtered_as_utc_instants(db):
+    # Text order is the reverse of the order these were played in
+    save_at(db, "played-1st", "2024-10-01T10:00:00+02:00")  # 08:00Z
+    save_at(db, "played-2nd", "2024-10-01T09:00:00Z")
+    save_at(db, "played-3rd", "2024-10-01T05:00:00-05:00")  # 10:00Z
+
+    assert [m['replay_id'] for m in db.get_recent_matches(3)] == ["played-3rd", "played-2nd", "played-1st"]
+    assert db.get_match_by_id("played-1st")['date_epoch'] == database.date_to_epoch("2024-10-01T08:00:00Z")
+
+    def ids(**filters):
+        return [m['replay_id'] for m in db.query_matches(**filters)['matches']]
+
+    assert ids(sort_dir='asc') == ["played-1st", "played-2nd", "played-3rd"]
+    assert ids(date_after="2024-10-01T08:30:00Z") == ["played-3rd", "played-2nd"]
+    assert ids(date_before="2024-10-01T11:30:00+02:00") == ["played-2nd", "played-1st"]
+    assert len(ids(date_before="2024-10-01")) == 3  # A bare date covers the whole (UTC) day
+    assert ids(date_before="2024-09-30") == []
+    with pytest.raises(ValueError):
+        db.query_matches(date_after="last tuesday")
+
+
+def test_rolling_aggregate_migration_fills_from_existing_rows(tmp_path, monkeypatch):
+    path = str(tmp_path / "old.db")
+    migrations = database.SCHEMA_MIGRATIONS
+    # A database as it was before the rolling aggregates
+    monkeypatch.setattr(database, "SCHEMA_MIGRATIONS", migrations[:1])
+    old = MatchDatabase(path)
+    old.conn.executemany("INSERT INTO matches (replay_id, date, result, playlist, goals) VALUES (?, ?, ?, ?, ?)",
+                         [(f"old-{i}", f"2024-01-{i + 1:02d}T12:00:00Z", "win", "Ranked Doubles", i)
+                          for i in range(15)])
+    old.commit()
+    old.close()
+
+    monkeypatch.setattr(database, "SCHEMA_MIGRATIONS", migrations[:2])
+    filled = MatchDatabase(path)
+    counts = filled.conn.execute("SELECT playlist, window_size, match_count, sum_goals FROM rolling_aggregates "
+                                 "ORDER BY playlist, window_size").fetchall()
+    assert [tuple(row) for row in counts] == [('*', 10, 10, 95), ('*', 20, 15, 105),
+                                              ('Ranked Doubles', 10, 10, 95), ('Ranked Doubles', 20, 15, 105)]
+    filled.close()
+    monkeypatch.undo()
+
+    migrated = MatchDatabase(path, player_id=STEAM_ID)
+    assert migrated.check_rolling_aggregates() == []
+    migrated.close()
+
+
+def test_migration_adds_date_epoch_to_existing_rows(tmp_path, monkeypatch):
+    path = str(tmp_path / "old.db")
+    # A database as it was before matches had date_epoch
+    monkeypatch.setattr(database, "SCHEMA_MIGRATIONS", database.SCHEMA_MIGRATIONS[:4])
+    old = MatchDatabase(path)
+    old.conn.executemany("INSERT INTO matches (replay_id, date, result, goals) VALUES (?, ?, ?, ?)", [
+        ("old-1", "2024-01-01T12:00:00+02:00", "win", 1),
+        ("old-2", "2024-01-01T11:00:00Z", "win", 2),
+        ("old-3", "not a date", "win", 3),
+    ])
+    old.commit()
+    old.close()
+    monkeypatch.undo()
+
+    migrated = MatchDatabase(path, player_id=STEAM_ID)
+    assert migrated.get_match_by_id("old-1")['date_epoch'] == database.date_to_epoch("2024-01-01T10:00:00Z")
+    assert migrated.get_match_by_id("old-3")['date_epoch'] is None
+    assert [m['replay_id'] for m in migrated.get_recent_matches(3)] == ["old-2", "old-1", "old-3"]
+    assert migrated.check_rolling_aggregates() == []
+    migrated.close()
+
+
+def test_migration_backfill_runs_online_in_resumable_chunks(tmp_path, monkeypatch):
+    path = str(tmp_path / "old.db")
+    monkeypatch.setattr(database, "SCHEMA_MIGRATIONS", database.SCHEMA_MIGRATIONS[:4])
+    old = MatchDatabase(path)
+    old.conn.executemany("INSERT INTO matches (replay_id, date, result, goals) VALUES (?, ?, ?, ?)", [
+        (f"old-{i:02d}", (datetime(2024, 1, 1, tzinfo=timezone.utc) + timedelta(hours=i)).isoformat(), "win", i)
+        for i in range(25)
+    ])
+    old.commit()
+    old.close()
+    monkeypatch.undo()
+
+    # Schema changes apply at open; the data is left for run_backfills()
+    live = MatchDatabase(path, defer_backfills=True, player_id=STEAM_ID)
+    assert live.schema_version == database.SCHEMA_MIGRATIONS[-1][0]
+    assert live.pending_backfills() == ["matches.date_epoch", "matches.player_id"]
+    assert live.get_match_by_id("old-00") is None  # Set aside until it's copied back
+
+    _, details, player = make_records(1)[0]
+    calls = []
+
+    def interrupt(name, done, total):
+        calls.append((name, done, total))
+        if len(calls) == 1:
+            live.save_match("replay-new", details, player)  # Ingestion writes between chunks
+        else:
+            raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        live.run_backfills(chunk_size=10, progress=interrupt)
+    # Nothing left in matches for date_epoch; the copy derives it on the way
+    assert calls == [("matches.player_id", 10, 25), ("matches.player_id", 20, 25)]
+    assert live.get_match_by_id("old-00")['date_epoch'] is not None
+    assert live.get_match_by_id("replay-new")['date_epoch'] is not None
+    live.close()
+
+    resumed = MatchDatabase(path, defer_backfills=True, player_id=STEAM_ID)
+    progress = []
+    assert resumed.run_backfills(chunk_size=10, progress=lambda *args: progress.append(args)) == 5
+    assert progress == [("matches.player_id", 25, 25)]
+    assert resumed.pending_backfills() == []
+    assert resumed.get_match_by_id("old-24")['date_epoch'] == database.date_to_epoch("2024-01-02T00:00:00Z")
+    assert len(resumed.get_recent_matches(50)) == 26
+    assert not resumed.conn.execute("SELECT 1 FROM sqlite_master WHERE name LIKE '%_legacy'").fetchone()
+    assert resumed.check_rolling_aggregates() == []
+    assert resumed.run_backfills() == 0
+    resumed.close()
+
+
+def test_reads_are_cached_until_any_connection_commits(db):
+    db.save_matches(make_records(30))
+    first = db.get_averages(10)
+    assert db.get_averages(10) is first
+    assert (db.cache.hits, db.cache.misses) == (1, 1)
+
+    # Readers can't see an open transaction, so the cached result still holds
+    record = make_records(31)[-1]
+    db.save_match("newest", {**record[1], 'date': "2030-01-01T00:00:00Z"}, record[2], commit=False)
+    assert db.get_averages(10) is first
+    db.commit()
+    assert db.get_averages(10) is not first
+    assert db.get_recent_matches(1)[0]['replay_id'] == "newest"
+
+    # A write from another process sharing the file
+    other = MatchDatabase(db.db_path)
+    other.delete_match("newest")
+    other.close()
+    assert db.get_recent_matches(1)[0]['replay_id'] != "newest"
+
+
+def test_read_cache_is_lru_bounded(tmp_path):
+    small = MatchDatabase(str(tmp_path / "small.db"), cache_size=2)
+    small.save_matches(make_records(5))
+    for limit in (1, 2, 3):
+        small.get_recent_matches(limit)
+    assert len(small.cache) == 2
+    small.get_recent_matches(3)
+    small.get_recent_matches(1)  # Least recently used, so already evicted
+    assert (small.cache.hits, small.cache.misses) == (1, 4)
+    small.close()
+
+
+TEAMMATE_ID = "76561198000000001"
+
+
+def teammate_records(records):
+    """The same replays as seen from an (orange) teammate who always won."""
+    copies = []
+    for replay_id, details, player in records:
+        teammate = {**player, 'id': {**player['id'], 'id': TEAMMATE_ID}}
+        copies.append((replay_id, {**details, 'blue': {**details['blue'], 'stats': {'core': {'goals': 0}}},
+                                   'orange': {**details['orange'], 'stats': {'core': {'goals': 99}}}},
+                       teammate))
+    return copies
+
+
+def test_players_sharing_replays_are_kept_apart(db):
+    records = make_records(30)
+    db.save_matches(records)
+    assert db.save_matches(teammate_records(records)) == {'inserted': 30, 'replaced': 0}
+
+    assert len(db.get_recent_matches(100)) == 30  # Scoped to this handle's player
+    assert len(db.get_recent_matches(100, player_id=TEAMMATE_ID)) == 30
+    assert db.existing_replay_ids([records[0][0]], player_id="someone-else") == set()
+    assert db.get_match_by_id(records[0][0], player_id=TEAMMATE_ID)['player_id'] == TEAMMATE_ID
+
+    teammate = db.get_win_loss_averages(ROLLING_WINDOWS[0], player_id=TEAMMATE_ID)
+    assert teammate['wins']['count'] == ROLLING_WINDOWS[0] and teammate['losses']['count'] == 0
+    assert db.check_rolling_aggregates() == []
+
+    everyone = MatchDatabase(db.db_path)
+    try:
+        assert len(everyone.get_recent_matches(100)) == 60
+    finally:
+        everyone.close()
+
+    assert db.delete_match(records[0][0], player_id=TEAMMATE_ID)
+    assert db.match_exists(records[0][0]) and not db.match_exists(records[0][0], player_id=TEAMMATE_ID)
+    assert db.check_rolling_aggregates() == []
+
+
+def test_migration_attributes_existing_matches_to_the_databases_player(tmp_path, monkeypatch):
+    path = str(tmp_path / "old.db")
+    # A database as it was before matches were keyed by player
+    monkeypatch.setattr(database, "SCHEMA_MIGRATIONS", database.SCHEMA_MIGRATIONS[:5])
+    old = MatchDatabase(path, defer_backfills=True)
+    old.conn.executemany("INSERT INTO matches (replay_id, date, result, goals) VALUES (?, ?, ?, ?)", [
+        (f"old-{i:02d}", (datetime(2024, 1, 1, tzinfo=timezone.utc) + timedelta(hours=i)).isoformat(),
+         "win" if i % 3 else "loss", i)
+        for i in range(20)
+    ])
+    old.conn.execute("INSERT INTO match_stats (replay_id, stats) VALUES (?, ?)",
+                     ("old-03", database.encode_stats({"core": {"goals": 3}})))
+    old.commit()
+    old.close()
+    monkeypatch.undo()
+
+    # Nobody to attribute the saved matches to: left as it was
+    monkeypatch.setenv("STEAM_ID", TEAMMATE_ID)
+    with pytest.raises(RuntimeError):
+        MatchDatabase(path)
+    unmigrated = sqlite3.connect(path)
+    assert unmigrated.execute("PRAGMA user_version").fetchone()[0] == 5
+    assert unmigrated.execute("SELECT COUNT(*) FROM matches").fetchone()[0] == 20
+    unmigrated.close()
+
+    migrated = MatchDatabase(path, player_id=STEAM_ID)
+    assert [m['player_id'] for m in migrated.get_recent_matches(50)] == [STEAM_ID] * 20
+    assert migrated.get_match_stats("old-03") == {"core": {"goals": 3}}
+    assert migrated.check_rolling_aggregates() == []
+    assert migrated.get_win_loss_averages(ROLLING_WINDOWS[0])['losses']['count'] == 7
+    assert migrated.get_recent_matches(50, player_id="someone-else") == []
+    migrated.close()
+
+
+def test_player_shards_route_each_player_to_their_own_file(tmp_path):
+    shards = database.PlayerShards(str(tmp_path / "players"))
+    try:
+        mine = shards.for_player(STEAM_ID)
+        assert shards.for_player(STEAM_ID) is mine
+        mine.save_matches(make_records(5))
+        shards.for_player(TEAMMATE_ID).save_matches(teammate_records(make_records(3)))
+
+        assert shards.players() == [STEAM_ID, TEAMMATE_ID]
+        assert len(mine.get_recent_matches(10)) == 5
+        assert len(shards.for_player(TEAMMATE_ID).get_recent_matches(10)) == 3
+        for bad in ("../escape", "", "a/b"):
+            with pytest.raises(ValueError):
+                shards.path_for(bad)
+    finally:
+        shards.close()
+
+
+FRIEND_ID = "76561198000000002"
+RIVAL_ID = "76561198000000003"
+
+
+def with_friend_and_rival(records):
+    """Records with the same teammate and the same opponent added to every match."""
+    rng = random.Random(1)
+    updated = []
+    for replay_id, details, player in records:
+        mine = 'blue' if player in details['blue']['players'] else 'orange'
+        theirs = 'orange' if mine == 'blue' else 'blue'
+        details = {
+            **details,
+            mine: {**details[mine], 'players': details[mine]['players'] + [synthetic_player(rng, FRIEND_ID, "Friend")]},
+            theirs: {**details[theirs], 'players': details[theirs]['players'] + [synthetic_player(rng, RIVAL_ID, "Rival")]},
+        }
+        updated.append((replay_id, details, player))
+    return updated
+
+
+def test_every_participant_is_saved_with_the_match(db):
+    records = with_friend_and_rival(make_records(12))
+    db.save_matches(records[1:])
+    replay_id, details, player = records[0]
+    db.save_match(replay_id, details, player)
+
+    participants = db.get_match_players(replay_id)
+    assert len(participants) == len(details['blue']['players']) + len(details['orange']['players'])
+    assert {p['platform_id'] for p in participants} >= {STEAM_ID, FRIEND_ID, RIVAL_ID}
+    assert {p['result'] for p in participants} == {'win', 'loss'}
+
+    teammates = db.get_teammates(min_matches=2)
+    assert [t['platform_id'] for t in teammates] == [FRIEND_ID]
+    assert teammates[0]['matches'] == 12
+    assert teammates[0]['wins'] == sum(m['result'] == 'win' for m in db.get_recent_matches(12))
+
+    rival = db.get_opponent_history(RIVAL_ID, limit=5)
+    assert rival['wins'] + rival['losses'] == 12
+    assert len(rival['matches']) == 5 and {m['opponent_name'] for m in rival['matches']} == {"Rival"}
+    assert db.get_opponent_history(FRIEND_ID)['matches'] == []
+
+    assert db.delete_match(replay_id)
+    assert db.get_match_players(replay_id) == []
+
+
+def test_delete_match_removes_stats_and_updates_aggregates(db):
+    records = make_records(30)
+    db.save_matches(records)
+    newest = db.get_recent_matches(1)[0]['replay_id']
+
+    assert db.delete_match(newest)
+    assert db.get_match_by_id(newest) is None
+    assert db.get_match_stats(newest) is None
+    assert db.check_rolling_aggregates() == []
+    assert not db.delete_match(newest)
+
+
+def test_registered_stat_paths_are_backfilled_and_queryable(db, tmp_path):
+    records = make_records(60)
+    db.save_matches(records[:50])
+
+    name = db.register_stat_path("movement.count_powerslide", index=True)
+    assert name == "movement_count_powerslide"
+    assert db.register_stat_path("movement.count_powerslide") == name
+    db.save_matches(records[50:])  # Saved after registration: filled on write
+
+    chunks = []
+    assert db.backfill_stat_columns(chunk_size=16, progress=lambda column, done: chunks.append(done)) == 60
+    assert chunks == [16, 32, 48, 60]
+    assert db.get_stat_columns()[0]['backfilled'] == 1
+    assert db.backfill_stat_columns() == 0
+
+    powerslides = {r[0]: r[2]['stats']['movement']['count_powerslide'] for r in records}
+    page = db.query_matches(ranges={name: (80, None)}, sort_by=name, limit=200)
+    expected = sorted((p, rid) for rid, p in powerslides.items() if p >= 80)
+    assert [(m[name], m['replay_id']) for m in page['matches']] == expected[::-1]
+
+    averages = db.get_averages(60, stats=[name])
+    assert averages[f'avg_{name}'] == pytest.approx(sum(powerslides.values()) / 60)
+    win_loss = db.get_win_loss_averages(20, stats=[name])
+    assert f'avg_{name}' in win_loss['wins']
+
+    # Another handle on the same file (e.g. the MCP server) sees the new column
+    other = MatchDatabase(db.db_path)
+    assert name in other.stat_columns()
+    other.close()
+
+    with pytest.raises(ValueError):
+        db.register_stat_path("movement.count_powerslide; DROP TABLE matches")
+    with pytest.raises(ValueError):
+        db.register_stat_path("core.goals", name="goals")
+    with pytest.raises(ValueError):
+        db.get_averages(10, stats=["not_registered"])
+
+
+def test_stat_path_backfill_resumes_after_interruption(db):
+    db.save_matches(make_records(40))
+    db.register_stat_path("demo.inflicted")
+
+    def interrupt(column, done):
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        db.backfill_stat_columns(chunk_size=10, progress=interrupt)
+    assert db.get_stat_columns()[0]['backfilled'] == 0
+    assert db.backfill_stat_columns(chunk_size=10) == 30
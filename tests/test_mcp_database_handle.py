@@ -0,0 +1,33 @@
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import pytest
+
+from tests.test_match_database import make_records
+from src.mcp_server import tools
+
+
+@pytest.fixture
+def shared_db(tmp_path):
+    db = tools.open_database(str(tmp_path / "matches.db"))
+    db.save_matches(make_records(30))
+    yield db
+    tools.close_database()
+
+
+def test_tools_share_one_database_handle(shared_db):
+    assert tools.get_latest_match() == shared_db.get_recent_matches(1)[0]
+    assert tools.get_match_details("replay-00003")['replay_id'] == "replay-00003"
+    assert tools.query_matches(limit=5)['matches']
+    assert tools.get_database() is shared_db
+
+    # Calls borrow from the read pool instead of opening connections
+    assert shared_db.read_pool._opened == 1
+
+
+def test_close_database_releases_the_handle(shared_db):
+    tools.close_database()
+    assert tools._db is None
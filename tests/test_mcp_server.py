@@ -89,7 +89,7 @@ async def test_server():
                 arguments={"result": "win", "limit": 3}
             )
             content = result.content[0].text
-            matches = json.loads(content)
+            matches = json.loads(content)['matches']
             
             print(f"✅ Got {len(matches)} wins:")
             for match in matches[:3]:
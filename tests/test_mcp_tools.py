@@ -53,7 +53,7 @@ print("="*60)
 
 # Test 3a: Get wins with 2+ goals
 print("\nQuery: Wins with 2+ goals")
-good_wins = query_matches(result='win', min_goals=2, limit=3)
+good_wins = query_matches(result='win', min_goals=2, limit=3)['matches']
 if good_wins:
     print(f"✅ Found {len(good_wins)} matches:")
     for match in good_wins:
@@ -63,7 +63,7 @@ else:
 
 # Test 3b: Get best scoring games
 print("\nQuery: Top scoring games")
-best_games = query_matches(sort_by='goals', limit=3)
+best_games = query_matches(sort_by='goals', limit=3)['matches']
 if best_games:
     print(f"✅ Found {len(best_games)} matches:")
     for match in best_games:
@@ -73,7 +73,7 @@ else:
 
 # Test 3c: Get recent losses with high saves (defensive games)
 print("\nQuery: Losses with 3+ saves (defensive games)")
-defensive_losses = query_matches(result='loss', min_saves=3, limit=3)
+defensive_losses = query_matches(result='loss', min_saves=3, limit=3)['matches']
 if defensive_losses:
     print(f"✅ Found {len(defensive_losses)} matches:")
     for match in defensive_losses:
@@ -0,0 +1,54 @@
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import time
+from src.utils.database import MatchDatabase
+from src.utils.pending import PendingReplayTracker
+
+
+def make_tracker(tmp_path, **kwargs):
+    db = MatchDatabase(str(tmp_path / "matches.db"))
+    return db, PendingReplayTracker(db, **kwargs)
+
+
+def test_deferred_replay_is_due_after_backoff(tmp_path):
+    db, tracker = make_tracker(tmp_path, base_delay=10)
+    tracker.defer("abc", "pending")
+    assert tracker.due() == []
+
+    entry = db.get_pending_replay("abc")
+    assert entry["attempts"] == 1
+    assert 8 <= entry["next_check_at"] - time.time() <= 12
+
+    # Pretend the backoff has elapsed
+    db.upsert_pending_replay("abc", entry["first_seen"], 1, time.time() - 1, False, "pending")
+    assert tracker.due() == ["abc"]
+
+
+def test_backoff_grows_and_is_capped(tmp_path):
+    db, tracker = make_tracker(tmp_path, base_delay=10, max_delay=60, max_attempts=100)
+    delays = []
+    for _ in range(6):
+        tracker.defer("abc", "pending")
+        delays.append(db.get_pending_replay("abc")["next_check_at"] - time.time())
+    assert delays[1] > delays[0] * 1.3
+    assert max(delays) <= 60 * 1.2 + 1
+
+
+def test_parks_after_threshold_or_failure(tmp_path):
+    db, tracker = make_tracker(tmp_path, max_attempts=3)
+    assert not tracker.defer("slow", "pending")
+    assert not tracker.defer("slow", "pending")
+    assert tracker.defer("slow", "pending")
+    assert tracker.defer("broken", "failed")
+    assert {entry["replay_id"] for entry in tracker.parked()} == {"slow", "broken"}
+
+
+def test_resolve_removes_entry(tmp_path):
+    db, tracker = make_tracker(tmp_path)
+    tracker.defer("abc", "pending")
+    tracker.resolve("abc")
+    assert db.get_pending_replay("abc") is None
@@ -0,0 +1,146 @@
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+
+from tests.test_match_database import make_records
+from src.utils.async_database import create_async_database
+from src.utils.poller import ReplayPoller
+
+START = datetime(2024, 10, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def upload(replay_id, seconds):
+    """A /replays list entry uploaded `seconds` after START."""
+    created = (START + timedelta(seconds=seconds)).isoformat().replace("+00:00", "Z")
+    return {'id': replay_id, 'created': created}
+
+
+class UploadListing:
+    """
+    Ballchasing's /replays listing over `uploads`, `page_size` at a time.
+
+    created-after is inclusive here, as the poller has to assume it may be.
+    """
+
+    def __init__(self, uploads, page_size=10):
+        self.uploads = list(uploads)
+        self.page_size = page_size
+        self.pages_served = 0
+
+    async def get_replays(self, uploader=None, count=10, sort_by="upload-date", sort_dir="desc"):
+        newest_first = sorted(self.uploads, key=lambda replay: replay['created'], reverse=True)
+        return newest_first[:count]
+
+    async def iter_replay_pages(self, filters):
+        after = filters['created-after']
+        listed = sorted((replay for replay in self.uploads if replay['created'] >= after),
+                        key=lambda replay: replay['created'])
+        for start in range(0, max(len(listed), 1), self.page_size):
+            self.pages_served += 1
+            more = start + self.page_size < len(listed)
+            yield listed[start:start + self.page_size], "next" if more else None
+
+
+def run_poller(tmp_path, uploads, scenario, **poller_kwargs):
+    """Run `scenario(poller, listing, db)` against a fresh database."""
+    async def run():
+        db = create_async_database(str(tmp_path / "matches.db"))
+        listing = UploadListing(uploads)
+        try:
+            return await scenario(ReplayPoller(listing, db, **poller_kwargs), listing, db)
+        finally:
+            await db.close()
+
+    return asyncio.run(run())
+
+
+async def watermark(db):
+    value = await db.get_sync_state(ReplayPoller.STATE_KEY)
+    return json.loads(value) if value else None
+
+
+def ids(replays):
+    return [replay['id'] for replay in replays]
+
+
+def test_burst_spanning_several_pages_is_paged_through(tmp_path):
+    async def scenario(poller, listing, db):
+        await poller.poll()
+        await poller.advance()
+        listing.uploads += [upload(f"burst-{i:02d}", 60 + i) for i in range(25)]
+        listing.pages_served = 0
+
+        burst = await poller.poll()
+        await poller.advance()
+        return burst, listing.pages_served, await watermark(db)
+
+    burst, pages, mark = run_poller(tmp_path, [upload("first", 0)], scenario)
+    assert ids(burst) == [f"burst-{i:02d}" for i in range(25)]
+    assert pages == 3
+    assert mark == {'created': upload("burst-24", 84)['created'], 'replay_ids': ["burst-24"]}
+
+
+def test_replays_sharing_the_boundary_timestamp_are_each_returned_once(tmp_path):
+    async def scenario(poller, listing, db):
+        await poller.poll()
+        await poller.advance()
+        # Two uploads land in the same second; the poll runs between them
+        listing.uploads.append(upload("same-second-a", 30))
+        first = await poller.poll()
+        await poller.advance()
+        listing.uploads.append(upload("same-second-b", 30))
+        second = await poller.poll()
+        await poller.advance()
+        third = await poller.poll()
+        return first, second, third, await watermark(db)
+
+    first, second, third, mark = run_poller(tmp_path, [upload("first", 0)], scenario)
+    assert ids(first) == ["same-second-a"]
+    assert ids(second) == ["same-second-b"]
+    assert third == []
+    assert mark == {'created': upload("same-second-a", 30)['created'],
+                    'replay_ids': ["same-second-a", "same-second-b"]}
+
+
+def test_watermark_never_moves_backwards(tmp_path):
+    async def scenario(poller, listing, db):
+        await poller.poll()
+        await poller.advance()
+        before = await watermark(db)
+        # Handling a re-checked older replay late mustn't rewind the watermark
+        await poller.advance([upload("late", 5)])
+        return before, await watermark(db)
+
+    before, after = run_poller(tmp_path, [upload("older", 10), upload("newest", 20)], scenario)
+    assert before == {'created': upload("newest", 20)['created'], 'replay_ids': ["newest"]}
+    assert after == before
+
+
+def test_watermark_stays_put_until_advance(tmp_path):
+    (replay_id, details, player), = make_records(1)
+
+    async def scenario(poller, listing, db):
+        await poller.poll()
+        await poller.advance()
+        before = await watermark(db)
+        listing.uploads.append(upload(replay_id, 40))
+
+        # A crash before advance(): the same replay is listed again
+        listed = await poller.poll()
+        unmoved = await watermark(db)
+        again = await poller.poll()
+        # ...unless it was saved in the meantime
+        await db.save_match(replay_id, details, player)
+        saved = await poller.poll()
+        return before, listed, unmoved, again, saved
+
+    before, listed, unmoved, again, saved = run_poller(tmp_path, [upload("first", 0)], scenario)
+    assert ids(listed) == ids(again) == [replay_id]
+    assert unmoved == before
+    assert saved == []
@@ -0,0 +1,209 @@
+"""
+Query-plan regression tests for the matches table.
+
+Each test captures the SQL a MatchDatabase method actually runs and asserts
+on its EXPLAIN QUERY PLAN, so a query or schema change that falls back to a
+full table scan (or an extra sort) fails here instead of getting slow.
+"""
+
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import pytest
+
+from tests.test_match_database import RIVAL_ID, STEAM_ID, make_records, with_friend_and_rival
+from src.utils.database import ROLLING_WINDOWS, SCHEMA_MIGRATIONS, MatchDatabase
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = MatchDatabase(str(tmp_path / "matches.db"), player_id=STEAM_ID)
+    database.save_matches(with_friend_and_rival(make_records(200)))
+    yield database
+    database.close()
+
+
+def query_plans(db, call):
+    """EXPLAIN QUERY PLAN detail lines for every query issued by call(db)."""
+    statements = []
+    # Reads run on the pool; single-threaded, the pool hands back this same connection
+    with db.read_pool.connection() as reader:
+        connections = (db.conn, reader)
+    for conn in connections:
+        conn.set_trace_callback(statements.append)
+    try:
+        call(db)
+    finally:
+        for conn in connections:
+            conn.set_trace_callback(None)
+
+    plans = []
+    for sql in statements:
+        if sql.lstrip().upper().startswith(("SELECT", "WITH")):
+            plans.append([row[3] for row in db.conn.execute("EXPLAIN QUERY PLAN " + sql)])
+    assert plans, "no SELECT statements were captured"
+    return plans
+
+
+def assert_uses_index(plans, index, sorted_by_index=True, table="matches"):
+    for plan in plans:
+        table_steps = [step for step in plan if f" {table} " in f"{step} "]
+        assert table_steps, plan
+        for step in table_steps:
+            assert "USING" in step, f"full table scan: {plan}"
+        assert any(f"INDEX {index}" in step for step in table_steps), plan
+        if sorted_by_index:
+            assert not any("TEMP B-TREE" in step for step in plan), plan
+
+
+def assert_sorts_only_groups(plans):
+    """Rows reach window functions in index order; only the final (small) GROUP BY sorts."""
+    for plan in plans:
+        sorts = [step for step in plan if "TEMP B-TREE" in step]
+        assert all(step.endswith("FOR GROUP BY") for step in sorts), plan
+
+
+def assert_limits_each_group(plans):
+    """Each group's latest matches come from a LIMITed index walk, not from ranking every match."""
+    for plan in plans:
+        assert any("CORRELATED LIST SUBQUERY" in step for step in plan), plan
+        assert any("USING INTEGER PRIMARY KEY" in step for step in plan), plan
+
+
+def test_migration_sets_user_version_and_is_idempotent(tmp_path):
+    path = str(tmp_path / "matches.db")
+    database = MatchDatabase(path)
+    latest = SCHEMA_MIGRATIONS[-1][0]
+    assert database.schema_version == latest
+    database.close()
+
+    reopened = MatchDatabase(path)
+    assert reopened.schema_version == latest
+    names = {row[0] for row in reopened.conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'matches'")}
+    assert {"idx_matches_date", "idx_matches_result_date", "idx_matches_playlist_result_date"} <= names
+    reopened.close()
+
+
+def test_recent_matches_walks_date_index(db):
+    assert_uses_index(query_plans(db, lambda d: d.get_recent_matches(10)), "idx_matches_date")
+
+
+def test_averages_walk_date_index(db):
+    assert_uses_index(query_plans(db, lambda d: d.get_averages(10)), "idx_matches_date")
+
+
+def test_win_loss_averages_read_rolling_aggregates(db):
+    plans = query_plans(db, lambda d: d.get_win_loss_averages(ROLLING_WINDOWS[-1]))
+    assert len(plans) == 2
+    assert_uses_index(plans, "sqlite_autoindex_rolling_aggregates_1", table="rolling_aggregates")
+    assert not any(" matches" in step for plan in plans for step in plan)
+
+
+def test_win_loss_averages_outside_windows_use_result_index(db):
+    # Wins and losses come from one grouped statement
+    plans = query_plans(db, lambda d: d.get_win_loss_averages(15))
+    assert len(plans) == 1
+    assert_uses_index(plans, "idx_matches_result_date", sorted_by_index=False)
+    assert_sorts_only_groups(plans)
+    assert_limits_each_group(plans)
+
+    plans = query_plans(db, lambda d: d.get_win_loss_averages(15, playlist="Ranked Doubles"))
+    assert_uses_index(plans, "idx_matches_playlist_result_date", sorted_by_index=False)
+    assert_sorts_only_groups(plans)
+    assert_limits_each_group(plans)
+
+
+def test_grouped_aggregation_is_one_statement(db):
+    plans = query_plans(db, lambda d: d.aggregate(['goals', 'saves'], ['avg', 'median', 'p90'],
+                                                  group_by=['playlist', 'result'], last_n_matches=10))
+    assert len(plans) == 1
+    assert_uses_index(plans, "idx_matches_playlist_result_date", sorted_by_index=False)
+    assert_limits_each_group(plans)
+
+
+def test_save_match_slides_windows_by_index(db):
+    record = make_records(201)[-1]
+    plans = query_plans(db, lambda d: d.save_match("newest", {**record[1], 'date': "2030-01-01"}, record[2]))
+    member_plans = [plan for plan in plans if any("rolling_aggregate_members" in step for step in plan)]
+    assert member_plans
+    assert_uses_index(member_plans, "idx_rolling_members", table="rolling_aggregate_members")
+
+
+def test_lookups_by_replay_id_use_primary_key(db):
+    plans = query_plans(db, lambda d: (d.match_exists("replay-00001"),
+                                       d.get_match_by_id("replay-00001"),
+                                       d.existing_replay_ids(["replay-00001", "replay-00002"])))
+    stats_plans = [plan for plan in plans if any("match_stats" in step for step in plan)]
+    assert_uses_index([plan for plan in plans if plan not in stats_plans], "sqlite_autoindex_matches_1")
+    assert_uses_index(stats_plans, "sqlite_autoindex_match_stats_1", table="match_stats")
+
+
+def test_query_matches_by_date(db):
+    assert_uses_index(query_plans(db, lambda d: d.query_matches()), "idx_matches_date")
+
+
+def test_query_matches_by_result_and_cursor(db):
+    first = db.query_matches(result="win", limit=5)
+    plans = query_plans(db, lambda d: d.query_matches(result="win", limit=5, cursor=first["next_cursor"]))
+    assert_uses_index(plans, "idx_matches_result_date")
+    assert any("date_epoch,replay_id)<" in step.replace(" ", "") for plan in plans for step in plan)
+
+
+def test_query_matches_by_playlist_and_result(db):
+    plans = query_plans(db, lambda d: d.query_matches(playlist="Ranked Doubles", result="loss"))
+    assert_uses_index(plans, "idx_matches_playlist_result_date")
+
+
+def test_query_matches_on_indexed_stat_path(db):
+    name = db.register_stat_path("demo.inflicted", index=True)
+    db.backfill_stat_columns()
+    db.stat_columns()  # Load the registry before capturing
+    plans = query_plans(db, lambda d: d.query_matches(ranges={name: (3, None)}, sort_by=name, limit=5))
+    assert_uses_index(plans, f"idx_matches_stat_{name}")
+
+
+def test_query_matches_by_playlist_only_walks_player_date_index(db):
+    # No (player, playlist, date) index: the player's matches are walked in date order
+    plans = query_plans(db, lambda d: d.query_matches(playlist="Ranked Doubles"))
+    assert_uses_index(plans, "idx_matches_date")
+
+
+def test_queries_for_another_player_use_the_same_indexes(db):
+    assert_uses_index(query_plans(db, lambda d: d.get_recent_matches(10, player_id="76561198000000001")),
+                      "idx_matches_date")
+    plans = query_plans(db, lambda d: d.get_win_loss_averages(15, player_id="76561198000000001"))
+    assert_uses_index(plans, "idx_matches_result_date", sorted_by_index=False)
+
+
+def test_replay_lookups_across_players_use_replay_index(db):
+    plans = query_plans(db, lambda d: d.existing_replay_ids(["replay-00001"], player_id=""))
+    assert_uses_index(plans, "sqlite_autoindex_matches_1")
+    everyone = MatchDatabase(db.db_path)
+    try:
+        assert_uses_index(query_plans(everyone, lambda d: d.existing_replay_ids(["replay-00001"])),
+                          "idx_matches_replay")
+    finally:
+        everyone.close()
+
+
+def test_teammates_join_participants_by_primary_key(db):
+    plans = query_plans(db, lambda d: d.get_teammates())
+    # Plans name the tables by their aliases: mp (match_players) and m (matches)
+    assert_uses_index(plans, "sqlite_autoindex_match_players_1", sorted_by_index=False, table="mp")
+
+
+def test_opponent_history_seeks_platform_index(db):
+    plans = query_plans(db, lambda d: d.get_opponent_history(RIVAL_ID))
+    assert_uses_index(plans, "idx_match_players_platform", sorted_by_index=False, table="mp")
+    assert_uses_index(plans, "sqlite_autoindex_matches_1", sorted_by_index=False, table="m")
+
+
+def test_export_pages_walk_primary_key(db):
+    plans = query_plans(db, lambda d: list(d.export_matches(include_stats=True, batch_size=7)))
+    pages = [plan for plan in plans if any(" matches " in f"{step} " for step in plan)]
+    assert len(pages) == 200 // 7 + 2  # The last, empty page ends the export
+    assert_uses_index(pages, "sqlite_autoindex_matches_1")
@@ -0,0 +1,75 @@
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import asyncio
+import time
+from src.utils.rate_limiter import RateLimiter, TokenBucket, parse_retry_after
+
+
+def test_bucket_allows_burst_then_spaces_requests():
+    bucket = TokenBucket(rate=2, capacity=2)
+    now = bucket.updated_at
+    assert bucket.reserve(now) == 0
+    assert bucket.reserve(now) == 0
+    # Third call in the same instant waits for one refill
+    assert abs(bucket.reserve(now) - 0.5) < 1e-9
+    # Fourth queues behind the third
+    assert abs(bucket.reserve(now) - 1.0) < 1e-9
+
+
+def test_unknown_tier_falls_back_to_regular():
+    assert RateLimiter(tier="platinum").tier == "regular"
+
+
+def test_retry_after_pauses_every_caller():
+    limiter = RateLimiter(tier="champion")
+    delay = limiter.backoff_delay(0, {"Retry-After": "2"})
+    assert 2 <= delay <= 3
+    assert limiter._reserve() >= 1.9
+
+
+def test_backoff_without_retry_after_is_capped():
+    limiter = RateLimiter(backoff_base=1, backoff_cap=4)
+    for attempt in range(10):
+        assert 0 <= limiter.backoff_delay(attempt) <= 4
+
+
+def test_remaining_header_drains_bucket():
+    limiter = RateLimiter(tier="gold")
+    limiter.update_from_headers({"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": "1"})
+    assert limiter._reserve() >= 0.9
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("5") == 5
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("garbage") is None
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0
+
+
+def test_async_acquire_does_not_block_loop():
+    limiter = RateLimiter(tier="regular")
+
+    async def run():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        task = asyncio.create_task(ticker())
+        start = time.monotonic()
+        for _ in range(3):  # burst of 2, then one 0.5s wait
+            await limiter.acquire()
+        elapsed = time.monotonic() - start
+        task.cancel()
+        return elapsed, ticks
+
+    elapsed, ticks = asyncio.run(run())
+    assert 0.4 < elapsed < 1.0
+    assert ticks > 10
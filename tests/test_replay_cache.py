@@ -0,0 +1,55 @@
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.utils.replay_cache import ReplayCache
+
+
+def test_roundtrip_with_validators(tmp_path):
+    cache = ReplayCache(str(tmp_path))
+    cache.put("abc", {"status": "pending"}, etag='"v1"', last_modified="Tue, 01 Oct 2024 10:00:00 GMT")
+
+    entry = cache.get("abc")
+    assert entry.body == {"status": "pending"}
+    assert not entry.is_final
+    assert entry.conditional_headers() == {
+        "If-None-Match": '"v1"',
+        "If-Modified-Since": "Tue, 01 Oct 2024 10:00:00 GMT",
+    }
+    assert cache.get("missing") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_uncompressed_entries_are_readable_after_switching(tmp_path):
+    ReplayCache(str(tmp_path), compress=False).put("abc", {"status": "ok"})
+    cache = ReplayCache(str(tmp_path), compress=True)
+    assert cache.get("abc").is_final
+
+    cache.put("abc", {"status": "ok", "v": 2})
+    assert len(cache) == 1
+    assert cache.get("abc").body["v"] == 2
+
+
+def test_lru_eviction_keeps_recently_used(tmp_path):
+    cache = ReplayCache(str(tmp_path), compress=False)
+    payload = {"status": "ok", "pad": "x" * 1000}
+    for replay_id in ("a", "b", "c"):
+        cache.put(replay_id, payload)
+    cache.max_bytes = cache.size_bytes  # exactly full
+
+    cache.get("a")  # a becomes most recently used
+    cache.put("d", payload)
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("d") is not None
+
+
+def test_index_survives_restart(tmp_path):
+    cache = ReplayCache(str(tmp_path))
+    cache.put("abc", {"status": "ok"})
+    reopened = ReplayCache(str(tmp_path))
+    assert len(reopened) == 1
+    assert reopened.size_bytes == cache.size_bytes
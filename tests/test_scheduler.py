@@ -0,0 +1,53 @@
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import asyncio
+import time
+from src.utils.scheduler import AdaptivePollScheduler
+
+
+def test_idle_polls_decay_to_max():
+    scheduler = AdaptivePollScheduler(min_interval=5, max_interval=300, decay=2)
+    intervals = []
+    for _ in range(8):
+        scheduler.record_poll(0)
+        intervals.append(scheduler.interval)
+    assert intervals[:3] == [10, 20, 40]
+    assert intervals[-1] == 300
+
+
+def test_activity_resets_and_session_caps_interval():
+    scheduler = AdaptivePollScheduler(min_interval=5, max_interval=300, decay=2, session_max_interval=30)
+    scheduler.interval = 300
+    scheduler.record_poll(1)
+    assert scheduler.interval == 5
+    assert scheduler.in_session
+    for _ in range(10):
+        scheduler.record_poll(0)
+    assert scheduler.interval == 30
+
+
+def test_session_expires():
+    scheduler = AdaptivePollScheduler(min_interval=5, max_interval=300, decay=2, session_window=60)
+    scheduler.record_poll(1)
+    scheduler.last_activity = time.monotonic() - 61
+    for _ in range(10):
+        scheduler.record_poll(0)
+    assert scheduler.interval == 300
+
+
+def test_wake_interrupts_wait():
+    scheduler = AdaptivePollScheduler(min_interval=5, max_interval=300)
+    scheduler.interval = 300
+
+    async def run():
+        asyncio.get_running_loop().call_later(0.05, scheduler.wake)
+        start = time.monotonic()
+        await scheduler.wait()
+        return time.monotonic() - start
+
+    assert asyncio.run(run()) < 1
+    assert scheduler.interval == 5
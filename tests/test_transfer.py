@@ -0,0 +1,159 @@
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import gzip
+import json
+
+import pytest
+
+from tests.test_match_database import (STEAM_ID, TEAMMATE_ID, make_records, teammate_records,
+                                       with_friend_and_rival)
+from src.utils import database, transfer
+from src.utils.database import MatchDatabase, PlayerShards
+from src.utils.transfer import import_records, import_sharded, read_export, write_export
+
+
+@pytest.fixture
+def source(tmp_path):
+    database = MatchDatabase(str(tmp_path / "source.db"))
+    records = with_friend_and_rival(make_records(40))
+    database.save_matches(records)
+    database.save_matches(teammate_records(records[:15]))
+    yield database
+    database.close()
+
+
+@pytest.fixture
+def target(tmp_path):
+    database = MatchDatabase(str(tmp_path / "target.db"))
+    yield database
+    database.close()
+
+
+def test_round_trip_keeps_matches_stats_and_participants(source, target, tmp_path):
+    path = str(tmp_path / "matches.ndjson.gz")
+    assert write_export(source.export_matches(include_stats=True, include_players=True, batch_size=7), path) == 55
+    with open(path, "rb") as file:
+        assert file.read(2) == b"\x1f\x8b"  # gzip
+    assert not Path(path + ".partial").exists()
+
+    assert import_records(target, read_export(path), batch_size=20) == {'inserted': 55, 'skipped': 0}
+    for player in (STEAM_ID, TEAMMATE_ID):
+        assert target.get_recent_matches(100, player_id=player) == source.get_recent_matches(100, player_id=player)
+        assert target.get_win_loss_averages(10, player_id=player) == source.get_win_loss_averages(10, player_id=player)
+    replay_id = source.get_recent_matches(1)[0]['replay_id']
+    assert target.get_match_stats(replay_id, player_id=STEAM_ID) == source.get_match_stats(replay_id, player_id=STEAM_ID)
+    assert target.get_match_players(replay_id) == source.get_match_players(replay_id)
+    assert target.get_teammates(player_id=STEAM_ID) == source.get_teammates(player_id=STEAM_ID)
+    assert target.check_rolling_aggregates() == []
+
+
+def test_reimport_skips_saved_matches_unless_replacing(source, target, tmp_path):
+    path = str(tmp_path / "matches.ndjson")
+    records = list(source.export_matches(player_id=STEAM_ID))
+    write_export(records + records[:3], path)  # Repeats, as in concatenated exports
+    assert json.loads(open(path).readline())['replay_id'] == records[0]['replay_id']
+
+    assert target.import_matches(read_export(path)) == {'inserted': 40, 'skipped': 3}
+    assert target.import_matches(read_export(path)) == {'inserted': 0, 'skipped': 43}
+    assert target.import_matches(read_export(path), replace=True) == {'inserted': 0, 'replaced': 43}
+    assert len(target.get_recent_matches(100)) == 40
+    assert target.check_rolling_aggregates() == []
+
+
+def test_optional_parts_are_left_out(source, target, tmp_path):
+    path = str(tmp_path / "summary.ndjson.gz")
+    write_export(source.export_matches(player_id=STEAM_ID), path)
+    line = json.loads(gzip.open(path, "rt").readline())
+    assert 'stats' not in line and 'players' not in line
+
+    target.import_matches(read_export(path))
+    assert target.get_match_stats(line['replay_id']) is None
+    assert target.get_match_players(line['replay_id']) == []
+    assert target.get_averages(40) == source.get_averages(40, player_id=STEAM_ID)
+
+
+def test_registered_columns_are_filled_from_exported_stats(source, target, tmp_path):
+    name = target.register_stat_path("movement.count_powerslide")
+    path = str(tmp_path / "matches.ndjson.gz")
+    write_export(source.export_matches(include_stats=True, player_id=STEAM_ID), path)
+    target.import_matches(read_export(path))
+
+    for match in target.get_recent_matches(40):
+        stats = source.get_match_stats(match['replay_id'], player_id=STEAM_ID)
+        assert match[name] == stats['movement']['count_powerslide']
+
+
+def test_sharded_import_reads_the_file_once(source, tmp_path):
+    path = str(tmp_path / "matches.ndjson.gz")
+    write_export(source.export_matches(include_stats=True, include_players=True), path)
+    read = []
+
+    def counted():
+        for record in read_export(path):
+            read.append(record['replay_id'])
+            yield record
+
+    shards = PlayerShards(str(tmp_path / "players"))
+    try:
+        counts = import_sharded(shards, counted(), batch_size=8)
+        assert len(read) == 55
+        assert counts == {STEAM_ID: {'inserted': 40, 'skipped': 0}, TEAMMATE_ID: {'inserted': 15, 'skipped': 0}}
+        assert shards.players() == sorted([STEAM_ID, TEAMMATE_ID])
+        for player in (STEAM_ID, TEAMMATE_ID):
+            shard = shards.for_player(player)
+            assert shard.get_recent_matches(100) == source.get_recent_matches(100, player_id=player)
+            assert shard.check_rolling_aggregates() == []
+    finally:
+        shards.close()
+
+
+@pytest.fixture
+def cli(tmp_path, monkeypatch):
+    """Run the transfer command line in an empty directory, without STEAM_ID or shards."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr("dotenv.load_dotenv", lambda *args, **kwargs: None)
+    monkeypatch.delenv("STEAM_ID", raising=False)
+    monkeypatch.delenv("DB_SHARD_DIR", raising=False)
+
+    def run(*argv):
+        monkeypatch.setattr(sys, "argv", ["transfer", *argv])
+        transfer._main()
+    return run
+
+
+def test_export_of_unmigrated_database_needs_steam_id(cli, tmp_path, monkeypatch, capsys):
+    # A database as it was before matches were keyed by player
+    with monkeypatch.context() as m:
+        m.setattr(database, "SCHEMA_MIGRATIONS", database.SCHEMA_MIGRATIONS[:5])
+        old = MatchDatabase("data/matches.db", defer_backfills=True)
+        old.conn.execute("INSERT INTO matches (replay_id, date, result) "
+                         "VALUES ('old-1', '2024-01-01T00:00:00Z', 'win')")
+        old.commit()
+        old.close()
+
+    with pytest.raises(SystemExit):
+        cli("export", "all.ndjson", "--all-players")
+    assert "--steam-id" in capsys.readouterr().err
+    assert not Path("all.ndjson").exists()
+
+    cli("export", "all.ndjson", "--all-players", "--steam-id", STEAM_ID)
+    assert [record['player_id'] for record in read_export("all.ndjson")] == [STEAM_ID]
+
+
+def test_import_of_matches_without_player_needs_steam_id(cli, source, tmp_path, monkeypatch, capsys):
+    path = str(tmp_path / "anonymous.ndjson")
+    write_export(({k: v for k, v in record.items() if k != 'player_id'}
+                  for record in source.export_matches(player_id=STEAM_ID)), path)
+    monkeypatch.setenv("DB_SHARD_DIR", str(tmp_path / "players"))
+
+    with pytest.raises(SystemExit):
+        cli("import", path)
+    assert "--steam-id" in capsys.readouterr().err
+    assert PlayerShards(str(tmp_path / "players")).players() == []
+
+    cli("import", path, "--steam-id", STEAM_ID)
+    assert PlayerShards(str(tmp_path / "players")).players() == [STEAM_ID]